@@ -1,12 +1,537 @@
+import logging
 import os
-from typing import Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Iterable
 
 import pandas as pd
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+from configuracao import env_bool, env_float, env_int, env_ints, hoje
+from decodificacao import (
+    ESQUEMA_DISTRIBUICAO,
+    ESQUEMA_EQUIPAMENTOS,
+    ESQUEMA_INOPERANCIA,
+    ESSENCIAIS,
+    carregar_json,
+    itens_para_dataframe,
+)
+from disk_cache import DiskCache
+from distribuicao_diaria import (
+    DistribuicaoDiariaStore,
+    HistogramaDia,
+    dias_do_periodo,
+    histograma_de_df,
+    somar_histogramas,
+)
+from indicadores import ResumoIndicadores, calcular_indicadores, resumo_de_payload
+from limitador import LimitadorAPI
+from metricas import Metricas, metricas as metricas_processo
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+# Cada rerun do Streamlit recria o APIClient, mas o cache precisa sobreviver
+# entre reruns e entre sessoes. Por isso ele vive no modulo, uma vez por processo.
+CACHE_TTL_EQUIPAMENTOS = env_float("API_CACHE_TTL_EQUIPAMENTOS", 600)
+CACHE_TTL_HOJE = env_float("API_CACHE_TTL_HOJE", 60)
+CACHE_TTL_HISTORICO = env_float("API_CACHE_TTL_HISTORICO", float("inf"))
+CACHE_STALE_SEGUNDOS = env_float("API_CACHE_STALE_SEGUNDOS", 600)
+CACHE_MAX_ENTRADAS = env_int("API_CACHE_MAX_ENTRADAS", 512)
+
+# Chamadas independentes (distribuicao + fluxo, janelas de um periodo longo...)
+# podem ir em paralelo. O pool e unico por processo para limitar o total de
+# threads abertas contra a API, independente de quantas sessoes existam.
+API_MAX_WORKERS = env_int("API_MAX_WORKERS", 8)
+
+
+CacheKey = tuple[str, tuple[tuple[str, str], ...]]
+
+
+def cache_key(path: str, params: dict[str, Any] | None = None) -> CacheKey:
+    """
+    Normaliza path + params para que chamadas equivalentes caiam na mesma chave.
+
+    Parametros None sao descartados e todos os valores viram texto, entao
+    `equipamento_id=10` e `equipamento_id="10"` compartilham a mesma entrada.
+    """
+
+    normalizados = tuple(
+        sorted((str(k), str(v)) for k, v in (params or {}).items() if v is not None)
+    )
+    return ("/" + path.strip("/"), normalizados)
+
+
+def periodo_encerrado(params: dict[str, Any] | None = None) -> bool:
+    """
+    True quando `data_fim` e anterior a hoje, ou seja, o resultado nao muda mais.
+    """
+
+    data_fim = (params or {}).get("data_fim")
+    if not data_fim:
+        return False
+    try:
+        return date.fromisoformat(str(data_fim)) < hoje()
+    except ValueError:
+        return False
+
+
+def ttl_para(path: str, params: dict[str, Any] | None = None) -> float:
+    """
+    Define por quanto tempo uma resposta pode ser servida sem revalidar.
+
+    - `/equipamentos` muda pouco, entao fica bastante tempo em cache.
+    - Periodos que terminam antes de hoje sao historicos e nao mudam mais.
+    - Periodos que incluem hoje continuam recebendo dados e expiram rapido.
+    """
+
+    path = "/" + path.strip("/")
+    if path == "/equipamentos":
+        return CACHE_TTL_EQUIPAMENTOS
+
+    if periodo_encerrado(params):
+        return CACHE_TTL_HISTORICO
+
+    return CACHE_TTL_HOJE
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    Cache LRU em memoria, thread-safe, com TTL por entrada e stale-while-revalidate.
+
+    Uma entrada expirada ainda pode ser servida por `stale_seconds` enquanto uma
+    thread em segundo plano busca a versao nova. Assim um upstream lento nao
+    trava um rerun que ja tem dados utilizaveis.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRADAS,
+        stale_seconds: float = CACHE_STALE_SEGUNDOS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.stale_seconds = stale_seconds
+        self._clock = clock
+        self._entries: OrderedDict[CacheKey, _CacheEntry] = OrderedDict()
+        self._refreshing: set[CacheKey] = set()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="api-cache-refresh"
+        )
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+        }
+
+    def get_or_fetch(
+        self, key: CacheKey, ttl: float, fetch: Callable[[], Any]
+    ) -> Any:
+        """
+        Devolve o valor em cache ou chama `fetch` para preencher a entrada.
+
+        Erros de `fetch` na busca sincrona sobem para quem chamou; erros na
+        revalidacao em segundo plano apenas mantem o valor antigo.
+        """
+
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry.expires_at:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value
+                if now < entry.expires_at + self.stale_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._refresher.submit(self._refresh, key, ttl, fetch)
+                    return entry.value
+            self._stats["misses"] += 1
+
+        value = fetch()
+        self.set(key, value, ttl)
+        return value
+
+    def set(self, key: CacheKey, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = _CacheEntry(value=value, expires_at=self._clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _refresh(self, key: CacheKey, ttl: float, fetch: Callable[[], Any]) -> None:
+        try:
+            value = fetch()
+        except Exception:
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+        else:
+            self.set(key, value, ttl)
+            with self._lock:
+                self._stats["refreshes"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "max_entries": self.max_entries}
+
+
+class RequisicoesEmVoo:
+    """
+    Junta chamadas identicas (mesmo path e params) que acontecem ao mesmo tempo.
+
+    A primeira thread faz a busca; as que chegam enquanto ela esta em
+    andamento esperam o mesmo resultado em vez de repetir a requisicao. Um
+    erro da busca e repassado para todas as threads que estavam esperando.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._em_voo: dict[CacheKey, Future] = {}
+        self._stats = {"requisicoes": 0, "coalescidas": 0}
+
+    def executar(self, key: CacheKey, fetch: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Devolve `(valor, compartilhado)`; `compartilhado` indica que o valor
+        veio de uma busca iniciada por outra thread.
+        """
+
+        with self._lock:
+            futuro = self._em_voo.get(key)
+            compartilhado = futuro is not None
+            if compartilhado:
+                self._stats["coalescidas"] += 1
+            else:
+                futuro = Future()
+                self._em_voo[key] = futuro
+                self._stats["requisicoes"] += 1
+        if compartilhado:
+            return futuro.result(), True
+
+        try:
+            valor = fetch()
+        except BaseException as exc:
+            futuro.set_exception(exc)
+            raise
+        else:
+            futuro.set_result(valor)
+            return valor, False
+        finally:
+            with self._lock:
+                self._em_voo.pop(key, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, "em_andamento": len(self._em_voo)}
+
+
+# Transporte HTTP. O pool de conexoes acompanha a concorrencia do cliente
+# (pool compartilhado + lotes), e so GETs sao repetidos em falhas transitorias.
+API_TIMEOUT = env_float("API_TIMEOUT", 20)
+API_POOL_MAXSIZE = env_int("API_POOL_MAXSIZE", 32)
+API_RETRIES = env_int("API_RETRIES", 2)
+API_RETRY_BACKOFF = env_float("API_RETRY_BACKOFF", 0.5)
+API_RETRY_STATUS = env_ints("API_RETRY_STATUS", (429, 502, 503, 504))
+API_VALIDADORES_MAX_ENTRADAS = env_int("API_VALIDADORES_MAX_ENTRADAS", 1024)
+
+# Limitador de requisicoes do processo (limitador.py). O limite de
+# simultaneas se adapta entre o minimo e o maximo; a taxa por endpoint
+# (requisicoes/s) fica desligada enquanto API_LIMITE_TAXA for 0.
+API_LIMITE_MAX_EM_VOO = env_int("API_LIMITE_MAX_EM_VOO", 16)
+API_LIMITE_MIN_EM_VOO = env_int("API_LIMITE_MIN_EM_VOO", 2)
+API_LIMITE_TAXA = env_float("API_LIMITE_TAXA", 0)
+API_LIMITE_RAJADA = env_int("API_LIMITE_RAJADA", 10)
+API_LIMITE_LATENCIA_ALVO_S = env_float("API_LIMITE_LATENCIA_ALVO_S", 5)
+API_LIMITE_ESPERA_MAX_S = env_float("API_LIMITE_ESPERA_MAX_S", API_TIMEOUT)
+
+# Cache em disco (opcional) para resultados historicos. Desligado enquanto
+# API_DISK_CACHE_DIR nao for definido.
+DISK_CACHE_DIR = os.getenv("API_DISK_CACHE_DIR", "").strip()
+DISK_CACHE_MAX_MB = env_float("API_DISK_CACHE_MAX_MB", 512)
+
+# Modo incremental da distribuicao: histogramas guardados por (equipamento, dia),
+# de forma que mudar o periodo so busque os dias que ainda nao foram baixados.
+DISTRIBUICAO_INCREMENTAL = env_bool("API_DISTRIBUICAO_INCREMENTAL")
+DISTRIBUICAO_MAX_DIAS = env_int("API_DISTRIBUICAO_MAX_DIAS", 20000)
+DISTRIBUICAO_MAX_PARALELO = env_int("API_DISTRIBUICAO_MAX_PARALELO", 8)
+
+# O /equipamentos e paginado por offset/limit. A primeira pagina vai sem
+# offset, na mesma URL (e entrada de cache) de quando so havia uma pagina.
+EQUIPAMENTOS_POR_PAGINA = env_int("API_EQUIPAMENTOS_POR_PAGINA", 2000)
+EQUIPAMENTOS_MAX_PAGINAS = 100
+_FILTRO_EQUIPAMENTOS = {"tipo_equipamento": "radar", "faixa_monitorada": "A", "only_valid_geo": "true"}
+
+# Cards do painel a partir do /velocidades/indicadores (payload pequeno,
+# calculado no servidor); o histograma completo so e baixado para os graficos.
+INDICADORES_SERVIDOR = env_bool("API_INDICADORES_SERVIDOR")
+
+# O endpoint de inoperancia rejeita periodos maiores que 31 dias. Periodos
+# longos sao divididos em janelas que se sobrepoem em um dia, para que uma
+# inoperancia que cruza a fronteira apareca inteira ao mesclar as janelas.
+INOPERANCIA_MAX_DIAS = 31
+INOPERANCIA_MAX_PARALELO = env_int("API_INOPERANCIA_MAX_PARALELO", 4)
+
+# A API nao fixa nomes de colunas para os intervalos de inoperancia; usamos
+# a primeira coluna encontrada de cada grupo para mesclar intervalos.
+_COLUNAS_EQUIPAMENTO = ("equipamento_id", "id", "nome_processador")
+_COLUNAS_INICIO = ("inicio", "data_inicio", "inicio_inoperancia")
+_COLUNAS_FIM = ("fim", "data_fim", "fim_inoperancia")
+_COLUNAS_HORAS = ("horas", "horas_inoperante", "duracao_horas")
+
+
+def dividir_periodo(
+    data_ini: date, data_fim: date, max_dias: int = INOPERANCIA_MAX_DIAS
+) -> list[tuple[date, date]]:
+    """
+    Divide [data_ini, data_fim] em janelas de no maximo `max_dias` dias.
+
+    Janelas consecutivas compartilham o ultimo/primeiro dia.
+    """
+
+    if data_fim < data_ini:
+        raise ValueError("A data inicial deve ser menor ou igual a data final.")
+
+    passo = max(1, max_dias - 1)
+    janelas = []
+    inicio = data_ini
+    while True:
+        fim = min(inicio + timedelta(days=passo), data_fim)
+        janelas.append((inicio, fim))
+        if fim >= data_fim:
+            return janelas
+        inicio = fim
+
+
+def _primeira_coluna(df: pd.DataFrame, candidatas: tuple[str, ...]) -> str | None:
+    return next((c for c in candidatas if c in df.columns), None)
+
+
+def mesclar_inoperancias(partes: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Junta o resultado das janelas, removendo duplicatas e unindo intervalos
+    sobrepostos do mesmo equipamento (caso de inoperancias que cruzam janelas).
+    """
+
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame()
+
+    df = pd.concat(partes, ignore_index=True).drop_duplicates(ignore_index=True)
+
+    col_eq = _primeira_coluna(df, _COLUNAS_EQUIPAMENTO)
+    col_ini = _primeira_coluna(df, _COLUNAS_INICIO)
+    col_fim = _primeira_coluna(df, _COLUNAS_FIM)
+    if not (col_eq and col_ini and col_fim):
+        return df
+
+    inicio = pd.to_datetime(df[col_ini], errors="coerce")
+    # Inoperancia ainda em aberto (fim nulo) e tratada como sem fim ao mesclar.
+    fim = pd.to_datetime(df[col_fim], errors="coerce").fillna(pd.Timestamp.max)
+    df = df.assign(_inicio=inicio, _fim=fim).sort_values([col_eq, "_inicio"])
+
+    # Um novo intervalo comeca quando o inicio passa do maior fim ja visto no
+    # mesmo equipamento; tudo que sobrepoe vira um grupo so.
+    fim_acumulado = df.groupby(col_eq, sort=False)["_fim"].cummax()
+    anterior = fim_acumulado.groupby(df[col_eq], sort=False).shift()
+    novo = anterior.isna() | (df["_inicio"] > anterior)
+    df["_grupo"] = novo.cumsum()
+
+    mesclado = df.groupby("_grupo", sort=False).agg(
+        {**{c: "first" for c in df.columns if not c.startswith("_")}, "_inicio": "min", "_fim": "max"}
+    )
+    aberto = mesclado["_fim"] == pd.Timestamp.max
+    mesclado[col_ini] = mesclado["_inicio"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    mesclado[col_fim] = mesclado["_fim"].dt.strftime("%Y-%m-%d %H:%M:%S").mask(aberto)
+
+    col_horas = _primeira_coluna(mesclado, _COLUNAS_HORAS)
+    if col_horas:
+        horas = (mesclado["_fim"] - mesclado["_inicio"]).dt.total_seconds() / 3600
+        mesclado[col_horas] = horas.round(2).mask(aberto, mesclado[col_horas])
+
+    return mesclado.drop(columns=["_inicio", "_fim"]).reset_index(drop=True)
+
+
+class ValidadoresHTTP:
+    """
+    Guarda ETag/Last-Modified da ultima resposta de cada consulta.
+
+    Na revalidacao, a requisicao sai com If-None-Match/If-Modified-Since e um
+    304 reaproveita o payload anterior, sem baixar o corpo de novo.
+    """
+
+    def __init__(self, max_entries: int = API_VALIDADORES_MAX_ENTRADAS) -> None:
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[CacheKey, tuple[str | None, str | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"revalidacoes": 0, "nao_modificados": 0}
+
+    def cabecalhos(self, key: CacheKey) -> dict[str, str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return {}
+            self._entries.move_to_end(key)
+            self._stats["revalidacoes"] += 1
+
+        etag, last_modified, _ = entry
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def payload(self, key: CacheKey) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._stats["nao_modificados"] += 1
+            return entry[2]
+
+    def guardar(self, key: CacheKey, response: requests.Response, payload: Any) -> None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not (etag or last_modified):
+            return
+
+        with self._lock:
+            self._entries[key] = (etag, last_modified, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
+
+
+_sessoes: dict[tuple[str, str], requests.Session] = {}
+_sessoes_lock = threading.Lock()
+
+
+def _sessao_compartilhada(base_url: str, api_key: str) -> requests.Session:
+    """
+    Uma Session por (base_url, api_key) no processo.
+
+    Como o APIClient e recriado a cada rerun, uma Session por instancia
+    jogaria fora as conexoes keep-alive o tempo todo.
+    """
+
+    with _sessoes_lock:
+        session = _sessoes.get((base_url, api_key))
+        if session is not None:
+            return session
+
+        retry = Retry(
+            total=API_RETRIES,
+            connect=API_RETRIES,
+            read=API_RETRIES,
+            status=API_RETRIES,
+            backoff_factor=API_RETRY_BACKOFF,
+            backoff_jitter=API_RETRY_BACKOFF,
+            status_forcelist=API_RETRY_STATUS,
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=4, pool_maxsize=API_POOL_MAXSIZE, max_retries=retry
+        )
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(
+            {
+                "X-API-Key": api_key,
+                # gzip/deflate sempre; br so quando houver decodificador instalado.
+                "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
+            }
+        )
+        _sessoes[(base_url, api_key)] = session
+        return session
+
+
+response_cache = ResponseCache()
+validadores_http = ValidadoresHTTP()
+requisicoes_em_voo = RequisicoesEmVoo()
+limitador_api = LimitadorAPI(
+    max_em_voo=API_LIMITE_MAX_EM_VOO,
+    min_em_voo=API_LIMITE_MIN_EM_VOO,
+    taxa_por_s=API_LIMITE_TAXA,
+    rajada=API_LIMITE_RAJADA,
+    latencia_alvo_s=API_LIMITE_LATENCIA_ALVO_S,
+    espera_max_s=API_LIMITE_ESPERA_MAX_S,
+)
+metricas_processo.adicionar_medidor(
+    "dashboard_api_limiter_limit", "Limite atual de requisicoes simultaneas a API.",
+    lambda: limitador_api.limite,
+)
+metricas_processo.adicionar_medidor(
+    "dashboard_api_limiter_in_flight", "Requisicoes em andamento na API.",
+    lambda: limitador_api.stats()["em_voo"],
+)
+metricas_processo.adicionar_medidor(
+    "dashboard_api_limiter_queue", "Chamadas esperando vaga no limitador.",
+    lambda: limitador_api.stats()["fila"],
+)
+disk_cache = (
+    DiskCache(DISK_CACHE_DIR, max_bytes=int(DISK_CACHE_MAX_MB * 1024 * 1024))
+    if DISK_CACHE_DIR
+    else None
+)
+distribuicao_diaria = DistribuicaoDiariaStore(max_dias=DISTRIBUICAO_MAX_DIAS)
+_executor = ThreadPoolExecutor(max_workers=API_MAX_WORKERS, thread_name_prefix="api-client")
+
+
+def _retries(response: requests.Response | None) -> int:
+    # O urllib3 guarda no Retry da resposta o historico das novas tentativas.
+    retry = getattr(getattr(response, "raw", None), "retries", None)
+    return len(getattr(retry, "history", ()) or ())
+
+
+def _retry_after(response: requests.Response | None) -> float | None:
+    # So a forma em segundos; a forma com data HTTP e rara em APIs internas.
+    valor = response.headers.get("Retry-After", "") if response is not None else ""
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        return None
+
 
 class APIClient:
     """
@@ -19,7 +544,17 @@ class APIClient:
     - conversao de respostas JSON em DataFrame quando fizer sentido
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        cache: ResponseCache | None = response_cache,
+        distribuicao_store: DistribuicaoDiariaStore = distribuicao_diaria,
+        distribuicao_incremental: bool = DISTRIBUICAO_INCREMENTAL,
+        validadores: ValidadoresHTTP | None = validadores_http,
+        disk: DiskCache | None = disk_cache,
+        metricas: Metricas | None = metricas_processo,
+        em_voo: RequisicoesEmVoo | None = requisicoes_em_voo,
+        limitador: LimitadorAPI | None = limitador_api,
+    ) -> None:
         base_url = os.getenv("API_BASE_URL", "").strip().rstrip("/")
         api_key = os.getenv("API_KEY", "").strip()
 
@@ -34,52 +569,399 @@ class APIClient:
             )
 
         self.base_url = base_url
-        self.session = requests.Session()
-        self.session.headers.update({"X-API-Key": api_key})
+        self.session = _sessao_compartilhada(base_url, api_key)
+        self.validadores = validadores
+        self.disk = disk
+        self.cache = cache
+        self.distribuicao_store = distribuicao_store
+        self.distribuicao_incremental = distribuicao_incremental
+        self.metricas = metricas
+        self.em_voo = em_voo
+        self.limitador = limitador
+
+    def _registrar(
+        self,
+        path: str,
+        params: dict[str, Any] | None,
+        inicio: float,
+        origem: str,
+        **extra: Any,
+    ) -> None:
+        if self.metricas is not None:
+            self.metricas.registrar_chamada(
+                path, params, time.perf_counter() - inicio, origem, **extra
+            )
+
+    def _get(
+        self, path: str, params: dict[str, Any] | None = None, usar_cache: bool = True
+    ) -> dict[str, Any]:
+        """
+        Faz um GET passando pelo cache compartilhado do processo, quando houver.
+
+        O payload devolvido pode ser o mesmo objeto entregue a outras sessoes,
+        entao quem chama deve trata-lo como somente leitura. Consultas em lote
+        que tem cache proprio passam `usar_cache=False` para nao expulsar do
+        LRU as respostas usadas pelas telas; elas tambem nao guardam
+        validadores HTTP (que seguram o payload para reaproveitar no 304).
+        """
+
+        if not usar_cache:
+            return self._buscar(path, params, validar=False)
+        if self.cache is None:
+            return self._buscar(path, params)
 
-    def _get(self, path: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+        inicio = time.perf_counter()
+        chamador = threading.get_ident()
+        buscou = False
+
+        def buscar() -> dict[str, Any]:
+            nonlocal buscou
+            # A revalidacao em segundo plano tambem passa por aqui, mas so
+            # conta como miss a busca feita na thread de quem chamou.
+            if threading.get_ident() == chamador:
+                buscou = True
+            return self._buscar(path, params)
+
+        payload = self.cache.get_or_fetch(
+            cache_key(path, params), ttl_para(path, params), buscar
+        )
+        if not buscou:
+            self._registrar(path, params, inicio, "cache")
+        return payload
+
+    def _buscar(
+        self, path: str, params: dict[str, Any] | None = None, validar: bool = True
+    ) -> dict[str, Any]:
+        """
+        Busca fora do cache em memoria, juntando chamadas identicas simultaneas.
+
+        Se outra thread do processo ja esta buscando o mesmo path/params (outra
+        sessao abrindo o mesmo radar, o aquecedor, uma revalidacao...), esta
+        espera o resultado dela em vez de fazer uma segunda requisicao.
+        """
+
+        if self.em_voo is None:
+            return self._buscar_origem(path, params, validar)
+
+        inicio = time.perf_counter()
+        payload, compartilhado = self.em_voo.executar(
+            cache_key(path, params), lambda: self._buscar_origem(path, params, validar)
+        )
+        if compartilhado:
+            self._registrar(path, params, inicio, "coalescida")
+        return payload
+
+    def _buscar_origem(
+        self, path: str, params: dict[str, Any] | None = None, validar: bool = True
+    ) -> dict[str, Any]:
+        """
+        Le do cache em disco quando o periodo ja terminou; senao, vai a rede.
+
+        So resultados de periodos encerrados sao gravados em disco, porque so
+        eles podem ser reutilizados para sempre (inclusive apos um deploy).
+        """
+
+        if self.disk is None or not periodo_encerrado(params):
+            return self._request(path, params, validar)
+
+        inicio = time.perf_counter()
+        chave = repr(cache_key(path, params))
+        payload = self.disk.get(chave)
+        if payload is not None:
+            self._registrar(path, params, inicio, "disco")
+        else:
+            payload = self._request(path, params, validar)
+            self.disk.set(chave, payload)
+        return payload
+
+    def cache_stats(self) -> dict[str, int]:
+        """Contadores de hit/miss/eviction do cache, uteis para calibrar TTLs e tamanho."""
+
+        stats = self.cache.stats() if self.cache is not None else {}
+        if self.validadores is not None:
+            stats.update({f"http_{k}": v for k, v in self.validadores.stats().items()})
+        if self.disk is not None:
+            stats.update({f"disk_{k}": v for k, v in self.disk.stats().items()})
+        if self.em_voo is not None:
+            stats.update({f"em_voo_{k}": v for k, v in self.em_voo.stats().items()})
+        if self.limitador is not None:
+            stats.update({f"limitador_{k}": v for k, v in self.limitador.stats().items()})
+        return stats
+
+    def _http_get(
+        self,
+        path: str,
+        url: str,
+        params: dict[str, Any] | None,
+        headers: dict[str, str] | None = None,
+    ) -> requests.Response:
+        """
+        GET na API passando pelo limitador do processo, quando houver.
+
+        A vaga fica ocupada durante as novas tentativas do transporte, e a
+        resposta (status, latencia, retries, Retry-After) ajusta o limite.
+        """
+
+        if self.limitador is None:
+            return self.session.get(url, params=params, headers=headers, timeout=API_TIMEOUT)
+
+        espera = self.limitador.adquirir(path)
+        if self.metricas is not None:
+            self.metricas.registrar_espera(path, espera)
+        inicio = time.perf_counter()
+        response = None
+        try:
+            response = self.session.get(url, params=params, headers=headers, timeout=API_TIMEOUT)
+            return response
+        finally:
+            self.limitador.liberar(
+                path,
+                time.perf_counter() - inicio,
+                response.status_code if response is not None else None,
+                retries=_retries(response),
+                retry_after_s=_retry_after(response),
+            )
+
+    def _request(
+        self, path: str, params: dict[str, Any] | None = None, validar: bool = True
+    ) -> dict[str, Any]:
         """
         Faz uma requisicao GET para a API com timeout curto e erro explicito.
 
         O dashboard nao precisa conhecer detalhes de requests. Se algo der errado,
         levantamos uma excecao amigavel para que o Streamlit decida como exibir.
+        Com `validar=False` (consultas em lote), a requisicao nao usa nem
+        guarda ETag/Last-Modified.
         """
 
         url = f"{self.base_url}/{path.lstrip('/')}"
+        key = cache_key(path, params)
+        validadores = self.validadores if validar else None
+        headers = validadores.cabecalhos(key) if validadores is not None else {}
+        inicio = time.perf_counter()
+        response = None
         try:
-            response = self.session.get(url, params=params, timeout=20)
+            response = self._http_get(path, url, params, headers)
+            if response.status_code == 304:
+                payload = validadores.payload(key)
+                if payload is not None:
+                    self._registrar(
+                        path, params, inicio, "304",
+                        retries=_retries(response), status=304,
+                    )
+                    return payload
+                # O validador saiu do LRU entre o envio e a resposta: busca o corpo.
+                response = self._http_get(path, url, params)
             response.raise_for_status()
         except requests.HTTPError as exc:
+            self._registrar(
+                path, params, inicio, "rede",
+                retries=_retries(response), status=response.status_code, erro=True,
+            )
             detail = response.text.strip() or str(exc)
             raise RuntimeError(f"Erro ao consultar a API em {path}: {detail}") from exc
         except requests.RequestException as exc:
+            self._registrar(path, params, inicio, "rede", erro=True)
             raise RuntimeError(
                 f"Erro de comunicacao com a API em {path}: {exc}"
             ) from exc
 
-        return response.json()
+        try:
+            payload = carregar_json(response.content)
+        except ValueError as exc:
+            self._registrar(
+                path, params, inicio, "rede",
+                bytes_recebidos=len(response.content), status=response.status_code, erro=True,
+            )
+            raise RuntimeError(f"Resposta invalida da API em {path}: {exc}") from exc
+        self._registrar(
+            path, params, inicio, "rede",
+            bytes_recebidos=len(response.content),
+            retries=_retries(response),
+            status=response.status_code,
+        )
+        if validadores is not None:
+            validadores.guardar(key, response, payload)
+        return payload
 
-    def get_equipamentos(self, limit: int = 2000) -> pd.DataFrame:
-        payload = self._get(
-            "/equipamentos",
-            params={
-                "tipo_equipamento": "radar",
-                "faixa_monitorada": "A",
-                "only_valid_geo": "true",
-                "limit": limit,
-            },
+    def get_equipamentos_paginas(self, limit: int = EQUIPAMENTOS_POR_PAGINA) -> tuple[dict[str, Any], ...]:
+        """
+        Payloads de todas as paginas do /equipamentos (`offset`/`limit`).
+
+        As paginas sao buscadas e renovadas juntas, como um unico snapshot em
+        uma unica entrada do cache: com uma entrada por pagina, paginas de
+        instantes diferentes podiam repetir ou pular radares. Cada pagina
+        ainda passa pela juncao de chamadas e pela revalidacao (ETag), entao
+        uma pagina sem mudanca volta como o mesmo objeto do snapshot anterior.
+        """
+
+        params = {**_FILTRO_EQUIPAMENTOS, "limit": limit}
+        if self.cache is None:
+            return self._buscar_equipamentos_paginas(limit)
+        return self.cache.get_or_fetch(
+            cache_key("/equipamentos/paginas", params),
+            ttl_para("/equipamentos", params),
+            lambda: self._buscar_equipamentos_paginas(limit),
+        )
+
+    def _buscar_equipamentos_paginas(self, limit: int) -> tuple[dict[str, Any], ...]:
+        # Para quando uma pagina vem com menos de `limit` itens. Se a API
+        # ignorar o `offset` e repetir a pagina anterior, a repeticao e
+        # descartada em vez de duplicar a frota ou buscar para sempre.
+        paginas: list[dict[str, Any]] = []
+        for offset in range(0, EQUIPAMENTOS_MAX_PAGINAS * limit, limit):
+            payload = self._buscar(
+                "/equipamentos",
+                params={**_FILTRO_EQUIPAMENTOS, "limit": limit, "offset": offset or None},
+            )
+            itens = payload.get("items", [])
+            if paginas and itens and itens == paginas[-1].get("items"):
+                logger.warning("/equipamentos ignorou offset=%s; usando so a primeira pagina.", offset)
+                break
+            paginas.append(payload)
+            if len(itens) < limit:
+                break
+        else:
+            logger.warning(
+                "/equipamentos passou de %s paginas de %s; lista truncada.", EQUIPAMENTOS_MAX_PAGINAS, limit
+            )
+        return tuple(paginas)
+
+    def get_equipamentos(self, limit: int = EQUIPAMENTOS_POR_PAGINA) -> pd.DataFrame:
+        """Todos os radares, juntando as paginas do /equipamentos."""
+
+        partes = [
+            itens_para_dataframe(
+                payload.get("items", []), ESQUEMA_EQUIPAMENTOS, ESSENCIAIS["equipamentos"]
+            )
+            for payload in self.get_equipamentos_paginas(limit)
+        ]
+        return partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+
+    def get_inoperancia(
+        self,
+        data_ini: str,
+        data_fim: str,
+        progresso: Callable[[int, int], None] | None = None,
+    ) -> pd.DataFrame:
+        """
+        Consulta inoperancias de qualquer periodo, dividindo em janelas de 31 dias.
+
+        As janelas sao buscadas em paralelo (no maximo INOPERANCIA_MAX_PARALELO
+        por vez) e mescladas em um unico DataFrame. `progresso(concluidas, total)`
+        e chamado na thread de quem chamou a cada janela concluida.
+        """
+
+        janelas = dividir_periodo(date.fromisoformat(data_ini), date.fromisoformat(data_fim))
+        if len(janelas) == 1:
+            df = self._get_inoperancia_janela(data_ini, data_fim)
+            if progresso is not None:
+                progresso(1, 1)
+            return df
+
+        futuros = self.executar_em_lote(
+            self._get_inoperancia_janela,
+            [
+                {"data_ini": ini.isoformat(), "data_fim": fim.isoformat()}
+                for ini, fim in janelas
+            ],
+            max_paralelo=INOPERANCIA_MAX_PARALELO,
+            progresso=progresso,
         )
-        return pd.DataFrame(payload.get("items", []))
+        # Um relatorio com janelas faltando seria enganoso, entao qualquer erro
+        # de janela invalida a consulta inteira.
+        return mesclar_inoperancias([futuro.result() for futuro in futuros])
 
-    def get_inoperancia(self, data_ini: str, data_fim: str) -> pd.DataFrame:
+    def _get_inoperancia_janela(self, data_ini: str, data_fim: str) -> pd.DataFrame:
         payload = self._get(
             "/equipamentos/inoperancia",
             params={"data_ini": data_ini, "data_fim": data_fim},
         )
-        return pd.DataFrame(payload.get("items", []))
+        return itens_para_dataframe(
+            payload.get("items", []), ESQUEMA_INOPERANCIA, ESSENCIAIS["inoperancia"]
+        )
 
     def get_distribuicao_velocidade(
+        self,
+        equipamento_id: int,
+        data_ini: str,
+        data_fim: str,
+        incremental: bool | None = None,
+        usar_cache: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Histograma `velocidade`/`contagem` do equipamento no periodo.
+
+        No modo incremental (padrao definido por API_DISTRIBUICAO_INCREMENTAL)
+        o periodo e montado a partir de histogramas diarios guardados; so os
+        dias ausentes sao buscados na API.
+        """
+
+        if incremental is None:
+            incremental = self.distribuicao_incremental
+        if incremental:
+            return self._get_distribuicao_incremental(equipamento_id, data_ini, data_fim)
+
+        return self._get_distribuicao(equipamento_id, data_ini, data_fim, usar_cache=usar_cache)
+
+    def _get_distribuicao_incremental(
         self, equipamento_id: int, data_ini: str, data_fim: str
+    ) -> pd.DataFrame:
+        dias = dias_do_periodo(date.fromisoformat(data_ini), date.fromisoformat(data_fim))
+        histogramas, faltantes = self.distribuicao_store.obter(equipamento_id, dias)
+
+        futuros = self.executar_em_lote(
+            self._get_distribuicao_dia,
+            [{"equipamento_id": equipamento_id, "dia": dia} for dia in faltantes],
+            max_paralelo=DISTRIBUICAO_MAX_PARALELO,
+        )
+        histogramas.extend(futuro.result() for futuro in futuros)
+        return somar_histogramas(histogramas)
+
+    def get_distribuicao_por_dia(
+        self,
+        equipamento_id: int,
+        data_ini: str,
+        data_fim: str,
+        progresso: Callable[[int, int], None] | None = None,
+    ) -> dict[date, HistogramaDia]:
+        """
+        Histograma de cada dia do periodo, em ordem de data.
+
+        Os dias ja guardados saem do store; os que faltam sao buscados em lote
+        (no maximo DISTRIBUICAO_MAX_PARALELO por vez), entao um perfil de 31
+        dias custa o tempo de poucas consultas, e nao o de 31 em sequencia.
+        `progresso(concluidos, total)` conta so os dias buscados na API.
+        """
+
+        dias = dias_do_periodo(date.fromisoformat(data_ini), date.fromisoformat(data_fim))
+        por_dia, faltantes = self.distribuicao_store.obter_por_dia(equipamento_id, dias)
+
+        futuros = self.executar_em_lote(
+            self._get_distribuicao_dia,
+            [{"equipamento_id": equipamento_id, "dia": dia} for dia in faltantes],
+            max_paralelo=DISTRIBUICAO_MAX_PARALELO,
+            progresso=progresso,
+        )
+        por_dia.update((dia, futuro.result()) for dia, futuro in zip(faltantes, futuros))
+        return {dia: por_dia[dia] for dia in dias}
+
+    def _get_distribuicao_dia(self, equipamento_id: int, dia: date) -> HistogramaDia:
+        dia_iso = dia.isoformat()
+        if dia >= hoje():
+            # Dia corrente: passa pelo cache de TTL curto e nao vai para o store.
+            return histograma_de_df(self._get_distribuicao(equipamento_id, dia_iso, dia_iso))
+
+        # Dias fechados vao direto para o store, que ja faz o papel de cache;
+        # passar pelo ResponseCache so empurraria entradas uteis para fora do LRU.
+        histograma = histograma_de_df(
+            self._get_distribuicao(equipamento_id, dia_iso, dia_iso, usar_cache=False)
+        )
+        self.distribuicao_store.guardar(equipamento_id, dia, histograma)
+        return histograma
+
+    def _get_distribuicao(
+        self, equipamento_id: int, data_ini: str, data_fim: str, usar_cache: bool = True
     ) -> pd.DataFrame:
         payload = self._get(
             "/velocidades/distribuicao",
@@ -88,8 +970,56 @@ class APIClient:
                 "data_ini": data_ini,
                 "data_fim": data_fim,
             },
+            usar_cache=usar_cache,
+        )
+        return itens_para_dataframe(
+            payload.get("items", []), ESQUEMA_DISTRIBUICAO, ESSENCIAIS["distribuicao"]
         )
-        return pd.DataFrame(payload.get("items", []))
+
+    def get_indicadores(
+        self, equipamento_id: int, data_ini: str, data_fim: str, usar_cache: bool = True
+    ) -> ResumoIndicadores:
+        """Total e velocidades media, moda e maxima calculados pela API."""
+
+        payload = self._get(
+            "/velocidades/indicadores",
+            params={
+                "equipamento_id": equipamento_id,
+                "data_ini": data_ini,
+                "data_fim": data_fim,
+            },
+            usar_cache=usar_cache,
+        )
+        return resumo_de_payload(payload)
+
+    def get_resumo_indicadores(
+        self,
+        equipamento_id: int,
+        data_ini: str,
+        data_fim: str,
+        velocidade_regulamentada: float,
+    ) -> tuple[ResumoIndicadores, str]:
+        """
+        Indicadores dos cards, do servidor quando possivel.
+
+        Se o /velocidades/indicadores falhar ou vier em formato inesperado,
+        calcula no cliente a partir da distribuicao, como no modo padrao.
+        Devolve `(resumo, origem)`, com origem "servidor" ou "cliente".
+        """
+
+        try:
+            return self.get_indicadores(equipamento_id, data_ini, data_fim), "servidor"
+        except RuntimeError as exc:
+            logger.warning(
+                "Indicadores do servidor indisponiveis para %s (%s a %s), calculando no cliente: %s",
+                equipamento_id, data_ini, data_fim, exc,
+            )
+
+        df = self.get_distribuicao_velocidade(equipamento_id, data_ini, data_fim)
+        indicadores = calcular_indicadores(
+            df["velocidade"], df["contagem"], velocidade_regulamentada=velocidade_regulamentada
+        )
+        return ResumoIndicadores.de_indicadores(indicadores), "cliente"
 
     def get_fluxo(
         self,
@@ -97,6 +1027,7 @@ class APIClient:
         data_fim: str,
         equipamento_id: int | None = None,
         nome_processador: str | None = None,
+        usar_cache: bool = True,
     ) -> int:
         params: dict[str, Any] = {"data_ini": data_ini, "data_fim": data_fim}
 
@@ -109,5 +1040,96 @@ class APIClient:
         else:
             raise ValueError("Informe equipamento_id ou nome_processador para consultar fluxo.")
 
-        payload = self._get("/trafego/fluxo", params=params)
+        payload = self._get("/trafego/fluxo", params=params, usar_cache=usar_cache)
         return int(payload.get("fluxo_total") or 0)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """
+        Agenda uma chamada do cliente no pool compartilhado do processo.
+
+        Os erros continuam sendo RuntimeError; eles aparecem em `future.result()`.
+        """
+
+        return _executor.submit(fn, *args, **kwargs)
+
+    def executar_em_lote(
+        self,
+        fn: Callable[..., Any],
+        argumentos: Iterable[dict[str, Any]],
+        max_paralelo: int | None = None,
+        progresso: Callable[[int, int], None] | None = None,
+    ) -> list[Future]:
+        """
+        Executa `fn(**kwargs)` para cada item de `argumentos` com paralelismo limitado.
+
+        Cada lote usa um pool proprio com `max_paralelo` threads, separado do
+        pool compartilhado: assim um lote disparado de dentro de uma tarefa do
+        pool (ex.: distribuicao incremental) nunca espera por threads que ele
+        mesmo esta ocupando. Devolve os futures ja concluidos, na mesma ordem
+        dos argumentos; cada um carrega seu proprio resultado ou erro.
+        """
+
+        argumentos = list(argumentos)
+        total = len(argumentos)
+        if not total:
+            return []
+
+        limite = min(total, max(1, max_paralelo or API_MAX_WORKERS))
+        with ThreadPoolExecutor(max_workers=limite, thread_name_prefix="api-lote") as pool:
+            futuros = [pool.submit(fn, **kwargs) for kwargs in argumentos]
+            for concluidas, _ in enumerate(as_completed(futuros), start=1):
+                if progresso is not None:
+                    progresso(concluidas, total)
+
+        return futuros
+
+    def buscar_periodo_equipamento(
+        self,
+        equipamento_id: int,
+        data_ini: str,
+        data_fim: str,
+        nome_processador: str | None = None,
+        velocidade_regulamentada: float | None = None,
+    ) -> dict[str, Future]:
+        """
+        Dispara em paralelo as consultas por equipamento de um periodo.
+
+        Devolve um Future por consulta (`distribuicao` e `fluxo`), para que a
+        tela possa renderizar cada bloco assim que o respectivo resultado chegar.
+        O tempo percebido passa a ser o da consulta mais lenta, nao a soma delas.
+
+        Com `velocidade_regulamentada` informada, a distribuicao da lugar a
+        `indicadores` (`get_resumo_indicadores`): so o resumo dos cards vem
+        da API, e o histograma fica para quando os graficos pedirem.
+        """
+
+        # O fluxo segue a mesma escolha de identificador do dashboard: se o
+        # nome_processador vier informado, ele tem prioridade.
+        fluxo_kwargs: dict[str, Any] = (
+            {"nome_processador": nome_processador}
+            if nome_processador is not None
+            else {"equipamento_id": equipamento_id}
+        )
+        if velocidade_regulamentada is not None:
+            velocidades = self.submit(
+                self.get_resumo_indicadores,
+                equipamento_id=equipamento_id,
+                data_ini=data_ini,
+                data_fim=data_fim,
+                velocidade_regulamentada=velocidade_regulamentada,
+            )
+            consulta_velocidades = "indicadores"
+        else:
+            velocidades = self.submit(
+                self.get_distribuicao_velocidade,
+                equipamento_id=equipamento_id,
+                data_ini=data_ini,
+                data_fim=data_fim,
+            )
+            consulta_velocidades = "distribuicao"
+        return {
+            consulta_velocidades: velocidades,
+            "fluxo": self.submit(
+                self.get_fluxo, data_ini=data_ini, data_fim=data_fim, **fluxo_kwargs
+            ),
+        }
@@ -1,20 +1,230 @@
 import streamlit as st 
-import folium
 from streamlit_folium import st_folium
 import pandas as pd
-import plotly.express as px
+import copy
 import datetime
+from concurrent.futures import as_completed
 from dotenv import load_dotenv
 import locale
-import base64
-from pathlib import Path
-from api_client import APIClient
+import logging
+from api_client import INDICADORES_SERVIDOR, APIClient
+from cache_warmer import AQUECEDOR_ATIVO, AquecedorCache
+from comparacao import ResultadoPeriodo, Variacao, periodo_anterior, variacoes
+from configuracao import hoje
+from indicadores import ResumoIndicadores, calcular_indicadores, divergencias
+from frota import buscar_conformidade_frota, ranking_excesso
+from graficos import figura_comparacao, figura_faixas_por_dia, figura_perfil_diario, figuras_equipamento
+from equipamentos import Equipamentos, registro_equipamentos
+from indice_espacial import IndiceEspacial
+from mapa import (
+    CLASSES_EXCESSO,
+    COR_SEM_DADOS,
+    ICONE_ATIVO,
+    ICONE_INATIVO,
+    MAPA_MAX_MARCADORES,
+    ZOOM_INICIAL,
+    ajustar_limites,
+    camada_visivel,
+    icone_b64,
+    limites_do_mapa,
+    mapa_saude_ocr,
+    montar_mapa,
+)
+from metricas import Rerun, metricas
+from perfil import PERFIL_MAX_DIAS, perfil_diario
+from sessao import SESSAO_MEMORIA_MAX_MB, memoria_da_sessao, resultados_da_sessao
+from saude_ocr import SAUDE_OCR_LIMIAR, buscar_saude_ocr, radares_degradados, tabela_degradados
+
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _mapa_equipamentos(
+    versao_equipamentos: int,
+    _equipamentos_validos: pd.DataFrame,
+    conformidade: pd.DataFrame | None = None,
+    por_area: bool = False,
+):
+    # O mapa so muda quando muda o snapshot de equipamentos (ou a camada de
+    # conformidade). Enquanto isso, todas as sessoes reaproveitam o mesmo
+    # objeto em vez de remontar a cada rerun. A versao do registro substitui
+    # o hash da tabela de equipamentos na chave. O objeto em cache nunca vai
+    # direto para o st_folium: veja `_para_desenho`.
+    return montar_mapa(_equipamentos_validos, conformidade, por_area=por_area)
+
+
+def _para_desenho(objeto):
+    # O st_folium altera o que recebe: renderiza o mapa e pendura nele a
+    # camada (`feature_group_to_add`). Cada rerun desenha uma copia, para o
+    # objeto em cache, compartilhado entre sessoes e threads, nao mudar. A
+    # copia mantem os ids dos elementos, entao o script do mapa e igual entre
+    # reruns e o navegador nao remonta o mapa (nem perde zoom e posicao).
+    return copy.deepcopy(objeto)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _indice_mapa(pontos: pd.DataFrame) -> IndiceEspacial:
+    return IndiceEspacial(pontos)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _mapa_saude_ocr(versao_equipamentos: int, ids_degradados: tuple[int, ...], _equipamentos_validos, _degradados):
+    return mapa_saude_ocr(_equipamentos_validos, _degradados)
+
+
+# Frotas grandes: so a area visivel vai para o navegador. A camada e guardada
+# por (pontos, limites ajustados, zoom); arrastar um pouco o mapa cai nos
+# mesmos limites, e a mesma camada nao e redesenhada pelo st_folium.
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _camada_mapa(pontos: pd.DataFrame, conformidade: bool, limites: tuple | None, zoom: int):
+    return camada_visivel(pontos, _indice_mapa(pontos), limites, zoom, conformidade=conformidade)
+
+
+# Indicadores e graficos do painel sao guardados por (equipamento, periodo,
+# velocidade regulamentada). A `assinatura` (linhas e total da distribuicao)
+# completa a chave: o periodo que inclui hoje ainda recebe passagens e precisa
+# gerar resultado novo quando os dados mudam. O DataFrame em si nao entra no
+# hash (prefixo _), entao reruns e outras sessoes pulam todo o calculo.
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _indicadores_equipamento(
+    equipamento_id: int,
+    data_ini: str,
+    data_fim: str,
+    vel_regulamentada: float,
+    assinatura: tuple[int, int],
+    _df_velocidade: pd.DataFrame,
+):
+    return calcular_indicadores(
+        _df_velocidade["velocidade"],
+        _df_velocidade["contagem"],
+        velocidade_regulamentada=vel_regulamentada,
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _graficos_equipamento(
+    equipamento_id: int,
+    data_ini: str,
+    data_fim: str,
+    vel_regulamentada: float,
+    assinatura: tuple[int, int],
+    _df_velocidade: pd.DataFrame,
+    _indicadores,
+):
+    return figuras_equipamento(
+        _df_velocidade,
+        _indicadores,
+        datetime.date.fromisoformat(data_ini),
+        datetime.date.fromisoformat(data_fim),
+    )
+
+
+def _assinatura_distribuicao(df_velocidade: pd.DataFrame) -> tuple[int, int]:
+    return len(df_velocidade), int(df_velocidade["contagem"].sum())
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _graficos_perfil(
+    equipamento_id: int,
+    data_ini: str,
+    data_fim: str,
+    vel_regulamentada: float,
+    assinatura: tuple[int, int],
+    _histogramas,
+):
+    perfil, faixas = perfil_diario(_histogramas, vel_regulamentada)
+    return figura_perfil_diario(perfil, vel_regulamentada), figura_faixas_por_dia(faixas)
+
+
+# Chave: equipamento, os dois periodos, velocidade regulamentada e as
+# assinaturas das duas distribuicoes (mesmo raciocinio dos graficos do painel).
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _grafico_comparacao(
+    equipamento_id: int,
+    periodo_atual: tuple[str, str],
+    periodo_referencia: tuple[str, str],
+    vel_regulamentada: float,
+    assinaturas: tuple[tuple[int, int], tuple[int, int]],
+    _df_atual: pd.DataFrame,
+    _df_referencia: pd.DataFrame,
+    rotulo_atual: str,
+    rotulo_referencia: str,
+):
+    return figura_comparacao(
+        _df_atual, _df_referencia, rotulo_atual, rotulo_referencia, vel_regulamentada
+    )
+
+
+def _assinatura_histogramas(histogramas) -> tuple[int, int]:
+    return len(histogramas), sum(int(contagem.sum()) for _, contagem in histogramas.values())
+
+
+def _card(placeholder, rotulo: str, valor: str) -> None:
+    placeholder.markdown(
+        f"""<div class="card-indicador">
+            <div class="sub-label">{rotulo}</div>
+            <div class="destaque">{valor}</div>
+        </div>""",
+        unsafe_allow_html=True,
+    )
 
-def _img_b64(path: str) -> str:
-    p = Path(path)
-    if not p.exists():
-        return ""  # evita quebrar a página se faltar o arquivo
-    return base64.b64encode(p.read_bytes()).decode("utf-8")
+
+def _cards_velocidade(card_media, card_moda, card_maxima, card_total_ocr, resumo: ResumoIndicadores) -> None:
+    # Mesmos cards com indicadores do cliente (distribuicao) ou do servidor.
+    # ===== Linha 2 (três colunas) =====
+    _card(card_media, "Velocidade Média", f"{resumo.velocidade_media:.1f} km/h")
+    _card(card_moda, "Velocidade Mais Praticada", f"{resumo.velocidade_moda:.1f} km/h")
+    _card(card_maxima, "Velocidade Máxima", f"{resumo.velocidade_maxima:.1f} km/h")
+    # ===== Linha 3 (usa mesmas 3 colunas) — lado esquerdo =====
+    _card(
+        card_total_ocr,
+        "Total de Veículos Lidos (OCR)",
+        locale.format_string('%.0f', resumo.total, grouping=True),
+    )
+
+def _card_variacao(placeholder, variacao: Variacao, rotulo_referencia: str) -> None:
+    # Card do periodo principal com a variacao em relacao ao de comparacao.
+    # Percentuais variam em pontos percentuais.
+    if variacao.unidade == "%":
+        casas, unidade_delta = "%.2f", "p.p."
+    else:
+        casas, unidade_delta = "%.1f", variacao.unidade
+
+    def _fmt(valor: float) -> str:
+        return "—" if pd.isna(valor) else locale.format_string(casas, valor, grouping=True)
+
+    if pd.isna(variacao.delta):
+        texto_delta, cor = "sem base de comparação", "#6b7280"
+    else:
+        seta = "▲" if variacao.delta > 0 else "▼" if variacao.delta < 0 else "="
+        texto_delta = f"{seta} {'+' if variacao.delta > 0 else ''}{_fmt(variacao.delta)} {unidade_delta}"
+        cor = {True: "#0c810c", False: "#c71111", None: "#6b7280"}[variacao.melhorou]
+
+    placeholder.markdown(
+        f"""<div class="card-indicador card-comparacao">
+            <div class="sub-label">{variacao.rotulo}</div>
+            <div class="destaque">{_fmt(variacao.atual)} {variacao.unidade}</div>
+            <div class="variacao" style="color:{cor}">{texto_delta}</div>
+            <div class="sub-label">{rotulo_referencia}: {_fmt(variacao.referencia)} {variacao.unidade}</div>
+        </div>""",
+        unsafe_allow_html=True,
+    )
+
+
+def _intervalo_selecionado(data_intervalo) -> tuple[datetime.date | None, datetime.date | None]:
+    # Streamlit pode devolver:
+    # - tuple (start, end) quando o range está completo
+    # - date (uma data) enquanto o usuário ainda está escolhendo
+    # - tuple estranho/len != 2 em alguns casos de interação
+    if isinstance(data_intervalo, tuple):
+        if len(data_intervalo) == 2:
+            return data_intervalo
+        if len(data_intervalo) == 1:
+            return data_intervalo[0], data_intervalo[0]
+        return None, None
+    if isinstance(data_intervalo, datetime.date):
+        return data_intervalo, data_intervalo
+    return None, None
 
 # Locale para separador brasileiro
 try:
@@ -33,7 +243,28 @@ except RuntimeError as exc:
     st.error(str(exc))
     st.stop()
 
+@st.cache_resource(show_spinner=False)
+def _aquecedor_cache() -> AquecedorCache:
+    # Um unico worker por processo, iniciado no primeiro rerun de qualquer sessao.
+    aquecedor = AquecedorCache()
+    aquecedor.iniciar()
+    return aquecedor
+
+
+if AQUECEDOR_ATIVO:
+    _aquecedor_cache()
+
 st.set_page_config(page_title="Dashboard das Velocidades", layout="wide")
+# Cronometro das etapas deste rerun (painel de diagnostico e metricas).
+rerun = Rerun(metricas)
+
+# Estado explicito da sessao, lido e escrito tanto pelo rerun completo quanto
+# pelos fragmentos (que reexecutam so o proprio trecho da pagina).
+# Resultados grandes da sessao (inoperancia) ficam em `resultados_sessao`,
+# compactados e com teto de memoria; os nao lidos ha muito tempo saem aqui.
+st.session_state.setdefault("equip_selecionado", None)
+st.session_state.etapas_mapa_equipamento = []
+resultados_da_sessao(st.session_state).limpar_expirados()
 st.title("📈 Dashboard das Velocidades")
 
 # >>> CSS para controle de impressão, quebras de página e tamanhos
@@ -75,15 +306,66 @@ st.markdown("""
 
 # Carregar equipamentos para o mapa (agora já traz status e velocidade regulamentada).
 # Se a API estiver indisponivel, a tela para aqui com uma mensagem objetiva.
+# O registro e compartilhado pelo processo: busca todas as paginas e so
+# remonta a tabela e os indices por id/nome quando alguma pagina mudou.
 try:
-    equipamentos_df = api_client.get_equipamentos()
+    with rerun.etapa("equipamentos"):
+        equipamentos = registro_equipamentos.atualizar(api_client)
 except RuntimeError as exc:
     st.error(str(exc))
     st.stop()
 
-equipamentos_validos = equipamentos_df[
-    (equipamentos_df['latitude'] != 0) & (equipamentos_df['longitude'] != 0)
-]
+equipamentos_validos = equipamentos.validos
+
+@st.fragment
+def _painel_inoperancia(data_inicial: datetime.date | None, data_final: datetime.date | None) -> None:
+    # Fragmento da sidebar: o botao reroda so este trecho. O resultado fica nos
+    # resultados da sessao e continua visivel nos reruns seguintes do mesmo periodo.
+    periodo = (data_inicial, data_final)
+    resultados = resultados_da_sessao(st.session_state)
+    df_inoperancia = None
+    if st.button("Consultar Inoperâncias"):
+        if not (data_inicial and data_final):
+            st.warning("Selecione o intervalo completo antes de consultar inoperâncias.")
+        else:
+            # A API ja carrega a regra de negocio de inoperancia.
+            # O dashboard so envia o periodo selecionado e exibe o retorno;
+            # periodos acima de 31 dias sao divididos em janelas pelo cliente.
+            barra_inoperancia = st.progress(0.0, text="Consultando inoperâncias...")
+
+            def _progresso_inoperancia(concluidas: int, total: int) -> None:
+                barra_inoperancia.progress(
+                    concluidas / total,
+                    text=f"Consultando inoperâncias... {concluidas}/{total} janelas",
+                )
+
+            try:
+                # Guardado compactado (datas em datetime64, nomes em category):
+                # a sessao nao fica com uma copia em texto do resultado.
+                df_inoperancia = resultados.guardar(
+                    "inoperancia",
+                    periodo,
+                    api_client.get_inoperancia(
+                        data_ini=data_inicial.strftime("%Y-%m-%d"),
+                        data_fim=data_final.strftime("%Y-%m-%d"),
+                        progresso=_progresso_inoperancia,
+                    ),
+                )
+            except RuntimeError as exc:
+                st.error(str(exc))
+                resultados.descartar("inoperancia")
+            finally:
+                barra_inoperancia.empty()
+    else:
+        df_inoperancia = resultados.obter("inoperancia", periodo)
+
+    if df_inoperancia is not None:
+        if not df_inoperancia.empty:
+            st.markdown("### Resultado de Inoperância no período selecionado")
+            st.dataframe(df_inoperancia)
+        else:
+            st.info("Nenhuma inoperância de 25h ou mais encontrada no período.")
+
 
 # =========== SIDEBAR (FILTRO DE DATA) ===========
 with st.sidebar:
@@ -98,7 +380,7 @@ with st.sidebar:
     """, unsafe_allow_html=True)
 
     st.header("Filtros")
-    hj = datetime.date.today()
+    hj = hoje()
     data_minima = datetime.date(2024, 1, 1)
     data_maxima = datetime.date(hj.year, hj.month, hj.day)
     data_intervalo = st.date_input(
@@ -108,128 +390,180 @@ with st.sidebar:
         max_value=data_maxima,
         format="DD/MM/YYYY"
     )
-    # Streamlit pode devolver:
-    # - tuple (start, end) quando o range está completo
-    # - date (uma data) enquanto o usuário ainda está escolhendo
-    # - tuple estranho/len != 2 em alguns casos de interação
-    if isinstance(data_intervalo, tuple):
-        if len(data_intervalo) == 2:
-            data_inicial, data_final = data_intervalo
-        elif len(data_intervalo) == 1:
-            data_inicial = data_final = data_intervalo[0]
+    data_inicial, data_final = _intervalo_selecionado(data_intervalo)
+
+    # Comparacao: um segundo periodo (padrao: o anterior, de mesma duracao)
+    # consultado junto com o principal para o radar selecionado.
+    periodo_comparacao = None
+    if st.checkbox(
+        "Comparar com outro período",
+        help="Mostra as variações do radar selecionado em relação a um segundo período.",
+    ):
+        if data_inicial and data_final and data_inicial <= data_final:
+            padrao_ini, padrao_fim = periodo_anterior(data_inicial, data_final)
+            comparacao_ini, comparacao_fim = _intervalo_selecionado(
+                st.date_input(
+                    "Período de comparação:",
+                    value=(max(padrao_ini, data_minima), max(padrao_fim, data_minima)),
+                    min_value=data_minima,
+                    max_value=data_maxima,
+                    format="DD/MM/YYYY",
+                )
+            )
+            if comparacao_ini and comparacao_fim and comparacao_ini <= comparacao_fim:
+                periodo_comparacao = (comparacao_ini, comparacao_fim)
         else:
-            data_inicial = data_final = None
-    elif isinstance(data_intervalo, datetime.date):
-        data_inicial = data_final = data_intervalo
-    else:
-        data_inicial = data_final = None
+            st.caption("Selecione primeiro o intervalo principal completo.")
 
-    # Botão de consulta de inoperância
-    if st.button("Consultar Inoperâncias"):
-        if not (data_inicial and data_final):
-            st.warning("Selecione o intervalo completo antes de consultar inoperâncias.")
-        else:
-            # A API ja carrega a regra de negocio de inoperancia.
-            # O dashboard so envia o periodo selecionado e exibe o retorno.
-            try:
-                df_inoperancia = api_client.get_inoperancia(
-                    data_ini=data_inicial.strftime("%Y-%m-%d"),
-                    data_fim=data_final.strftime("%Y-%m-%d"),
-                )
-            except RuntimeError as exc:
-                st.error(str(exc))
-                df_inoperancia = pd.DataFrame()
+    # Modo frota: colore todos os radares do mapa pelo % de excesso no período
+    modo_frota = st.checkbox(
+        "Colorir mapa por excesso de velocidade (frota)",
+        help="Consulta a distribuição de todos os radares no período selecionado.",
+    )
 
-            if df_inoperancia is not None and not df_inoperancia.empty:
-                st.markdown("### Resultado de Inoperância no período selecionado")
-                st.dataframe(df_inoperancia)
-            else:
-                st.info("Nenhuma inoperância de 25h ou mais encontrada no período.")
+    # Saude do OCR: fluxo x leituras de OCR de todos os radares no periodo
+    saude_ocr = st.checkbox(
+        "Verificar saúde do OCR da frota",
+        help="Compara o fluxo com as leituras de OCR de cada radar e lista os de aproveitamento baixo.",
+    )
+    limiar_ocr = SAUDE_OCR_LIMIAR
+    if saude_ocr:
+        limiar_ocr = st.number_input(
+            "Aproveitamento mínimo de OCR (%)",
+            min_value=0.0,
+            max_value=100.0,
+            value=float(SAUDE_OCR_LIMIAR),
+            step=5.0,
+        )
 
-# =========== TELA PRINCIPAL ===========
+    # Painel opcional com tempos de etapas, chamadas a API e cache
+    diagnostico = st.checkbox(
+        "Diagnóstico de desempenho",
+        help="Mostra o tempo de cada etapa deste rerun e as métricas do processo.",
+    )
 
-if equipamentos_validos.empty:
-    st.error("❌ Nenhum equipamento válido com latitude/longitude diferente de zero encontrado!")
-else:
-    map_center = [
-        equipamentos_validos['latitude'].mean(),
-        equipamentos_validos['longitude'].mean()
-    ]
-    m = folium.Map(location=map_center, zoom_start=12)
-    mapa_id_por_nome = {}
-
-    for _, row in equipamentos_validos.iterrows():
-        popup_text = f"Nome: {row['nome_processador']}<br>ID: {row['id']}"
-
-        # Escolhe a cor do ícone conforme status
-        if row['status'] == 1:
-            icon_path = "icon/icone_radar_ativo.png"
-        else:
-            icon_path = "icon/icone_radar_inativo.png"
-       
-        icon = folium.CustomIcon(
-            icon_path,
-            icon_size=(32,32),
-            icon_anchor=(16,16)
+    # Consulta de inoperância (fragmento: o botão não reroda a página toda)
+    _painel_inoperancia(data_inicial, data_final)
+
+@st.fragment
+def _mapa_e_equipamento(
+    equipamentos: Equipamentos,
+    conformidade_frota: pd.DataFrame | None,
+    data_inicial: datetime.date | None,
+    data_final: datetime.date | None,
+    periodo_comparacao: tuple[datetime.date, datetime.date] | None = None,
+) -> None:
+    # Fragmento: um clique no mapa reroda so o mapa e o painel do equipamento.
+    # Equipamentos, sidebar e modo frota ficam como estavam no ultimo rerun
+    # completo, que so acontece quando muda um filtro da sidebar.
+    cronometro = Rerun(metricas, total="mapa_equipamento_total")
+
+    equipamentos_validos = equipamentos.validos
+    pontos = conformidade_frota if conformidade_frota is not None else equipamentos_validos
+    por_area = len(pontos) > MAPA_MAX_MARCADORES
+
+    with cronometro.etapa("mapa"):
+        m = _para_desenho(
+            _mapa_equipamentos(equipamentos.versao, equipamentos_validos, conformidade_frota, por_area)
         )
-
-        folium.Marker(
-            location=[row['latitude'], row['longitude']],
-            tooltip=row['nome_processador'],
-            popup=popup_text,
-            icon=icon
-        ).add_to(m)
-        
-        mapa_id_por_nome[row['nome_processador']] = row['id']
+        camada = None
+        if por_area:
+            # Limites e zoom do ultimo desenho do mapa (valor do componente).
+            vista = st.session_state.get("mapa") or {}
+            zoom = int(vista.get("zoom") or ZOOM_INICIAL)
+            limites = ajustar_limites(limites_do_mapa(vista.get("bounds")), zoom)
+            camada, marcadores = _camada_mapa(pontos, conformidade_frota is not None, limites, zoom)
+            camada = _para_desenho(camada)
 
     st.markdown("#### Selecione um equipamento clicando no mapa ⤵️")
 
     col_map, col_leg = st.columns([4, 1], gap="large")
 
     with col_map:
-        map_result = st_folium(m, height=500, width=None, key="mapa")  # width=None -> responsivo
+        with cronometro.etapa("mapa_render"):
+            # Frota pequena: so o clique volta para o Python, e arrastar ou dar
+            # zoom no mapa nao dispara rerun nenhum. Frota grande: limites e
+            # zoom tambem voltam, para trocar a camada da area visivel.
+            map_result = st_folium(
+                m,
+                height=500,
+                width=None,  # width=None -> responsivo
+                key="mapa",
+                feature_group_to_add=camada,
+                returned_objects=(
+                    ["last_object_clicked_tooltip", "bounds", "zoom"]
+                    if por_area
+                    else ["last_object_clicked_tooltip"]
+                ),
+            )
+        if por_area:
+            st.caption(
+                f"{marcadores} marcador(es) na área visível, de {len(pontos)} radares. "
+                "Números indicam grupos de radares: aproxime o mapa para selecioná-los."
+            )
 
     with col_leg:
-        st.markdown(
-            """
-            <div style="
-                border:1px solid rgba(0,0,0,0.12);
-                border-radius:14px;
-                padding:12px 12px;
-                background:#ffffff;
-                color:#111827;
-            ">
-            <div style="font-weight:700; margin-bottom:10px;">Legenda</div>
-
-            <div style="display:flex; align-items:center; gap:10px; margin-bottom:10px;">
-                <img src="data:image/png;base64,{RADAR_ATIVO}" style="width:28px; height:28px;" />
-                <div><b>Ativo</b></div>
-            </div>
-
-            <div style="display:flex; align-items:center; gap:10px;">
-                <img src="data:image/png;base64,{RADAR_INATIVO}" style="width:28px; height:28px;" />
-                <div><b>Inativo</b></div>
-            </div>
-            </div>
-            """.format(
-                RADAR_ATIVO=_img_b64("icon/icone_radar_ativo.png"),
-                RADAR_INATIVO=_img_b64("icon/icone_radar_inativo.png"),
-            ),
-            unsafe_allow_html=True,
-        )
-
-    # Persistir seleção entre interações
-    if "equip_selecionado" not in st.session_state:
-        st.session_state.equip_selecionado = None
+        if conformidade_frota is not None:
+            itens_legenda = "".join(
+                f"""<div style="display:flex; align-items:center; gap:10px; margin-bottom:10px;">
+                    <span style="width:16px; height:16px; border-radius:50%; background:{cor}; display:inline-block;"></span>
+                    <div><b>{rotulo}</b></div>
+                </div>"""
+                for rotulo, cor in [(r, c) for r, c, _ in CLASSES_EXCESSO] + [("Sem dados", COR_SEM_DADOS)]
+            )
+            st.markdown(
+                f"""<div style="
+                    border:1px solid rgba(0,0,0,0.12);
+                    border-radius:14px;
+                    padding:12px 12px;
+                    background:#ffffff;
+                    color:#111827;
+                ">
+                <div style="font-weight:700; margin-bottom:10px;">Legenda</div>
+                {itens_legenda}
+                </div>""",
+                unsafe_allow_html=True,
+            )
+        else:
+            st.markdown(
+                """
+                <div style="
+                    border:1px solid rgba(0,0,0,0.12);
+                    border-radius:14px;
+                    padding:12px 12px;
+                    background:#ffffff;
+                    color:#111827;
+                ">
+                <div style="font-weight:700; margin-bottom:10px;">Legenda</div>
+
+                <div style="display:flex; align-items:center; gap:10px; margin-bottom:10px;">
+                    <img src="data:image/png;base64,{RADAR_ATIVO}" style="width:28px; height:28px;" />
+                    <div><b>Ativo</b></div>
+                </div>
+
+                <div style="display:flex; align-items:center; gap:10px;">
+                    <img src="data:image/png;base64,{RADAR_INATIVO}" style="width:28px; height:28px;" />
+                    <div><b>Inativo</b></div>
+                </div>
+                </div>
+                """.format(
+                    RADAR_ATIVO=icone_b64(ICONE_ATIVO),
+                    RADAR_INATIVO=icone_b64(ICONE_INATIVO),
+                ),
+                unsafe_allow_html=True,
+            )
 
-    equipamento_clicado = map_result.get("last_object_clicked_tooltip")
-    if equipamento_clicado:
+    # Tooltips de grupos de radares tambem chegam aqui; so nomes conhecidos contam.
+    equipamento_clicado = (map_result.get("last_object_clicked_tooltip") or "").strip()
+    if equipamentos.id_por_nome(equipamento_clicado) is not None:
         st.session_state.equip_selecionado = equipamento_clicado
 
     equipamento_selecionado = st.session_state.equip_selecionado  
-    equipamento_id = mapa_id_por_nome.get(equipamento_selecionado)
+    equipamento_id = equipamentos.id_por_nome(equipamento_selecionado)
+    # Busca as infos do equipamento selecionado (None se ele saiu da lista)
+    info_eq = equipamentos.por_id(equipamento_id)
 
-    if equipamento_selecionado:
+    if equipamento_selecionado and info_eq is not None:
         st.info(f"✅ Equipamento selecionado: {equipamento_selecionado}")
         if data_inicial and data_final:
             st.info(
@@ -238,8 +572,6 @@ else:
         else:
             st.info("✅ Selecione o período (intervalo completo) no calendário da sidebar.")
 
-        # Busca as infos do equipamento selecionado
-        info_eq = equipamentos_validos[equipamentos_validos["id"] == equipamento_id].iloc[0]
 
         # ===== Linha 1 (duas colunas) =====
         colA, colB = st.columns([2,2])  # mantém apenas 2 cards na primeira linha
@@ -266,121 +598,138 @@ else:
                 unsafe_allow_html=True,
             )
 
-        # Pré-criar bloco de 3 colunas para as linhas seguintes (velocidades e fluxo)
+        # Pré-criar bloco de 3 colunas para as linhas seguintes (velocidades e fluxo).
+        # Cada card vira um placeholder para ser preenchido assim que o dado
+        # correspondente chegar, sem esperar pelas outras consultas.
         col2A, col2B, col2C = st.columns([2,2,2])
+        with col2A:
+            card_media, card_total_ocr = st.empty(), st.empty()
+        with col2B:
+            card_moda, card_total_periodo = st.empty(), st.empty()
+        with col2C:
+            card_maxima, card_aproveitamento = st.empty(), st.empty()
 
         # Inicializar variáveis para evitar NameError quando não houver dados de velocidade
         df_velocidade = pd.DataFrame()
+        indicadores = None
+        resumo_servidor = None
+        futuros_comparacao = None
         total_veiculos_ocr = 0
-        pct_regulamentada = pct_dentro_tolerancia = pct_acima_tolerancia = 0.0
+        total_veiculos = 0
 
         if data_inicial and data_final and data_inicial <= data_final:
-            # A distribuicao continua sendo tratada no cliente porque os
-            # graficos e cards ja dependem desse formato agregado.
-            try:
-                df_velocidade = api_client.get_distribuicao_velocidade(
+            # Distribuicao (ou indicadores do servidor) e fluxo sao independentes:
+            # as duas consultas saem juntas e cada bloco de cards e desenhado
+            # quando a sua chegar. Comparando periodos, o histograma do
+            # periodo principal e sempre baixado (o grafico sobreposto usa).
+            futuros = api_client.buscar_periodo_equipamento(
+                equipamento_id=equipamento_id,
+                nome_processador=equipamento_selecionado,
+                data_ini=data_inicial.strftime("%Y-%m-%d"),
+                data_fim=data_final.strftime("%Y-%m-%d"),
+                velocidade_regulamentada=(
+                    float(info_eq['vel_regulamentada'])
+                    if INDICADORES_SERVIDOR and periodo_comparacao is None
+                    else None
+                ),
+            )
+            # As consultas do periodo de comparacao saem junto com as do
+            # principal, e nao depois dele: a espera total e a da consulta
+            # mais lenta das quatro. Resultados em cache voltam na hora.
+            if periodo_comparacao is not None:
+                futuros_comparacao = api_client.buscar_periodo_equipamento(
                     equipamento_id=equipamento_id,
-                    data_ini=data_inicial.strftime("%Y-%m-%d"),
-                    data_fim=data_final.strftime("%Y-%m-%d"),
-                )
-            except RuntimeError as exc:
-                st.error(str(exc))
-                df_velocidade = pd.DataFrame()
-
-            if df_velocidade is None or df_velocidade.empty:
-                st.warning("Nenhum dado de velocidade encontrado para o período e equipamento selecionados.")
-            else:
-                # ----- INDICADORES -----
-                velocidade_max = df_velocidade["velocidade"].max()
-                velocidade_moda = df_velocidade.loc[df_velocidade['contagem'].idxmax(), "velocidade"]
-                total_veiculos_ocr = df_velocidade["contagem"].sum()
-                velocidade_media = df_velocidade['velocidade'].mean()
-
-                # Agora usa a velocidade do equipamento:
-                velocidade_regulamentada = info_eq['vel_regulamentada']
-                margem_tolerancia = (velocidade_regulamentada * 0.1)
-
-                dentro_regulamentada = df_velocidade[df_velocidade["velocidade"] <= velocidade_regulamentada]["contagem"].sum()
-                acima_tolerancia = df_velocidade[df_velocidade["velocidade"] > (velocidade_regulamentada + margem_tolerancia)]["contagem"].sum()
-                dentro_tolerancia = total_veiculos_ocr - acima_tolerancia - dentro_regulamentada
-
-                pct_regulamentada = round(dentro_regulamentada / total_veiculos_ocr * 100,  2) if total_veiculos_ocr > 0 else 0
-                pct_dentro_tolerancia = round(dentro_tolerancia / total_veiculos_ocr * 100, 2) if total_veiculos_ocr > 0 else 0
-                pct_acima_tolerancia = round(acima_tolerancia / total_veiculos_ocr * 100, 2) if total_veiculos_ocr > 0 else 0
-   
-                # ===== Linha 2 (três colunas) =====
-                with col2A:
-                    st.markdown(
-                        f"""<div class="card-indicador">
-                            <div class="sub-label">Velocidade Média</div>
-                            <div class="destaque">{velocidade_media:.1f} km/h</div>
-                        </div>""",
-                        unsafe_allow_html=True,
-                    )
-                with col2B:
-                    st.markdown(
-                        f"""<div class="card-indicador">
-                            <div class="sub-label">Velocidade Mais Praticada</div>
-                            <div class="destaque">{velocidade_moda:.1f} km/h</div>
-                        </div>""",
-                        unsafe_allow_html=True,
-                    )
-                with col2C:
-                    st.markdown(
-                        f"""<div class="card-indicador">
-                            <div class="sub-label">Velocidade Máxima</div>
-                            <div class="destaque">{velocidade_max:.1f} km/h</div>
-                        </div>""",
-                        unsafe_allow_html=True,
-                    )
-                # ===== Linha 3 (usa mesmas 3 colunas) — lado esquerdo =====
-                with col2A:
-                    st.markdown(
-                        f"""<div class="card-indicador">
-                            <div class="sub-label">Total de Veículos Lidos (OCR)</div>
-                            <div class="destaque">{locale.format_string('%.0f', total_veiculos_ocr, grouping=True)}</div>
-                        </div>""",
-                        unsafe_allow_html=True,
-                    )
-
-        if data_inicial and data_final and data_inicial <= data_final:
-            # O fluxo total agora tambem vem da API, ja alinhado com a regra
-            # correta de somar volume_veiculos em dados_trafego.
-            try:
-                total_veiculos = api_client.get_fluxo(
                     nome_processador=equipamento_selecionado,
-                    data_ini=data_inicial.strftime("%Y-%m-%d"),
-                    data_fim=data_final.strftime("%Y-%m-%d"),
+                    data_ini=periodo_comparacao[0].strftime("%Y-%m-%d"),
+                    data_fim=periodo_comparacao[1].strftime("%Y-%m-%d"),
                 )
-            except RuntimeError as exc:
-                st.error(str(exc))
-                total_veiculos = 0
-
-            if total_veiculos <= 0:
-                st.warning("Nenhum dado de fluxo encontrado para o per?odo e equipamento selecionados.")
-            else:
+            consulta_por_futuro = {futuro: nome for nome, futuro in futuros.items()}
+
+            # Tempo ate a ultima consulta chegar, incluindo os cards.
+            with cronometro.etapa("consultas_equipamento"):
+                for futuro in as_completed(consulta_por_futuro):
+                    if consulta_por_futuro[futuro] == "indicadores":
+                        try:
+                            resumo, origem_resumo = futuro.result()
+                        except RuntimeError as exc:
+                            st.error(str(exc))
+                            continue
+
+                        if resumo.total <= 0:
+                            st.warning("Nenhum dado de velocidade encontrado para o período e equipamento selecionados.")
+                            continue
+
+                        # So o resumo do servidor e conferido com o calculo local
+                        # (o do cliente ja e o proprio calculo local).
+                        if origem_resumo == "servidor":
+                            resumo_servidor = resumo
+                        total_veiculos_ocr = resumo.total
+                        _cards_velocidade(card_media, card_moda, card_maxima, card_total_ocr, resumo)
+                    elif consulta_por_futuro[futuro] == "distribuicao":
+                        # A distribuicao continua sendo tratada no cliente porque os
+                        # graficos e cards ja dependem desse formato agregado.
+                        try:
+                            df_velocidade = futuro.result()
+                        except RuntimeError as exc:
+                            st.error(str(exc))
+                            df_velocidade = pd.DataFrame()
+
+                        if df_velocidade is None or df_velocidade.empty:
+                            st.warning("Nenhum dado de velocidade encontrado para o período e equipamento selecionados.")
+                            continue
+
+                        # ----- INDICADORES -----
+                        # Todos os indicadores saem de uma unica passada sobre a
+                        # distribuicao, usando a velocidade regulamentada do equipamento.
+                        chave_painel = (
+                            int(equipamento_id),
+                            data_inicial.isoformat(),
+                            data_final.isoformat(),
+                            float(info_eq['vel_regulamentada']),
+                            _assinatura_distribuicao(df_velocidade),
+                        )
+                        with cronometro.etapa("indicadores"):
+                            indicadores = _indicadores_equipamento(*chave_painel, df_velocidade)
+                        total_veiculos_ocr = indicadores.total
+                        _cards_velocidade(
+                            card_media, card_moda, card_maxima, card_total_ocr,
+                            ResumoIndicadores.de_indicadores(indicadores),
+                        )
+                    else:
+                        # O fluxo total agora tambem vem da API, ja alinhado com a regra
+                        # correta de somar volume_veiculos em dados_trafego.
+                        try:
+                            total_veiculos = futuro.result()
+                        except RuntimeError as exc:
+                            st.error(str(exc))
+                            total_veiculos = 0
+
+                        if total_veiculos <= 0:
+                            st.warning("Nenhum dado de fluxo encontrado para o período e equipamento selecionados.")
+                            continue
+
+                        # ===== Linha 3 (complemento na coluna do meio) =====
+                        card_total_periodo.markdown(
+                            f"""<div class="card-indicador">
+                                <div class="sub-label">Total de Veículos no Período</div>
+                                <div class="destaque">{locale.format_string('%.0f', total_veiculos, grouping=True)}</div>
+                            </div>""",
+                            unsafe_allow_html=True,
+                        )
+
+            # O aproveitamento depende das duas consultas, entao so entra no fim.
+            if total_veiculos > 0:
                 aproveitamento_ocr = 0.0  # inicializa
-                if total_veiculos > 0 and total_veiculos_ocr > 0:
+                if total_veiculos_ocr > 0:
                     aproveitamento_ocr = (total_veiculos_ocr / total_veiculos) * 100
 
-                # ===== Linha 3 (complemento nas colunas do meio e direita) =====
-                with col2B:
-                    st.markdown(
-                        f"""<div class="card-indicador">
-                            <div class="sub-label">Total de Veículos no Período</div>
-                            <div class="destaque">{locale.format_string('%.0f', total_veiculos, grouping=True)}</div>
-                        </div>""",
-                        unsafe_allow_html=True,
-                    )
-
-                with col2C:
-                    st.markdown(
-                        f"""<div class="card-indicador">
-                            <div class="sub-label">Aproveitamento de OCR</div>
-                            <div class="destaque">{locale.format_string('%.2f', aproveitamento_ocr, grouping=True)} %</div>
-                        </div>""",
-                        unsafe_allow_html=True,
-                    )
+                card_aproveitamento.markdown(
+                    f"""<div class="card-indicador">
+                        <div class="sub-label">Aproveitamento de OCR</div>
+                        <div class="destaque">{locale.format_string('%.2f', aproveitamento_ocr, grouping=True)} %</div>
+                    </div>""",
+                    unsafe_allow_html=True,
+                )
 
         # fecha o contêiner de cards que evita quebra na impressão
         st.markdown('</div>', unsafe_allow_html=True)
@@ -416,86 +765,79 @@ else:
                 color: #444;
                 margin-bottom: 0.25rem;
             }
+            .card-comparacao {
+                height: auto;
+                min-height: 90px;
+            }
+            .variacao {
+                font-size: 1.1rem;
+                font-weight: bold;
+            }
             </style>
         """, unsafe_allow_html=True)
         
         # >>> quebra de página depois do mapa e dos cards (vai iniciar a página 2)
         st.markdown('<div class="print-page-break"></div>', unsafe_allow_html=True)
 
+        # Indicadores do servidor: os cards ja estao prontos, e o histograma
+        # completo so e baixado quando os graficos forem pedidos.
+        if (
+            INDICADORES_SERVIDOR
+            and periodo_comparacao is None
+            and total_veiculos_ocr > 0
+            and st.toggle(
+                "Gráficos da distribuição",
+                key="graficos_distribuicao",
+                help="Baixa a distribuição completa de velocidades do período para montar os gráficos.",
+            )
+        ):
+            with cronometro.etapa("consultas_graficos"):
+                try:
+                    df_velocidade = api_client.get_distribuicao_velocidade(
+                        equipamento_id=equipamento_id,
+                        data_ini=data_inicial.strftime("%Y-%m-%d"),
+                        data_fim=data_final.strftime("%Y-%m-%d"),
+                    )
+                except RuntimeError as exc:
+                    st.error(str(exc))
+                    df_velocidade = pd.DataFrame()
+
+            if not df_velocidade.empty:
+                chave_painel = (
+                    int(equipamento_id),
+                    data_inicial.isoformat(),
+                    data_final.isoformat(),
+                    float(info_eq['vel_regulamentada']),
+                    _assinatura_distribuicao(df_velocidade),
+                )
+                with cronometro.etapa("indicadores"):
+                    indicadores = _indicadores_equipamento(*chave_painel, df_velocidade)
+
+                if resumo_servidor is not None:
+                    diferentes = divergencias(
+                        resumo_servidor, ResumoIndicadores.de_indicadores(indicadores)
+                    )
+                    if diferentes:
+                        logger.warning(
+                            "Indicadores do servidor divergem do calculo local (equipamento %s, %s a %s): %s",
+                            equipamento_id, data_inicial, data_final, "; ".join(diferentes),
+                        )
+                        st.caption(
+                            "⚠️ Os indicadores da API divergem do cálculo sobre a distribuição "
+                            f"(servidor x local): {'; '.join(diferentes)}"
+                        )
+
         if df_velocidade is None or df_velocidade.empty:
             pass
         else:
             # ======= GRÁFICOS =======
 
-            # >>> tamanhos consistentes p/ caber 2 por página
-            common_margins = dict(t=40, b=40, l=40, r=20)
-
-            # ---- GRÁFICO DE DISTRIBUIÇÃO (barras) ----
-            fig_bar = px.bar(
-                df_velocidade, x="velocidade", y="contagem",
-                labels={"velocidade": "Velocidade (km/h)", "contagem": "Quantidade"},
-                title=f"Distribuição das Velocidades ({data_inicial.strftime('%d/%m/%Y')} a {data_final.strftime('%d/%m/%Y')})"
-            )
-            fig_bar.update_layout(height=420, margin=common_margins)
-
-            # ---- PIZZA ----
-            donut_df = pd.DataFrame({
-                "Categoria": ["Abaixo da Regulamentada", "Dentro da Tolerância de 10%", "Excesso de Velocidade"],
-                "Percentual": [pct_regulamentada, pct_dentro_tolerancia, pct_acima_tolerancia],
-                "Valores": [dentro_regulamentada, dentro_tolerancia, acima_tolerancia]
-            })
-            fig_pizza = px.pie(
-                donut_df, names="Categoria", values="Valores",
-                hole=0.5,
-                color="Categoria",
-                color_discrete_map={
-                    "Excesso de Velocidade": "red",
-                    "Dentro da Tolerância de 10%": "orange",
-                    "Abaixo da Regulamentada": "green"
-                },
-                title="Excessos de Velocidade"
-            )
-            fig_pizza.update_layout(height=420, margin=common_margins, legend=dict(orientation="h"))
-
-            # ---- FAIXAS (horizontal) ----
-            bins = [0, 20, 30, 40, 50, 60, 80, 90, 100, 120, float("inf")]
-            labels = [
-                "Abaixo de 20 km/h", "21 a 30 km/h", "31 a 40 km/h", "41 a 50 km/h", "51 a 60 km/h",
-                "61 a 80 km/h", "81 a 90 km/h", "91 a 100 km/h", "101 a 120 km/h", "Acima de 120 km/h"
-            ]
-
-            df_velocidade["faixa"] = pd.cut(
-                df_velocidade["velocidade"],
-                bins=bins,
-                labels=labels,
-                right=True
-            )
-
-            faixas = df_velocidade.groupby("faixa")["contagem"].sum().reset_index()
-
-            fig_box = px.bar(
-                faixas,
-                x="contagem",
-                y="faixa",
-                orientation="h",
-                text="contagem",  # adiciona valores nas barras
-                labels={"contagem": "Quantidade", "faixa": "Faixa de velocidade"},
-                title="Distribuição de Veículos por Faixa de Velocidade"
-            )
-
-            # posição do texto fora das barras
-            fig_box.update_traces(textposition="outside")
-
-            # calcula o maior valor para abrir espaço para o texto "fora" da barra
-            mc = pd.to_numeric(faixas["contagem"], errors="coerce")
-            max_contagem = float(mc.max()) if mc.notna().any() else 0.0
-            xmax = (max_contagem * 1.18) if max_contagem > 0 else 10  # 15% de folga (ajuste se quiser)
-
-            fig_box.update_layout(
-                height=420,
-                xaxis=dict(title="Quantidade", range=[0, xmax]),
-                yaxis=dict(title="Faixa de Velocidade")
-            )
+            # Figuras montadas uma vez por (equipamento, periodo, velocidade
+            # regulamentada) e reaproveitadas nos reruns seguintes.
+            with cronometro.etapa("graficos"):
+                fig_bar, fig_pizza, fig_box = _graficos_equipamento(
+                    *chave_painel, df_velocidade, indicadores
+                )
 
             # ===== Página 2: gráfico de distribuição SOZINHO =====
             st.markdown('<div class="report-section avoid-break">', unsafe_allow_html=True)
@@ -523,8 +865,267 @@ else:
 
             st.markdown('</div>', unsafe_allow_html=True)
 
+        # ======= COMPARACAO ENTRE PERIODOS =======
+        if futuros_comparacao is not None:
+            comparacao_ini, comparacao_fim = periodo_comparacao
+            df_referencia = pd.DataFrame()
+            fluxo_referencia = 0
+            # As consultas ja correram em paralelo com as do periodo principal;
+            # aqui normalmente so se recolhe o resultado.
+            with cronometro.etapa("consultas_comparacao"):
+                try:
+                    df_referencia = futuros_comparacao["distribuicao"].result()
+                except RuntimeError as exc:
+                    st.error(str(exc))
+                try:
+                    fluxo_referencia = futuros_comparacao["fluxo"].result()
+                except RuntimeError as exc:
+                    st.error(str(exc))
+
+            indicadores_referencia = None
+            if df_referencia is not None and not df_referencia.empty:
+                with cronometro.etapa("indicadores"):
+                    indicadores_referencia = _indicadores_equipamento(
+                        int(equipamento_id),
+                        comparacao_ini.isoformat(),
+                        comparacao_fim.isoformat(),
+                        float(info_eq['vel_regulamentada']),
+                        _assinatura_distribuicao(df_referencia),
+                        df_referencia,
+                    )
+
+            atual = ResultadoPeriodo(data_inicial, data_final, indicadores, total_veiculos)
+            referencia = ResultadoPeriodo(
+                comparacao_ini, comparacao_fim, indicadores_referencia, fluxo_referencia
+            )
+
+            st.markdown(f"### Comparação: {atual.rotulo} x {referencia.rotulo}")
+            st.markdown('<div class="report-section avoid-break">', unsafe_allow_html=True)
+            for coluna, variacao in zip(st.columns(4), variacoes(atual, referencia)):
+                with coluna:
+                    _card_variacao(st.empty(), variacao, referencia.rotulo)
+
+            if indicadores is None or indicadores_referencia is None:
+                st.info("Sem dados de velocidade em um dos períodos: não há distribuições para sobrepor.")
+            else:
+                with cronometro.etapa("graficos"):
+                    fig_comparacao = _grafico_comparacao(
+                        int(equipamento_id),
+                        (data_inicial.isoformat(), data_final.isoformat()),
+                        (comparacao_ini.isoformat(), comparacao_fim.isoformat()),
+                        float(info_eq['vel_regulamentada']),
+                        (
+                            _assinatura_distribuicao(df_velocidade),
+                            _assinatura_distribuicao(df_referencia),
+                        ),
+                        df_velocidade,
+                        df_referencia,
+                        atual.rotulo,
+                        referencia.rotulo,
+                    )
+                st.plotly_chart(fig_comparacao, use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        # ======= PERFIL DIA A DIA =======
+        # Sob demanda: uma consulta por dia, em lote, com os dias fechados
+        # guardados no store de histogramas diarios.
+        if data_inicial and data_final and data_inicial <= data_final and st.toggle(
+            "Perfil dia a dia",
+            key="perfil_diario",
+            help="Velocidade média, V85 e % de excesso de cada dia do período.",
+        ):
+            dias_periodo = (data_final - data_inicial).days + 1
+            if dias_periodo > PERFIL_MAX_DIAS:
+                st.info(f"O perfil dia a dia aceita até {PERFIL_MAX_DIAS} dias; selecione um período menor.")
+            else:
+                barra_perfil = st.progress(0.0, text="Consultando dias do período...")
+
+                def _progresso_perfil(concluidos: int, total: int) -> None:
+                    barra_perfil.progress(
+                        concluidos / total,
+                        text=f"Consultando dias do período... {concluidos}/{total}",
+                    )
+
+                histogramas = None
+                try:
+                    with cronometro.etapa("perfil_consultas"):
+                        histogramas = api_client.get_distribuicao_por_dia(
+                            equipamento_id,
+                            data_inicial.isoformat(),
+                            data_final.isoformat(),
+                            progresso=_progresso_perfil,
+                        )
+                except RuntimeError as exc:
+                    st.error(str(exc))
+                finally:
+                    barra_perfil.empty()
+
+                if histogramas is not None:
+                    with cronometro.etapa("perfil_graficos"):
+                        fig_perfil, fig_faixas_dia = _graficos_perfil(
+                            int(equipamento_id),
+                            data_inicial.isoformat(),
+                            data_final.isoformat(),
+                            float(info_eq['vel_regulamentada']),
+                            _assinatura_histogramas(histogramas),
+                            histogramas,
+                        )
+                    st.markdown('<div class="report-section avoid-break">', unsafe_allow_html=True)
+                    st.plotly_chart(fig_perfil, use_container_width=True)
+                    st.plotly_chart(fig_faixas_dia, use_container_width=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
+
 
     elif data_inicial and data_final and data_inicial > data_final:
         st.info("A data inicial deve ser menor ou igual à data final.")
     else:
         st.info("Clique em um equipamento no mapa para começar.")
+
+    cronometro.finalizar()
+    st.session_state.etapas_mapa_equipamento = cronometro.etapas
+
+# =========== TELA PRINCIPAL ===========
+
+if equipamentos_validos.empty:
+    st.error("❌ Nenhum equipamento válido com latitude/longitude diferente de zero encontrado!")
+else:
+    conformidade_frota = None
+    if modo_frota:
+        if data_inicial and data_final and data_inicial <= data_final:
+            barra_frota = st.progress(0.0, text="Consultando radares da frota...")
+
+            def _progresso_frota(concluidos: int, total: int) -> None:
+                barra_frota.progress(
+                    concluidos / total,
+                    text=f"Consultando radares da frota... {concluidos}/{total}",
+                )
+
+            try:
+                with rerun.etapa("frota"):
+                    resultado_frota = buscar_conformidade_frota(
+                        api_client,
+                        equipamentos_validos,
+                        data_ini=data_inicial.strftime("%Y-%m-%d"),
+                        data_fim=data_final.strftime("%Y-%m-%d"),
+                        progresso=_progresso_frota,
+                    )
+            finally:
+                barra_frota.empty()
+
+            conformidade_frota = resultado_frota.conformidade
+            if resultado_frota.falhas:
+                st.warning(
+                    f"{len(resultado_frota.falhas)} equipamento(s) não puderam ser consultados "
+                    "e aparecem no mapa como sem dados."
+                )
+        else:
+            st.info("Selecione um período válido na sidebar para colorir o mapa por excesso de velocidade.")
+
+    if conformidade_frota is not None:
+        with st.expander("Ranking de excesso de velocidade da frota", expanded=False):
+            st.dataframe(ranking_excesso(conformidade_frota), hide_index=True, use_container_width=True)
+
+    if saude_ocr:
+        if data_inicial and data_final and data_inicial <= data_final:
+            barra_ocr = st.progress(0.0, text="Verificando OCR da frota...")
+
+            def _progresso_ocr(concluidas: int, total: int) -> None:
+                barra_ocr.progress(
+                    concluidas / total,
+                    text=f"Verificando OCR da frota... {concluidas}/{total} consultas",
+                )
+
+            # Com o modo frota ligado no mesmo periodo, os totais de OCR ja
+            # estao em cache e so o fluxo e consultado.
+            try:
+                with rerun.etapa("saude_ocr"):
+                    resultado_ocr = buscar_saude_ocr(
+                        api_client,
+                        equipamentos_validos,
+                        data_ini=data_inicial.strftime("%Y-%m-%d"),
+                        data_fim=data_final.strftime("%Y-%m-%d"),
+                        progresso=_progresso_ocr,
+                    )
+            finally:
+                barra_ocr.empty()
+
+            degradados = radares_degradados(resultado_ocr.saude, limiar_ocr)
+            with st.expander(
+                f"Radares com OCR degradado ({len(degradados)} abaixo de {limiar_ocr:g}%)",
+                expanded=not degradados.empty,
+            ):
+                if resultado_ocr.falhas:
+                    st.warning(
+                        f"{len(resultado_ocr.falhas)} equipamento(s) não puderam ser consultados "
+                        "e ficaram fora da verificação."
+                    )
+                if degradados.empty:
+                    st.success("Nenhum radar com aproveitamento de OCR abaixo do limiar no período.")
+                else:
+                    st.dataframe(tabela_degradados(degradados), hide_index=True, use_container_width=True)
+                    # Mapa so de consulta: nenhum evento volta para o Python.
+                    st_folium(
+                        _para_desenho(
+                            _mapa_saude_ocr(
+                                equipamentos.versao,
+                                tuple(degradados["id"].tolist()),
+                                equipamentos_validos,
+                                degradados,
+                            )
+                        ),
+                        height=400,
+                        width=None,
+                        key="mapa_saude_ocr",
+                        returned_objects=[],
+                    )
+        else:
+            st.info("Selecione um período válido na sidebar para verificar o OCR da frota.")
+
+    _mapa_e_equipamento(equipamentos, conformidade_frota, data_inicial, data_final, periodo_comparacao)
+
+
+# =========== DIAGNOSTICO DE DESEMPENHO ===========
+rerun.finalizar()
+
+if diagnostico:
+    with st.sidebar:
+        st.markdown("### Diagnóstico de desempenho")
+        # Cliques no mapa reexecutam so o fragmento; a tabela mostra o ultimo
+        # rerun completo, e as medias do processo incluem os fragmentos.
+        st.caption("Etapas do último rerun completo")
+        etapas = [*rerun.etapas[:-1], *st.session_state.etapas_mapa_equipamento, rerun.etapas[-1]]
+        st.dataframe(
+            pd.DataFrame(
+                [(etapa, round(duracao * 1000, 1)) for etapa, duracao in etapas],
+                columns=["etapa", "ms"],
+            ),
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.caption("Etapas no processo (p50/p95)")
+        st.dataframe(pd.DataFrame(metricas.resumo_etapas()), hide_index=True, use_container_width=True)
+        st.caption("Chamadas à API por origem (rede, 304, cache, disco)")
+        st.dataframe(pd.DataFrame(metricas.resumo_api()), hide_index=True, use_container_width=True)
+        esperas = metricas.resumo_esperas()
+        if esperas:
+            st.caption("Espera na fila do limitador por endpoint (p50/p95)")
+            st.dataframe(pd.DataFrame(esperas), hide_index=True, use_container_width=True)
+        with st.expander("Cache e limitador"):
+            st.json(api_client.cache_stats())
+        with st.expander("Registro de equipamentos"):
+            st.json(registro_equipamentos.stats())
+        memoria = memoria_da_sessao(st.session_state)
+        st.caption(
+            f"Memória desta sessão: {memoria['KB'].sum():,.1f} KB "
+            f"(resultados limitados a {SESSAO_MEMORIA_MAX_MB:g} MB)"
+        )
+        # Chaves de widgets (0 KB) nao entram na tabela, so no total.
+        st.dataframe(memoria[memoria["KB"] > 0].head(10), hide_index=True, use_container_width=True)
+        with st.expander("Resultados da sessão"):
+            st.json(resultados_da_sessao(st.session_state).stats())
+        st.download_button(
+            "Exportar métricas (Prometheus)",
+            data=metricas.exportar_prometheus(),
+            file_name="metricas_dashboard.prom",
+            mime="text/plain",
+        )
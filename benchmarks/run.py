@@ -0,0 +1,332 @@
+"""
+Benchmark do dashboard contra uma mobilidade-api local com dados sinteticos.
+
+Mede, por cenario, a latencia a frio (todos os caches do processo vazios) e
+a quente (mesma interacao repetida), quantas chamadas cada interacao faz a
+API e o pico de memoria alocada (tracemalloc). O resultado pode ser salvo
+como baseline e comparado em execucoes futuras:
+
+    python benchmarks/run.py --salvar benchmarks/baselines/padrao.json
+    python benchmarks/run.py --comparar benchmarks/baselines/padrao.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_api import StubAPI, StubConfig  # noqa: E402
+
+APP = str(RAIZ / "app.py")
+TIMEOUT_APP_S = 120
+
+
+@dataclass
+class Cenario:
+    nome: str
+    descricao: str
+    # `preparar` monta o estado anterior a interacao (nao medido) e devolve o
+    # que `executar` precisa; so `executar` entra na medicao.
+    preparar: Callable[[], Any]
+    executar: Callable[[Any], None]
+
+
+def _configurar_ambiente(stub: StubAPI) -> None:
+    # Precisa acontecer antes de importar api_client/app, que leem o ambiente
+    # ao carregar. Cache em disco, aquecedor e exportacao de metricas ficam
+    # desligados para a medicao depender so do codigo.
+    os.environ["API_BASE_URL"] = stub.base_url
+    os.environ["API_KEY"] = "benchmark"
+    os.environ["API_DISK_CACHE_DIR"] = ""
+    os.environ["API_AQUECEDOR_ATIVO"] = "false"
+    os.environ["METRICAS_PROMETHEUS_ARQUIVO"] = ""
+
+
+def limpar_caches() -> None:
+    """Esvazia todos os caches do processo: o proximo passo roda a frio."""
+
+    import streamlit as st
+
+    import api_client
+    import equipamentos
+    import frota
+    import mapa
+    import saude_ocr
+
+    api_client.response_cache.clear()
+    api_client.validadores_http.clear()
+    api_client.distribuicao_diaria.clear()
+    equipamentos.registro_equipamentos.clear()
+    frota._cache_frota.clear()
+    saude_ocr._cache_saude.clear()
+    mapa.icone_b64.cache_clear()
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+def _periodo() -> tuple[date, date]:
+    # Ultimos 30 dias fechados: o caso mais comum de consulta historica.
+    from configuracao import hoje
+
+    ontem = hoje() - timedelta(days=1)
+    return ontem - timedelta(days=29), ontem
+
+
+def montar_cenarios(stub: StubAPI) -> list[Cenario]:
+    from streamlit.testing.v1 import AppTest
+
+    from api_client import APIClient
+    from frota import buscar_conformidade_frota
+
+    data_ini, data_fim = _periodo()
+    ini, fim = data_ini.isoformat(), data_fim.isoformat()
+    radar = stub.equipamentos[1]
+
+    def _app() -> AppTest:
+        return AppTest.from_file(APP, default_timeout=TIMEOUT_APP_S)
+
+    def _app_carregado() -> AppTest:
+        at = _app()
+        at.run()
+        return at
+
+    def _selecionar(at: AppTest) -> AppTest:
+        at.session_state["equip_selecionado"] = radar["nome_processador"]
+        at.sidebar.date_input[0].set_value((data_ini, data_fim))
+        return at
+
+    def _rodar(at: AppTest) -> None:
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"app.py falhou: {at.exception[0].message}")
+
+    def _modo_frota(at: AppTest) -> None:
+        at.sidebar.date_input[0].set_value((data_ini, data_fim))
+        next(c for c in at.sidebar.checkbox if c.label.startswith("Colorir")).check()
+        _rodar(at)
+
+    def _radar_selecionado() -> AppTest:
+        at = _selecionar(_app_carregado())
+        at.run()
+        return at
+
+    def _frota() -> tuple[APIClient, Any]:
+        cliente = APIClient()
+        equipamentos = cliente.get_equipamentos()
+        return cliente, equipamentos[(equipamentos["latitude"] != 0) & (equipamentos["longitude"] != 0)]
+
+    def _radar_periodo(cliente: APIClient) -> None:
+        futuros = cliente.buscar_periodo_equipamento(
+            radar["id"], ini, fim, nome_processador=radar["nome_processador"]
+        )
+        for futuro in futuros.values():
+            futuro.result()
+
+    inoperancia_ini = (data_fim - timedelta(days=89)).isoformat()
+
+    return [
+        Cenario(
+            "cliente_equipamentos",
+            "APIClient.get_equipamentos()",
+            APIClient,
+            lambda cliente: cliente.get_equipamentos(),
+        ),
+        Cenario(
+            "cliente_radar_periodo",
+            "distribuicao + fluxo de um radar em 30 dias",
+            APIClient,
+            _radar_periodo,
+        ),
+        Cenario(
+            "cliente_inoperancia_90d",
+            "inoperancia de 90 dias (janelas de 31 dias)",
+            APIClient,
+            lambda cliente: cliente.get_inoperancia(inoperancia_ini, fim),
+        ),
+        Cenario(
+            "cliente_frota",
+            "conformidade de toda a frota em 30 dias",
+            _frota,
+            lambda estado: buscar_conformidade_frota(estado[0], estado[1], ini, fim),
+        ),
+        Cenario(
+            "app_carga_inicial",
+            "primeiro rerun do app.py (mapa, sem radar selecionado)",
+            _app,
+            _rodar,
+        ),
+        Cenario(
+            "app_selecionar_radar",
+            "rerun apos selecionar radar e periodo de 30 dias",
+            lambda: _selecionar(_app_carregado()),
+            _rodar,
+        ),
+        Cenario(
+            "app_rerun_radar",
+            "rerun sem mudanca com radar e periodo selecionados",
+            _radar_selecionado,
+            _rodar,
+        ),
+        Cenario(
+            "app_modo_frota",
+            "rerun ao ligar o mapa por excesso de velocidade",
+            _app_carregado,
+            _modo_frota,
+        ),
+    ]
+
+
+def _executar_medido(stub: StubAPI, cenario: Cenario, frio: bool) -> tuple[float, int]:
+    estado = cenario.preparar()
+    if frio:
+        limpar_caches()
+    stub.zerar_chamadas()
+    inicio = time.perf_counter()
+    cenario.executar(estado)
+    return time.perf_counter() - inicio, stub.total_chamadas()
+
+
+def medir(stub: StubAPI, cenario: Cenario, repeticoes: int) -> dict[str, float]:
+    frio = [_executar_medido(stub, cenario, frio=True) for _ in range(repeticoes)]
+
+    # A rodada a frio anterior ja deixou os caches aquecidos para esta.
+    quente = [_executar_medido(stub, cenario, frio=False) for _ in range(repeticoes)]
+
+    # Pico de memoria em uma rodada a frio separada: o tracemalloc deixa o
+    # codigo mais lento e nao pode contaminar as latencias.
+    estado = cenario.preparar()
+    limpar_caches()
+    tracemalloc.start()
+    try:
+        cenario.executar(estado)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "frio_ms": round(statistics.median(t for t, _ in frio) * 1000, 1),
+        "quente_ms": round(statistics.median(t for t, _ in quente) * 1000, 1),
+        "chamadas_frio": max(c for _, c in frio),
+        "chamadas_quente": max(c for _, c in quente),
+        "pico_mb": round(pico / 2**20, 2),
+    }
+
+
+def comparar(atual: dict[str, Any], baseline: dict[str, Any], tolerancia: float) -> list[str]:
+    """
+    Lista as regressoes em relacao a baseline.
+
+    Latencia e memoria podem variar ate `tolerancia` (fracao) e, na latencia,
+    pelo menos 5 ms, para ruido de medicao nao virar regressao; numero de
+    chamadas a API nao pode aumentar.
+    """
+
+    regressoes = []
+    for nome, base in baseline["cenarios"].items():
+        medido = atual["cenarios"].get(nome)
+        if medido is None:
+            continue
+        for metrica in ("frio_ms", "quente_ms"):
+            limite = max(base[metrica] * (1 + tolerancia), base[metrica] + 5)
+            if medido[metrica] > limite:
+                regressoes.append(f"{nome}.{metrica}: {base[metrica]} -> {medido[metrica]}")
+        for metrica in ("chamadas_frio", "chamadas_quente"):
+            if medido[metrica] > base[metrica]:
+                regressoes.append(f"{nome}.{metrica}: {base[metrica]} -> {medido[metrica]}")
+        if medido["pico_mb"] > base["pico_mb"] * (1 + tolerancia):
+            regressoes.append(f"{nome}.pico_mb: {base['pico_mb']} -> {medido['pico_mb']}")
+    return regressoes
+
+
+def _imprimir(resultado: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    colunas = ("frio_ms", "quente_ms", "chamadas_frio", "chamadas_quente", "pico_mb")
+    print(f"{'cenario':<26}" + "".join(f"{c:>17}" for c in colunas))
+    for nome, medido in resultado["cenarios"].items():
+        base = (baseline or {}).get("cenarios", {}).get(nome, {})
+        celulas = []
+        for c in colunas:
+            texto = f"{medido[c]}"
+            if c in base:
+                texto += f" ({base[c]})"
+            celulas.append(f"{texto:>17}")
+        print(f"{nome:<26}" + "".join(celulas))
+    if baseline is not None:
+        print("\nentre parenteses: baseline")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--equipamentos", type=int, default=StubConfig.equipamentos)
+    parser.add_argument("--velocidades", type=int, default=StubConfig.velocidades)
+    parser.add_argument("--latencia-ms", type=float, default=StubConfig.latencia_ms)
+    parser.add_argument("--etag", action="store_true", help="API local envia ETag e responde 304")
+    parser.add_argument("--capacidade", type=int, default=StubConfig.capacidade, help="API local responde 429 acima de N simultaneas")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--cenarios", nargs="*", help="roda so os cenarios informados")
+    parser.add_argument("--salvar", type=Path, help="grava o resultado (JSON) como baseline")
+    parser.add_argument("--comparar", type=Path, help="baseline (JSON) para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="folga de latencia/memoria (fracao)")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        equipamentos=args.equipamentos,
+        velocidades=args.velocidades,
+        latencia_ms=args.latencia_ms,
+        etag=args.etag,
+        capacidade=args.capacidade,
+    )
+    stub = StubAPI(config).iniciar()
+    try:
+        _configurar_ambiente(stub)
+        cenarios = montar_cenarios(stub)
+        if args.cenarios:
+            cenarios = [c for c in cenarios if c.nome in args.cenarios]
+
+        resultado: dict[str, Any] = {
+            "config": asdict(config),
+            "repeticoes": args.repeticoes,
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "data": date.today().isoformat(),
+            "cenarios": {},
+        }
+        for cenario in cenarios:
+            print(f"- {cenario.nome}: {cenario.descricao}", file=sys.stderr)
+            resultado["cenarios"][cenario.nome] = medir(stub, cenario, args.repeticoes)
+    finally:
+        stub.parar()
+
+    baseline = json.loads(args.comparar.read_text(encoding="utf-8")) if args.comparar else None
+    _imprimir(resultado, baseline)
+
+    if args.salvar:
+        args.salvar.parent.mkdir(parents=True, exist_ok=True)
+        args.salvar.write_text(json.dumps(resultado, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    if baseline is not None:
+        if baseline.get("config") != resultado["config"]:
+            print("\naviso: baseline gerada com outra escala de dados", file=sys.stderr)
+        regressoes = comparar(resultado, baseline, args.tolerancia)
+        if regressoes:
+            print("\nRegressoes:")
+            for linha in regressoes:
+                print(f"  {linha}")
+            return 1
+        print("\nSem regressoes em relacao a baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass(frozen=True)
+class StubConfig:
+    """
+    Escala dos dados sinteticos servidos pela API local.
+
+    - equipamentos: quantos radares `/equipamentos` devolve
+    - velocidades: quantas velocidades distintas cada distribuicao tem
+    - latencia_ms: atraso artificial de cada resposta (simula rede + banco)
+    - etag: envia ETag e responde 304 a If-None-Match
+    - capacidade: requisicoes simultaneas atendidas; acima disso responde
+      429 com Retry-After (0 = sem limite)
+    """
+
+    equipamentos: int = 200
+    velocidades: int = 120
+    latencia_ms: float = 20.0
+    etag: bool = False
+    capacidade: int = 0
+    semente: int = 1
+
+
+def _semente(*partes: Any) -> int:
+    # hash() muda entre processos; crc32 deixa os dados iguais em toda execucao.
+    return zlib.crc32(repr(partes).encode("utf-8"))
+
+
+class StubAPI:
+    """
+    Servidor HTTP local que imita a mobilidade-api com dados sinteticos.
+
+    Implementa `/equipamentos`, `/equipamentos/inoperancia`,
+    `/velocidades/distribuicao`, `/velocidades/indicadores` e `/trafego/fluxo`
+    no mesmo formato da API real e conta as chamadas recebidas por endpoint.
+    """
+
+    def __init__(self, config: StubConfig = StubConfig()) -> None:
+        self.config = config
+        rng = random.Random(config.semente)
+        self.equipamentos = [
+            {
+                "id": i + 1,
+                "nome_processador": f"RADAR{i + 1:05d}",
+                "latitude": round(-8.05 - rng.random() * 0.2, 6),
+                "longitude": round(-34.9 - rng.random() * 0.2, 6),
+                "status": 0 if i % 7 == 0 else 1,
+                "vel_regulamentada": rng.choice((30, 40, 50, 60, 80)),
+            }
+            for i in range(config.equipamentos)
+        ]
+        self._por_id = {eq["id"]: eq for eq in self.equipamentos}
+        self._por_nome = {eq["nome_processador"]: eq for eq in self.equipamentos}
+        self.chamadas: Counter[str] = Counter()
+        self.recusadas = 0
+        self._em_andamento = 0
+        self._lock = threading.Lock()
+        self._servidor: ThreadingHTTPServer | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar(self) -> "StubAPI":
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._servidor.daemon_threads = True
+        threading.Thread(
+            target=self._servidor.serve_forever, name="stub-api", daemon=True
+        ).start()
+        return self
+
+    def parar(self) -> None:
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def zerar_chamadas(self) -> None:
+        with self._lock:
+            self.chamadas.clear()
+            self.recusadas = 0
+
+    def total_chamadas(self) -> int:
+        with self._lock:
+            return sum(self.chamadas.values())
+
+    def _registrar(self, path: str) -> None:
+        with self._lock:
+            self.chamadas[path] += 1
+
+    def _entrar(self) -> bool:
+        with self._lock:
+            if self.config.capacidade and self._em_andamento >= self.config.capacidade:
+                self.recusadas += 1
+                return False
+            self._em_andamento += 1
+            return True
+
+    def _sair(self) -> None:
+        with self._lock:
+            self._em_andamento -= 1
+
+    # ----- respostas -----
+
+    def responder(self, path: str, q: dict[str, str]) -> dict[str, Any] | None:
+        if path == "/equipamentos":
+            offset = int(q.get("offset", 0))
+            limit = int(q.get("limit", 2000))
+            return {"items": self.equipamentos[offset:offset + limit]}
+        if path == "/equipamentos/inoperancia":
+            return {"items": self._inoperancias(q["data_ini"], q["data_fim"])}
+        if path == "/velocidades/distribuicao":
+            return {"items": self._distribuicao(int(q["equipamento_id"]), q["data_ini"], q["data_fim"])}
+        if path == "/velocidades/indicadores":
+            return self._indicadores(int(q["equipamento_id"]), q["data_ini"], q["data_fim"])
+        if path == "/trafego/fluxo":
+            eq = self._equipamento(q)
+            return {"fluxo_total": self._fluxo(eq["id"] if eq else 0, q["data_ini"], q["data_fim"])}
+        return None
+
+    def _equipamento(self, q: dict[str, str]) -> dict[str, Any] | None:
+        if "equipamento_id" in q:
+            return self._por_id.get(int(q["equipamento_id"]))
+        return self._por_nome.get(q.get("nome_processador", ""))
+
+    def _dias(self, data_ini: str, data_fim: str) -> int:
+        return max(1, (date.fromisoformat(data_fim) - date.fromisoformat(data_ini)).days + 1)
+
+    def _distribuicao(self, equipamento_id: int, data_ini: str, data_fim: str) -> list[dict[str, int]]:
+        eq = self._por_id.get(equipamento_id)
+        if eq is None:
+            return []
+        rng = random.Random(_semente(equipamento_id, data_ini, data_fim))
+        dias = self._dias(data_ini, data_fim)
+        centro = eq["vel_regulamentada"] * 0.9
+        inicio = max(1, int(centro - self.config.velocidades / 2))
+        itens = []
+        for velocidade in range(inicio, inicio + self.config.velocidades):
+            peso = max(0.0, 1 - abs(velocidade - centro) / (self.config.velocidades / 2))
+            contagem = int(rng.random() * 400 * peso * dias)
+            if contagem:
+                itens.append({"velocidade": velocidade, "contagem": contagem})
+        return itens
+
+    def _indicadores(self, equipamento_id: int, data_ini: str, data_fim: str) -> dict[str, Any]:
+        itens = self._distribuicao(equipamento_id, data_ini, data_fim)
+        total = sum(i["contagem"] for i in itens)
+        if not total:
+            return {"total": 0, "velocidade_media": None, "velocidade_moda": None, "velocidade_maxima": None}
+        return {
+            "total": total,
+            "velocidade_media": round(sum(i["velocidade"] * i["contagem"] for i in itens) / total, 2),
+            "velocidade_moda": max(itens, key=lambda i: (i["contagem"], -i["velocidade"]))["velocidade"],
+            "velocidade_maxima": max(i["velocidade"] for i in itens),
+        }
+
+    def _fluxo(self, equipamento_id: int, data_ini: str, data_fim: str) -> int:
+        rng = random.Random(_semente("fluxo", equipamento_id, data_ini, data_fim))
+        return int(rng.uniform(9000, 12000) * self._dias(data_ini, data_fim))
+
+    def _inoperancias(self, data_ini: str, data_fim: str) -> list[dict[str, Any]]:
+        # Cerca de 2% dos radares ficam 2 dias parados a cada janela consultada.
+        rng = random.Random(_semente("inoperancia", data_ini, data_fim))
+        inicio = datetime.fromisoformat(data_ini)
+        itens = []
+        for eq in self.equipamentos:
+            if rng.random() >= 0.02:
+                continue
+            fim = inicio + timedelta(hours=48)
+            itens.append(
+                {
+                    "equipamento_id": eq["id"],
+                    "nome_processador": eq["nome_processador"],
+                    "inicio": inicio.strftime("%Y-%m-%d %H:%M:%S"),
+                    "fim": fim.strftime("%Y-%m-%d %H:%M:%S"),
+                    "horas": 48.0,
+                }
+            )
+        return itens
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                q = {k: v[0] for k, v in parse_qs(url.query).items()}
+                stub._registrar(url.path)
+                if not stub._entrar():
+                    self._enviar(429, b'{"detail": "Too Many Requests"}', retry_after=1)
+                    return
+                try:
+                    self._responder(url, q)
+                finally:
+                    stub._sair()
+
+            def _responder(self, url: Any, q: dict[str, str]) -> None:
+                if stub.config.latencia_ms > 0:
+                    time.sleep(stub.config.latencia_ms / 1000)
+
+                try:
+                    payload = stub.responder(url.path, q)
+                except (KeyError, ValueError) as exc:
+                    self._enviar(422, json.dumps({"detail": str(exc)}).encode("utf-8"))
+                    return
+                if payload is None:
+                    self._enviar(404, b'{"detail": "Not Found"}')
+                    return
+
+                corpo = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+                etag = None
+                if stub.config.etag:
+                    etag = '"' + hashlib.sha1(corpo).hexdigest() + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self._enviar(304, b"", etag)
+                        return
+                self._enviar(200, corpo, etag)
+
+            def _enviar(
+                self, status: int, corpo: bytes, etag: str | None = None, retry_after: int | None = None
+            ) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                if etag:
+                    self.send_header("ETag", etag)
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+        return Handler
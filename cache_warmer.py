@@ -0,0 +1,190 @@
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+from api_client import APIClient
+from configuracao import env_bool, env_float, env_int, hoje
+from equipamentos import registro_equipamentos
+
+logger = logging.getLogger(__name__)
+
+# O aquecedor e opcional e so roda quando API_AQUECEDOR_ATIVO=true.
+AQUECEDOR_ATIVO = env_bool("API_AQUECEDOR_ATIVO")
+AQUECEDOR_INTERVALO_MIN = env_float("API_AQUECEDOR_INTERVALO_MIN", 60)
+AQUECEDOR_ATRASO_INICIAL_S = env_float("API_AQUECEDOR_ATRASO_INICIAL_S", 5)
+AQUECEDOR_MAX_PARALELO = env_int("API_AQUECEDOR_MAX_PARALELO", 4)
+# Teto de equipamentos aquecidos por segundo, para nao competir com os usuarios.
+AQUECEDOR_EQUIPAMENTOS_POR_S = env_float("API_AQUECEDOR_EQUIPAMENTOS_POR_S", 5)
+# Sem cache em disco, o aquecimento so vai para o cache de respostas se
+# ocupar no maximo esta fracao dele; o resto fica para as sessoes.
+AQUECEDOR_FRACAO_CACHE = 0.5
+
+
+def periodos_padrao(dia: date | None = None) -> dict[str, tuple[date, date]]:
+    """
+    Periodos aquecidos a cada ciclo: ontem e os ultimos 7 dias fechados.
+    """
+
+    dia = dia or hoje()
+    ontem = dia - timedelta(days=1)
+    return {
+        "ontem": (ontem, ontem),
+        "semana": (dia - timedelta(days=7), ontem),
+    }
+
+
+class _Ritmo:
+    """Espaca as chamadas para no maximo `por_segundo` inicios por segundo."""
+
+    def __init__(self, por_segundo: float) -> None:
+        self.intervalo = 1 / por_segundo if por_segundo > 0 else 0.0
+        self._proximo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self) -> None:
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._proximo - agora
+            self._proximo = max(agora, self._proximo) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+class AquecedorCache:
+    """
+    Worker em segundo plano que pre-carrega distribuicao e fluxo de todos os
+    radares para os periodos mais consultados.
+
+    As chamadas usam exatamente os mesmos parametros do dashboard, entao o
+    primeiro clique em qualquer radar ja encontra a resposta pronta. Com o
+    cache em disco, o aquecimento vai so para ele (os periodos aquecidos sao
+    fechados) e nao passa pelo LRU em memoria das sessoes; sem disco, so
+    roda se couber em AQUECEDOR_FRACAO_CACHE do cache de respostas.
+    """
+
+    def __init__(
+        self,
+        intervalo_min: float = AQUECEDOR_INTERVALO_MIN,
+        atraso_inicial_s: float = AQUECEDOR_ATRASO_INICIAL_S,
+        max_paralelo: int = AQUECEDOR_MAX_PARALELO,
+        equipamentos_por_s: float = AQUECEDOR_EQUIPAMENTOS_POR_S,
+    ) -> None:
+        self.intervalo_s = max(60.0, intervalo_min * 60)
+        self.atraso_inicial_s = atraso_inicial_s
+        self.max_paralelo = max_paralelo
+        self.equipamentos_por_s = equipamentos_por_s
+        self._parar = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.ultimo_ciclo: dict[str, float | int] = {}
+
+    def iniciar(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._loop, name="aquecedor-cache", daemon=True
+        )
+        self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+
+    def _loop(self) -> None:
+        if self._parar.wait(self.atraso_inicial_s):
+            return
+        while not self._parar.is_set():
+            try:
+                self.executar_ciclo()
+            except Exception:
+                # Um ciclo com erro nao pode derrubar o worker; tenta de novo
+                # no proximo intervalo.
+                logger.exception("Falha no ciclo do aquecedor de cache")
+            self._parar.wait(self.intervalo_s)
+
+    def executar_ciclo(self) -> None:
+        inicio = time.monotonic()
+        api_client = APIClient()
+        equipamentos = registro_equipamentos.atualizar(api_client).validos
+
+        em_disco = api_client.disk is not None
+        if not em_disco:
+            # No modo incremental a distribuicao vai para o store de
+            # histogramas diarios; so o fluxo ocuparia o cache de respostas.
+            por_radar = 1 if api_client.distribuicao_incremental else 2
+            necessario = len(equipamentos) * por_radar * len(periodos_padrao())
+            capacidade = 0 if api_client.cache is None else api_client.cache.max_entries
+            if necessario > capacidade * AQUECEDOR_FRACAO_CACHE:
+                # Aquecer assim so trocaria as respostas das sessoes no LRU
+                # por entradas que seriam expulsas antes do uso.
+                logger.warning(
+                    "Aquecimento ignorado: %s entradas nao cabem em %.0f%% de "
+                    "API_CACHE_MAX_ENTRADAS=%s. Defina API_DISK_CACHE_DIR ou aumente "
+                    "API_CACHE_MAX_ENTRADAS para pelo menos %s.",
+                    necessario,
+                    AQUECEDOR_FRACAO_CACHE * 100,
+                    capacidade,
+                    int(necessario / AQUECEDOR_FRACAO_CACHE),
+                )
+                self.ultimo_ciclo = {
+                    "equipamentos": len(equipamentos),
+                    "ignorado": True,
+                    "concluido_em": time.time(),
+                }
+                return
+
+        ritmo = _Ritmo(self.equipamentos_por_s)
+        falhas = 0
+        for data_ini, data_fim in periodos_padrao().values():
+            futuros = api_client.executar_em_lote(
+                self._aquecer_equipamento,
+                [
+                    {
+                        "api_client": api_client,
+                        "ritmo": ritmo,
+                        "equipamento_id": int(eq_id),
+                        "nome_processador": nome,
+                        "data_ini": data_ini.isoformat(),
+                        "data_fim": data_fim.isoformat(),
+                        "usar_cache": not em_disco,
+                    }
+                    for eq_id, nome in zip(
+                        equipamentos["id"], equipamentos["nome_processador"]
+                    )
+                ],
+                max_paralelo=self.max_paralelo,
+            )
+            falhas += sum(1 for futuro in futuros if futuro.exception() is not None)
+            if self._parar.is_set():
+                break
+
+        self.ultimo_ciclo = {
+            "equipamentos": len(equipamentos),
+            "falhas": falhas,
+            "duracao_s": round(time.monotonic() - inicio, 1),
+            "concluido_em": time.time(),
+        }
+        logger.info("Aquecimento de cache concluido: %s", self.ultimo_ciclo)
+
+    def _aquecer_equipamento(
+        self,
+        api_client: APIClient,
+        ritmo: _Ritmo,
+        equipamento_id: int,
+        nome_processador: str,
+        data_ini: str,
+        data_fim: str,
+        usar_cache: bool,
+    ) -> None:
+        if self._parar.is_set():
+            return
+        ritmo.aguardar()
+        api_client.get_distribuicao_velocidade(
+            equipamento_id=equipamento_id, data_ini=data_ini, data_fim=data_fim, usar_cache=usar_cache
+        )
+        # O dashboard consulta o fluxo por nome_processador; usar o mesmo
+        # parametro garante que a chave de cache seja a mesma.
+        api_client.get_fluxo(
+            data_ini=data_ini, data_fim=data_fim, nome_processador=nome_processador, usar_cache=usar_cache
+        )
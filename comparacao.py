@@ -0,0 +1,87 @@
+import math
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from indicadores import Indicadores
+
+
+def periodo_anterior(data_inicial: date, data_final: date) -> tuple[date, date]:
+    """Periodo de mesma duracao imediatamente antes de `data_inicial`."""
+
+    dias = (data_final - data_inicial).days + 1
+    return data_inicial - timedelta(days=dias), data_inicial - timedelta(days=1)
+
+
+@dataclass(frozen=True)
+class ResultadoPeriodo:
+    """Indicadores e fluxo de um equipamento em um periodo da comparacao."""
+
+    data_inicial: date
+    data_final: date
+    indicadores: Indicadores | None
+    total_fluxo: int
+
+    @property
+    def rotulo(self) -> str:
+        return f"{self.data_inicial.strftime('%d/%m/%Y')} a {self.data_final.strftime('%d/%m/%Y')}"
+
+    @property
+    def aproveitamento_ocr(self) -> float:
+        if self.indicadores is None or self.total_fluxo <= 0:
+            return math.nan
+        return self.indicadores.total / self.total_fluxo * 100
+
+
+@dataclass(frozen=True)
+class Variacao:
+    """
+    Um indicador nos dois periodos. `menor_e_melhor` diz como colorir a
+    variacao (None: neutra, como nas velocidades).
+    """
+
+    rotulo: str
+    unidade: str
+    atual: float
+    referencia: float
+    menor_e_melhor: bool | None = None
+
+    @property
+    def delta(self) -> float:
+        return self.atual - self.referencia
+
+    @property
+    def melhorou(self) -> bool | None:
+        if self.menor_e_melhor is None or math.isnan(self.delta) or self.delta == 0:
+            return None
+        return (self.delta < 0) == self.menor_e_melhor
+
+
+def _indicador(resultado: ResultadoPeriodo, campo: str) -> float:
+    if resultado.indicadores is None:
+        return math.nan
+    return float(getattr(resultado.indicadores, campo))
+
+
+def variacoes(atual: ResultadoPeriodo, referencia: ResultadoPeriodo) -> list[Variacao]:
+    """Variacoes dos cards da comparacao: media, moda, % de excesso e aproveitamento de OCR."""
+
+    return [
+        Variacao(
+            "Velocidade Média", "km/h",
+            _indicador(atual, "velocidade_media"), _indicador(referencia, "velocidade_media"),
+        ),
+        Variacao(
+            "Velocidade Mais Praticada", "km/h",
+            _indicador(atual, "velocidade_moda"), _indicador(referencia, "velocidade_moda"),
+        ),
+        Variacao(
+            "Excesso de Velocidade", "%",
+            _indicador(atual, "pct_acima_tolerancia"), _indicador(referencia, "pct_acima_tolerancia"),
+            menor_e_melhor=True,
+        ),
+        Variacao(
+            "Aproveitamento de OCR", "%",
+            atual.aproveitamento_ocr, referencia.aproveitamento_ocr,
+            menor_e_melhor=False,
+        ),
+    ]
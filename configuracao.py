@@ -0,0 +1,52 @@
+import os
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+
+# Os modulos leem as variaveis na importacao; o .env precisa estar carregado
+# antes do primeiro deles (metricas e importado antes do api_client).
+load_dotenv()
+
+
+def env_float(nome: str, padrao: float) -> float:
+    valor = os.getenv(nome, "").strip()
+    if not valor:
+        return padrao
+    try:
+        return float(valor)
+    except ValueError:
+        return padrao
+
+
+def env_int(nome: str, padrao: int) -> int:
+    return int(env_float(nome, padrao))
+
+
+def env_ints(nome: str, padrao: tuple[int, ...]) -> tuple[int, ...]:
+    """Lista de inteiros separados por virgula; vazia ou invalida cai no padrao."""
+
+    valor = os.getenv(nome, "").strip()
+    try:
+        inteiros = tuple(int(parte) for parte in valor.split(",") if parte.strip())
+    except ValueError:
+        return padrao
+    return inteiros or padrao
+
+
+def env_bool(nome: str, padrao: bool = False) -> bool:
+    valor = os.getenv(nome, "").strip().lower()
+    if not valor:
+        return padrao
+    return valor in {"1", "true", "sim", "yes", "on"}
+
+
+# Os radares e a API trabalham no horario de Brasilia; o servidor do
+# dashboard pode estar em UTC.
+FUSO_HORARIO = ZoneInfo("America/Sao_Paulo")
+
+
+def hoje() -> date:
+    """Data de hoje no fuso da API, que decide se um periodo ja fechou."""
+
+    return datetime.now(FUSO_HORARIO).date()
@@ -0,0 +1,127 @@
+import json
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+try:
+    # orjson e opcional: quando instalado, decodifica o corpo bem mais rapido
+    # e direto dos bytes, sem passar por uma string intermediaria.
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+
+# Tipos declarados por endpoint. Colunas ausentes daqui seguem a inferencia do
+# pandas; colunas listadas em ESSENCIAIS precisam existir em todo payload.
+ESQUEMA_EQUIPAMENTOS: dict[str, str] = {
+    "id": "int32",
+    "status": "int8",
+    "vel_regulamentada": "int16",
+    "latitude": "float32",
+    "longitude": "float32",
+    # nome_processador e unico por radar, entao categoria nao economiza nada aqui.
+    "nome_processador": "object",
+}
+ESQUEMA_DISTRIBUICAO: dict[str, str] = {
+    "velocidade": "int16",
+    "contagem": "int32",
+}
+ESQUEMA_INOPERANCIA: dict[str, str] = {
+    "equipamento_id": "int32",
+    # Um mesmo radar aparece em varias linhas de inoperancia.
+    "nome_processador": "category",
+}
+
+ESSENCIAIS: dict[str, tuple[str, ...]] = {
+    "equipamentos": ("id", "nome_processador", "latitude", "longitude", "status", "vel_regulamentada"),
+    "distribuicao": ("velocidade", "contagem"),
+    "inoperancia": (),
+}
+
+
+def carregar_json(conteudo: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(conteudo)
+    return json.loads(conteudo)
+
+
+def salvar_json(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _numerico_generico(valores: list[Any]) -> np.ndarray:
+    # Nulos ou valores fora do formato esperado: cai para numerico generico
+    # (float64 com NaN) em vez de quebrar a tela inteira.
+    return pd.to_numeric(pd.Series(valores), errors="coerce").to_numpy()
+
+
+def _inteiros(valores: list[Any], dtype: np.dtype) -> np.ndarray:
+    """
+    Converte para o inteiro compacto `dtype` so quando todos os valores sao
+    inteiros e cabem nele; senao mantem int64/float64.
+
+    Converter direto truncaria velocidades fracionarias (42.7 -> 42) e um
+    valor fora da faixa levantaria OverflowError.
+    """
+
+    try:
+        bruto = np.array(valores)
+    except (TypeError, ValueError, OverflowError):
+        return _numerico_generico(valores)
+
+    if bruto.dtype.kind == "f":
+        if not (np.isfinite(bruto).all() and (bruto == np.trunc(bruto)).all()):
+            return bruto
+    elif bruto.dtype.kind not in "iu":
+        return _numerico_generico(valores)
+
+    faixa = np.iinfo(dtype)
+    if bruto.size and (bruto.min() < faixa.min or bruto.max() > faixa.max):
+        return bruto
+    return bruto.astype(dtype)
+
+
+def _coluna(valores: list[Any], dtype: str) -> Any:
+    if dtype == "object":
+        return valores
+    if dtype == "category":
+        return pd.Categorical(valores)
+    if np.dtype(dtype).kind in "iu":
+        return _inteiros(valores, np.dtype(dtype))
+
+    try:
+        return np.array(valores, dtype=dtype)
+    except (TypeError, ValueError, OverflowError):
+        return _numerico_generico(valores)
+
+
+def itens_para_dataframe(
+    itens: list[dict[str, Any]], esquema: dict[str, str], essenciais: tuple[str, ...] = ()
+) -> pd.DataFrame:
+    """
+    Monta o DataFrame coluna a coluna, ja nos tipos compactos do esquema.
+
+    O esquema e validado uma unica vez, pelas chaves do primeiro item, e cada
+    coluna vira um array tipado direto, sem passar por colunas object que o
+    pandas depois teria que inferir.
+    """
+
+    if not itens:
+        return pd.DataFrame({c: pd.Series(dtype=esquema.get(c, "object")) for c in essenciais})
+
+    colunas = list(itens[0].keys())
+    ausentes = [c for c in essenciais if c not in colunas]
+    if ausentes:
+        raise RuntimeError(
+            f"Resposta inesperada da API: campos ausentes {', '.join(ausentes)}."
+        )
+
+    return pd.DataFrame(
+        {
+            c: _coluna([item.get(c) for item in itens], esquema.get(c, "object"))
+            for c in colunas
+        }
+    ).infer_objects()
@@ -0,0 +1,108 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from decodificacao import carregar_json, salvar_json
+
+
+class DiskCache:
+    """
+    Cache persistente (SQLite) para respostas historicas da API.
+
+    So guarda resultados que nao mudam mais (periodos ja encerrados), entao
+    nao ha TTL: as entradas saem apenas por tamanho, da menos acessada para a
+    mais acessada. O arquivo sobrevive a restarts e deploys do servico.
+    """
+
+    def __init__(self, diretorio: str | Path, max_bytes: int) -> None:
+        self.max_bytes = max(1, max_bytes)
+        Path(diretorio).mkdir(parents=True, exist_ok=True)
+        self.path = Path(diretorio) / "respostas.sqlite3"
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                tamanho INTEGER NOT NULL,
+                acessado_em REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS respostas_acessado_em ON respostas (acessado_em)"
+        )
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+
+    def get(self, chave: str) -> Any | None:
+        try:
+            with self._lock:
+                linha = self._conn.execute(
+                    "SELECT payload FROM respostas WHERE chave = ?", (chave,)
+                ).fetchone()
+                if linha is None:
+                    self._stats["misses"] += 1
+                    return None
+                self._conn.execute(
+                    "UPDATE respostas SET acessado_em = ? WHERE chave = ?",
+                    (time.time(), chave),
+                )
+                self._stats["hits"] += 1
+            return carregar_json(linha[0])
+        except (sqlite3.Error, ValueError):
+            # Disco cheio, arquivo corrompido...: o cache e so uma otimizacao,
+            # entao a consulta segue pela rede.
+            with self._lock:
+                self._stats["errors"] += 1
+            return None
+
+    def set(self, chave: str, payload: Any) -> None:
+        dados = salvar_json(payload)
+        if len(dados) > self.max_bytes:
+            return
+
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO respostas (chave, payload, tamanho, acessado_em) "
+                    "VALUES (?, ?, ?, ?)",
+                    (chave, dados, len(dados), time.time()),
+                )
+                self._stats["writes"] += 1
+                self._evict()
+        except sqlite3.Error:
+            with self._lock:
+                self._stats["errors"] += 1
+
+    def _evict(self) -> None:
+        # Chamado com o lock. Ao passar do limite, libera ate 90% dele de uma
+        # vez, para nao pagar uma limpeza a cada nova escrita.
+        total = self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        alvo = total - int(self.max_bytes * 0.9)
+        liberado = 0
+        remover = []
+        for chave, tamanho in self._conn.execute(
+            "SELECT chave, tamanho FROM respostas ORDER BY acessado_em"
+        ):
+            remover.append((chave,))
+            liberado += tamanho
+            if liberado >= alvo:
+                break
+        self._conn.executemany("DELETE FROM respostas WHERE chave = ?", remover)
+        self._stats["evictions"] += len(remover)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas"
+            ).fetchone()
+            return {**self._stats, "size": linha[0], "bytes": linha[1], "max_bytes": self.max_bytes}
@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from configuracao import hoje
+
+# Um histograma diario e um par de arrays (velocidades, contagens).
+HistogramaDia = tuple[np.ndarray, np.ndarray]
+
+
+def dias_do_periodo(data_ini: date, data_fim: date) -> list[date]:
+    return [data_ini + timedelta(days=i) for i in range((data_fim - data_ini).days + 1)]
+
+
+def histograma_de_df(df: pd.DataFrame) -> HistogramaDia:
+    if df is None or df.empty:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+    velocidade = df["velocidade"].to_numpy()
+    if velocidade.dtype.kind != "f":
+        velocidade = velocidade.astype(np.int32)
+    # Velocidades fracionarias (a decodificacao manteve float64) nao sao truncadas.
+    return velocidade, df["contagem"].to_numpy(dtype=np.int64)
+
+
+def somar_histogramas(histogramas: list[HistogramaDia]) -> pd.DataFrame:
+    """
+    Soma histogramas diarios em um unico DataFrame `velocidade`/`contagem`,
+    ordenado por velocidade, no mesmo formato do /velocidades/distribuicao.
+    """
+
+    velocidades = [v for v, _ in histogramas if len(v)]
+    if not velocidades:
+        return pd.DataFrame(columns=["velocidade", "contagem"])
+
+    todas_velocidades = np.concatenate(velocidades)
+    todas_contagens = np.concatenate([c for v, c in histogramas if len(v)])
+    unicas, posicao = np.unique(todas_velocidades, return_inverse=True)
+    contagens = np.bincount(posicao, weights=todas_contagens, minlength=len(unicas))
+
+    df = pd.DataFrame({"velocidade": unicas, "contagem": contagens.astype(np.int64)})
+    return df[df["contagem"] > 0].reset_index(drop=True)
+
+
+class DistribuicaoDiariaStore:
+    """
+    Guarda histogramas de velocidade por (equipamento_id, dia).
+
+    Dias anteriores a hoje nao mudam mais, entao uma vez baixados nunca sao
+    buscados de novo: ampliar o periodo so custa os dias que ainda faltam.
+    O total de dias guardados e limitado (LRU) para nao crescer sem fim.
+    """
+
+    def __init__(self, max_dias: int = 20000) -> None:
+        self.max_dias = max(1, max_dias)
+        self._dias: OrderedDict[tuple[int, date], HistogramaDia] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, equipamento_id: int, dias: list[date]) -> tuple[list[HistogramaDia], list[date]]:
+        """
+        Devolve os histogramas ja guardados e a lista de dias que faltam.
+        """
+
+        encontrados, faltantes = self.obter_por_dia(equipamento_id, dias)
+        return list(encontrados.values()), faltantes
+
+    def obter_por_dia(
+        self, equipamento_id: int, dias: list[date]
+    ) -> tuple[dict[date, HistogramaDia], list[date]]:
+        """
+        Como `obter`, mas com os histogramas encontrados indexados pelo dia.
+        """
+
+        encontrados = {}
+        faltantes = []
+        with self._lock:
+            for dia in dias:
+                chave = (int(equipamento_id), dia)
+                histograma = self._dias.get(chave)
+                if histograma is None:
+                    faltantes.append(dia)
+                else:
+                    self._dias.move_to_end(chave)
+                    encontrados[dia] = histograma
+        return encontrados, faltantes
+
+    def guardar(self, equipamento_id: int, dia: date, histograma: HistogramaDia) -> None:
+        # O dia corrente ainda recebe passagens e nao pode ser tratado como fechado.
+        if dia >= hoje():
+            return
+
+        with self._lock:
+            chave = (int(equipamento_id), dia)
+            self._dias[chave] = histograma
+            self._dias.move_to_end(chave)
+            while len(self._dias) > self.max_dias:
+                self._dias.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._dias.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._dias)
@@ -0,0 +1,135 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+import pandas as pd
+
+from api_client import APIClient
+from decodificacao import ESQUEMA_EQUIPAMENTOS, ESSENCIAIS, itens_para_dataframe
+
+
+@dataclass(frozen=True)
+class Equipamentos:
+    """
+    Lista de equipamentos de um instante, com indices por id e por nome.
+
+    Imutavel: uma atualizacao do registro gera outro objeto, entao um rerun
+    pode usar o mesmo do inicio ao fim sem travas. `versao` muda sempre que
+    o conteudo muda e serve de chave de cache barata. So os validos ficam
+    guardados; dos demais, apenas a contagem (`total`).
+    """
+
+    total: int
+    validos: pd.DataFrame
+    versao: int
+    _posicao_por_id: dict[int, int] = field(repr=False)
+    _id_por_nome: dict[str, int] = field(repr=False)
+
+    @classmethod
+    def montar(cls, todos: pd.DataFrame, versao: int = 0) -> "Equipamentos":
+        # Um radar repetido entre paginas fica so com a primeira ocorrencia:
+        # os indices por id e por nome (e o reindex do modo frota) exigem ids unicos.
+        todos = todos.drop_duplicates("id")
+        # Radares sem coordenada nao aparecem no mapa nem podem ser selecionados.
+        validos = todos[(todos["latitude"] != 0) & (todos["longitude"] != 0)].reset_index(drop=True)
+        ids = validos["id"].to_numpy()
+        return cls(
+            total=len(todos),
+            validos=validos,
+            versao=versao,
+            _posicao_por_id={int(eq_id): posicao for posicao, eq_id in enumerate(ids)},
+            _id_por_nome=dict(zip(validos["nome_processador"], ids.tolist())),
+        )
+
+    def __len__(self) -> int:
+        return len(self.validos)
+
+    def bytes(self) -> int:
+        return int(self.validos.memory_usage(deep=True).sum())
+
+    def id_por_nome(self, nome_processador: str | None) -> int | None:
+        return self._id_por_nome.get(nome_processador)
+
+    def por_id(self, equipamento_id: int | None) -> pd.Series | None:
+        """Linha do equipamento valido com esse id, sem varrer a tabela."""
+
+        posicao = self._posicao_por_id.get(equipamento_id)
+        return None if posicao is None else self.validos.iloc[posicao]
+
+
+def _pagina_para_dataframe(payload: dict[str, Any]) -> pd.DataFrame:
+    return itens_para_dataframe(
+        payload.get("items", []), ESQUEMA_EQUIPAMENTOS, ESSENCIAIS["equipamentos"]
+    )
+
+
+class RegistroEquipamentos:
+    """
+    Equipamentos do processo, compartilhados por todas as sessoes.
+
+    `atualizar` busca todas as paginas do /equipamentos (um snapshot so no
+    cache de respostas, entao dentro do TTL nao ha rede, e fora dele a
+    revalidacao costuma voltar 304). So paginas com payload novo sao
+    decodificadas de novo; se nenhuma mudou, o snapshot atual e devolvido
+    como esta.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._paginas: list[tuple[dict[str, Any], pd.DataFrame]] = []
+        self._atual: Equipamentos | None = None
+        # Nunca volta atras, nem depois de clear(): versoes antigas podem
+        # continuar como chave em caches de quem usa o registro.
+        self._versao = 0
+        self._stats = {"atualizacoes": 0, "paginas_decodificadas": 0, "sem_mudanca": 0}
+
+    def atualizar(self, api_client: APIClient) -> Equipamentos:
+        payloads = api_client.get_equipamentos_paginas()
+
+        with self._lock:
+            anteriores = self._paginas
+            if self._atual is not None and len(payloads) == len(anteriores) and all(
+                novo is antigo for novo, (antigo, _) in zip(payloads, anteriores)
+            ):
+                self._stats["sem_mudanca"] += 1
+                return self._atual
+
+            paginas = []
+            for i, payload in enumerate(payloads):
+                if i < len(anteriores) and anteriores[i][0] is payload:
+                    paginas.append(anteriores[i])
+                else:
+                    paginas.append((payload, _pagina_para_dataframe(payload)))
+                    self._stats["paginas_decodificadas"] += 1
+
+            todos = (
+                pd.concat([df for _, df in paginas], ignore_index=True)
+                if len(paginas) > 1
+                else paginas[0][1]
+            )
+            self._versao += 1
+            self._paginas = paginas
+            self._atual = Equipamentos.montar(todos, self._versao)
+            self._stats["atualizacoes"] += 1
+            return self._atual
+
+    def clear(self) -> None:
+        with self._lock:
+            self._paginas = []
+            self._atual = None
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "paginas": len(self._paginas),
+                "equipamentos": self._atual.total if self._atual is not None else 0,
+                "bytes": (
+                    sum(int(df.memory_usage(deep=True).sum()) for _, df in self._paginas)
+                    + (self._atual.bytes() if self._atual is not None else 0)
+                ),
+                "versao": self._versao,
+            }
+
+
+registro_equipamentos = RegistroEquipamentos()
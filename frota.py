@@ -0,0 +1,186 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, TypeVar
+
+import numpy as np
+import pandas as pd
+
+from api_client import APIClient, ResponseCache, cache_key, ttl_para
+from configuracao import env_int
+from indicadores import classificar_por_equipamento
+
+# Quantos equipamentos sao consultados ao mesmo tempo no modo frota.
+FROTA_MAX_PARALELO = env_int("API_FROTA_MAX_PARALELO", 16)
+
+# O resultado agregado (uma linha por radar) e pequeno e pode ficar em cache
+# por periodo; as distribuicoes individuais sao descartadas depois da soma.
+_cache_frota = ResponseCache(max_entries=env_int("API_FROTA_CACHE_ENTRADAS", 32))
+
+T = TypeVar("T")
+
+
+@dataclass
+class ConformidadeFrota:
+    """
+    Percentuais de regulamentada/tolerancia/excesso por radar em um periodo.
+
+    `conformidade` tem uma linha por equipamento consultado (inclusive os sem
+    dados, com total zero); `falhas` lista os ids cuja consulta deu erro.
+    """
+
+    conformidade: pd.DataFrame
+    falhas: list[int] = field(default_factory=list)
+
+
+def _assinatura_equipamentos(equipamentos: pd.DataFrame) -> str:
+    # Muda quando entra/sai radar ou muda velocidade regulamentada.
+    return str(
+        pd.util.hash_pandas_object(
+            equipamentos[["id", "vel_regulamentada"]], index=False
+        ).sum()
+    )
+
+
+def varredura_em_cache(
+    cache: ResponseCache,
+    nome: str,
+    endpoint: str,
+    equipamentos: pd.DataFrame,
+    data_ini: str,
+    data_fim: str,
+    calcular: Callable[[Callable[[int, int], None]], T],
+    progresso: Callable[[int, int], None] | None = None,
+) -> T:
+    """
+    Resultado de uma varredura da frota, em `cache` por periodo e lista de
+    equipamentos, com o TTL do `endpoint` consultado.
+
+    `calcular(progresso)` so roda quando falta a entrada ou na revalidacao
+    em segundo plano; o progresso que ele reporta so chega a `progresso`
+    na thread de quem chamou.
+    """
+
+    # Em uma revalidacao em segundo plano o callback de progresso pertence a
+    # um rerun que ja terminou; so reportamos progresso na thread que chamou.
+    chamador = threading.get_ident()
+
+    def _progresso(concluidas: int, total: int) -> None:
+        if progresso is not None and threading.get_ident() == chamador:
+            progresso(concluidas, total)
+
+    params = {
+        "data_ini": data_ini,
+        "data_fim": data_fim,
+        "equipamentos": _assinatura_equipamentos(equipamentos),
+    }
+    return cache.get_or_fetch(cache_key(nome, params), ttl_para(endpoint, params), lambda: calcular(_progresso))
+
+
+def buscar_conformidade_frota(
+    api_client: APIClient,
+    equipamentos: pd.DataFrame,
+    data_ini: str,
+    data_fim: str,
+    progresso: Callable[[int, int], None] | None = None,
+) -> ConformidadeFrota:
+    """
+    Consulta a distribuicao de todos os equipamentos e classifica cada radar.
+
+    As consultas saem com paralelismo limitado (FROTA_MAX_PARALELO) e sem
+    passar pelo cache de respostas, para nao expulsar dele as telas abertas;
+    quem fica em cache e o resultado agregado da frota para o periodo.
+    """
+
+    return varredura_em_cache(
+        _cache_frota,
+        "/frota/conformidade",
+        "/velocidades/distribuicao",
+        equipamentos,
+        data_ini,
+        data_fim,
+        lambda _progresso: _calcular_conformidade_frota(
+            api_client, equipamentos, data_ini, data_fim, _progresso
+        ),
+        progresso,
+    )
+
+
+def _calcular_conformidade_frota(
+    api_client: APIClient,
+    equipamentos: pd.DataFrame,
+    data_ini: str,
+    data_fim: str,
+    progresso: Callable[[int, int], None] | None,
+) -> ConformidadeFrota:
+    ids = equipamentos["id"].to_numpy()
+    futuros = api_client.executar_em_lote(
+        api_client.get_distribuicao_velocidade,
+        [
+            {
+                "equipamento_id": int(eq_id),
+                "data_ini": data_ini,
+                "data_fim": data_fim,
+                "incremental": False,
+                "usar_cache": False,
+            }
+            for eq_id in ids
+        ],
+        max_paralelo=FROTA_MAX_PARALELO,
+        progresso=progresso,
+    )
+
+    # Empilha todos os histogramas em arrays longos de uma vez, em vez de
+    # concatenar ~2000 DataFrames pequenos.
+    partes_id, partes_vel, partes_cont = [], [], []
+    falhas = []
+    for eq_id, futuro in zip(ids, futuros):
+        try:
+            df = futuro.result()
+        except RuntimeError:
+            falhas.append(int(eq_id))
+            continue
+        if df.empty:
+            continue
+        partes_id.append(np.full(len(df), eq_id))
+        partes_vel.append(df["velocidade"].to_numpy())
+        partes_cont.append(df["contagem"].to_numpy())
+
+    base = equipamentos[
+        ["id", "nome_processador", "vel_regulamentada", "latitude", "longitude"]
+    ].reset_index(drop=True)
+    id_longo = np.concatenate(partes_id) if partes_id else np.empty(0, dtype=ids.dtype)
+    regulamentada = base.set_index("id")["vel_regulamentada"]
+    classificacao = classificar_por_equipamento(
+        id_longo,
+        np.concatenate(partes_vel) if partes_vel else np.empty(0),
+        np.concatenate(partes_cont) if partes_cont else np.empty(0),
+        regulamentada.reindex(id_longo).to_numpy(),
+    )
+
+    conformidade = base.merge(
+        classificacao, how="left", left_on="id", right_on="equipamento_id"
+    ).drop(columns="equipamento_id")
+    conformidade["total"] = conformidade["total"].fillna(0).astype(np.int64)
+    return ConformidadeFrota(conformidade=conformidade, falhas=falhas)
+
+
+def ranking_excesso(conformidade: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tabela para exibicao: radares com dados, do maior para o menor % de excesso.
+    """
+
+    colunas = {
+        "nome_processador": "Equipamento",
+        "vel_regulamentada": "Vel. regulamentada (km/h)",
+        "total": "Veículos (OCR)",
+        "velocidade_media": "Velocidade média (km/h)",
+        "pct_regulamentada": "% regulamentada",
+        "pct_dentro_tolerancia": "% tolerância",
+        "pct_acima_tolerancia": "% excesso",
+    }
+    com_dados = conformidade[conformidade["total"] > 0]
+    return (
+        com_dados.sort_values("pct_acima_tolerancia", ascending=False)[list(colunas)]
+        .rename(columns=colunas)
+        .reset_index(drop=True)
+    )
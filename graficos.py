@@ -0,0 +1,188 @@
+from datetime import date
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from indicadores import Indicadores
+
+# Tamanhos consistentes para caber 2 graficos por pagina na impressao.
+ALTURA_GRAFICO = 420
+MARGENS = dict(t=40, b=40, l=40, r=20)
+
+CATEGORIAS_EXCESSO = (
+    ("Abaixo da Regulamentada", "green"),
+    ("Dentro da Tolerância de 10%", "orange"),
+    ("Excesso de Velocidade", "red"),
+)
+
+
+def figura_distribuicao(df_velocidade: pd.DataFrame, data_inicial: date, data_final: date) -> go.Figure:
+    fig = px.bar(
+        df_velocidade, x="velocidade", y="contagem",
+        labels={"velocidade": "Velocidade (km/h)", "contagem": "Quantidade"},
+        title=f"Distribuição das Velocidades ({data_inicial.strftime('%d/%m/%Y')} a {data_final.strftime('%d/%m/%Y')})"
+    )
+    fig.update_layout(height=ALTURA_GRAFICO, margin=MARGENS)
+    return fig
+
+
+def dados_excesso(indicadores: Indicadores) -> pd.DataFrame:
+    """Contagens e percentuais de regulamentada/tolerancia/excesso (dados da pizza)."""
+
+    return pd.DataFrame({
+        "Categoria": [categoria for categoria, _ in CATEGORIAS_EXCESSO],
+        "Percentual": [
+            indicadores.pct_regulamentada,
+            indicadores.pct_dentro_tolerancia,
+            indicadores.pct_acima_tolerancia,
+        ],
+        "Valores": [
+            indicadores.dentro_regulamentada,
+            indicadores.dentro_tolerancia,
+            indicadores.acima_tolerancia,
+        ],
+    })
+
+
+def figura_excessos(indicadores: Indicadores) -> go.Figure:
+    fig = px.pie(
+        dados_excesso(indicadores), names="Categoria", values="Valores",
+        hole=0.5,
+        color="Categoria",
+        color_discrete_map=dict(CATEGORIAS_EXCESSO),
+        title="Excessos de Velocidade"
+    )
+    fig.update_layout(height=ALTURA_GRAFICO, margin=MARGENS, legend=dict(orientation="h"))
+    return fig
+
+
+def figura_faixas(faixas: pd.DataFrame) -> go.Figure:
+    fig = px.bar(
+        faixas,
+        x="contagem",
+        y="faixa",
+        orientation="h",
+        text="contagem",  # adiciona valores nas barras
+        labels={"contagem": "Quantidade", "faixa": "Faixa de velocidade"},
+        title="Distribuição de Veículos por Faixa de Velocidade"
+    )
+
+    # posição do texto fora das barras
+    fig.update_traces(textposition="outside")
+
+    # calcula o maior valor para abrir espaço para o texto "fora" da barra
+    mc = pd.to_numeric(faixas["contagem"], errors="coerce")
+    max_contagem = float(mc.max()) if mc.notna().any() else 0.0
+    xmax = (max_contagem * 1.18) if max_contagem > 0 else 10  # 15% de folga (ajuste se quiser)
+
+    fig.update_layout(
+        height=ALTURA_GRAFICO,
+        xaxis=dict(title="Quantidade", range=[0, xmax]),
+        yaxis=dict(title="Faixa de Velocidade")
+    )
+    return fig
+
+
+def figuras_equipamento(
+    df_velocidade: pd.DataFrame, indicadores: Indicadores, data_inicial: date, data_final: date
+) -> tuple[go.Figure, go.Figure, go.Figure]:
+    """
+    Graficos do painel do equipamento: distribuicao, pizza de excessos e faixas.
+
+    Funcao pura (so depende dos argumentos e nao altera `df_velocidade`), entao
+    o resultado pode ser guardado em cache e reaproveitado entre reruns.
+    """
+
+    return (
+        figura_distribuicao(df_velocidade, data_inicial, data_final),
+        figura_excessos(indicadores),
+        figura_faixas(indicadores.faixas),
+    )
+
+
+def figura_comparacao(
+    df_atual: pd.DataFrame,
+    df_referencia: pd.DataFrame,
+    rotulo_atual: str,
+    rotulo_referencia: str,
+    velocidade_regulamentada: float,
+) -> go.Figure:
+    """
+    Distribuicoes dos dois periodos sobrepostas, em % dos veiculos de cada
+    periodo: periodos com duracao ou fluxo diferentes ficam comparaveis.
+    """
+
+    fig = go.Figure()
+    for df, rotulo in ((df_referencia, rotulo_referencia), (df_atual, rotulo_atual)):
+        total = df["contagem"].sum()
+        fig.add_trace(
+            go.Bar(
+                x=df["velocidade"],
+                y=df["contagem"] / total * 100 if total > 0 else df["contagem"],
+                name=rotulo,
+                opacity=0.6,
+            )
+        )
+    fig.add_vline(
+        x=velocidade_regulamentada, line_dash="dash", line_color="gray",
+        annotation_text="Regulamentada", annotation_position="top right",
+    )
+    fig.update_layout(
+        barmode="overlay", height=ALTURA_GRAFICO, margin=MARGENS, legend=dict(orientation="h"),
+        title="Distribuição das Velocidades nos Dois Períodos",
+        xaxis_title="Velocidade (km/h)", yaxis_title="% dos veículos do período",
+    )
+    return fig
+
+
+def figura_perfil_diario(perfil: pd.DataFrame, velocidade_regulamentada: float) -> go.Figure:
+    """
+    Velocidade media e V85 por dia (eixo da esquerda) e % de excesso (direita).
+    """
+
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig.add_trace(
+        go.Scatter(x=perfil["dia"], y=perfil["velocidade_media"], name="Velocidade média", mode="lines+markers"),
+        secondary_y=False,
+    )
+    fig.add_trace(
+        go.Scatter(x=perfil["dia"], y=perfil["v85"], name="V85", mode="lines+markers"),
+        secondary_y=False,
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=perfil["dia"], y=perfil["pct_acima_tolerancia"], name="% excesso",
+            mode="lines+markers", line=dict(color="red", dash="dot"),
+        ),
+        secondary_y=True,
+    )
+    fig.add_hline(
+        y=velocidade_regulamentada, line_dash="dash", line_color="gray",
+        annotation_text="Regulamentada", annotation_position="top left",
+    )
+    fig.update_layout(
+        height=ALTURA_GRAFICO, margin=MARGENS, legend=dict(orientation="h"),
+        title="Perfil Dia a Dia",
+    )
+    fig.update_yaxes(title_text="Velocidade (km/h)", secondary_y=False)
+    fig.update_yaxes(title_text="% acima da tolerância", rangemode="tozero", secondary_y=True)
+    return fig
+
+
+def figura_faixas_por_dia(faixas: pd.DataFrame) -> go.Figure:
+    """Mapa de calor faixa de velocidade x dia, com o % de veiculos do dia."""
+
+    fig = px.imshow(
+        faixas,
+        x=faixas.columns,
+        y=faixas.index,
+        aspect="auto",
+        origin="lower",
+        color_continuous_scale="YlOrRd",
+        labels={"x": "Dia", "y": "Faixa de velocidade", "color": "% dos veículos"},
+        title="Faixas de Velocidade por Dia",
+    )
+    fig.update_layout(height=ALTURA_GRAFICO, margin=MARGENS)
+    return fig
@@ -0,0 +1,317 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Faixas exibidas no grafico "Distribuicao de Veiculos por Faixa de Velocidade".
+# Intervalos fechados a direita, como no pd.cut(right=True) usado antes:
+# 20 km/h cai em "Abaixo de 20 km/h", 21 km/h em "21 a 30 km/h", e assim por diante.
+FAIXAS_LIMITES: tuple[float, ...] = (0, 20, 30, 40, 50, 60, 80, 90, 100, 120, float("inf"))
+FAIXAS_ROTULOS: tuple[str, ...] = (
+    "Abaixo de 20 km/h", "21 a 30 km/h", "31 a 40 km/h", "41 a 50 km/h", "51 a 60 km/h",
+    "61 a 80 km/h", "81 a 90 km/h", "91 a 100 km/h", "101 a 120 km/h", "Acima de 120 km/h",
+)
+
+# Margem de tolerancia sobre a velocidade regulamentada (10%).
+TOLERANCIA_PADRAO = 0.1
+
+# O /velocidades/indicadores nao fixa os nomes dos campos; usamos o primeiro
+# nome encontrado de cada grupo, como nas colunas de inoperancia.
+CAMPOS_RESUMO: dict[str, tuple[str, ...]] = {
+    "total": ("total", "total_veiculos", "total_ocr", "quantidade"),
+    "velocidade_media": ("velocidade_media", "media"),
+    "velocidade_moda": ("velocidade_moda", "moda", "velocidade_mais_praticada"),
+    "velocidade_maxima": ("velocidade_maxima", "maxima"),
+}
+# Diferenca aceita entre servidor e cliente nas velocidades (arredondamento).
+TOLERANCIA_CONSISTENCIA_KMH = 0.5
+
+
+@dataclass(frozen=True)
+class Indicadores:
+    """
+    Indicadores de uma distribuicao de velocidades (velocidade x contagem).
+
+    Media e percentis sao ponderados pela contagem de veiculos, ou seja,
+    descrevem os veiculos e nao os valores distintos de velocidade.
+    """
+
+    total: int
+    velocidade_media: float
+    velocidade_moda: float
+    velocidade_maxima: float
+    v50: float
+    v85: float
+    v95: float
+    dentro_regulamentada: int
+    dentro_tolerancia: int
+    acima_tolerancia: int
+    faixas: pd.DataFrame
+
+    def _pct(self, valor: int) -> float:
+        return round(valor / self.total * 100, 2) if self.total > 0 else 0
+
+    @property
+    def pct_regulamentada(self) -> float:
+        return self._pct(self.dentro_regulamentada)
+
+    @property
+    def pct_dentro_tolerancia(self) -> float:
+        return self._pct(self.dentro_tolerancia)
+
+    @property
+    def pct_acima_tolerancia(self) -> float:
+        return self._pct(self.acima_tolerancia)
+
+
+@dataclass(frozen=True)
+class ResumoIndicadores:
+    """Indicadores dos cards do painel: total lido e velocidades media, moda e maxima."""
+
+    total: int
+    velocidade_media: float
+    velocidade_moda: float
+    velocidade_maxima: float
+
+    @classmethod
+    def de_indicadores(cls, indicadores: Indicadores) -> "ResumoIndicadores":
+        return cls(
+            total=indicadores.total,
+            velocidade_media=indicadores.velocidade_media,
+            velocidade_moda=indicadores.velocidade_moda,
+            velocidade_maxima=indicadores.velocidade_maxima,
+        )
+
+
+def _numero(valor: Any) -> float:
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def resumo_de_payload(payload: Any) -> ResumoIndicadores:
+    """
+    Le o resumo do payload do /velocidades/indicadores.
+
+    Aceita os indicadores no proprio objeto, em `indicadores` ou como primeiro
+    item de `items` (lista vazia = periodo sem leituras).
+    """
+
+    dados = payload
+    if isinstance(dados, dict) and isinstance(dados.get("indicadores"), dict):
+        dados = dados["indicadores"]
+    elif isinstance(dados, dict) and isinstance(dados.get("items"), list):
+        if not dados["items"]:
+            return ResumoIndicadores(
+                total=0, velocidade_media=np.nan, velocidade_moda=np.nan, velocidade_maxima=np.nan
+            )
+        dados = dados["items"][0]
+    if not isinstance(dados, dict):
+        raise RuntimeError("Resposta inesperada da API: indicadores em formato desconhecido.")
+
+    valores, ausentes = {}, []
+    for campo, candidatos in CAMPOS_RESUMO.items():
+        nome = next((c for c in candidatos if c in dados), None)
+        if nome is None:
+            ausentes.append(campo)
+        else:
+            valores[campo] = _numero(dados[nome])
+    if ausentes:
+        raise RuntimeError(
+            f"Resposta inesperada da API: campos ausentes {', '.join(ausentes)}."
+        )
+
+    total = valores.pop("total")
+    return ResumoIndicadores(total=int(total) if not math.isnan(total) else 0, **valores)
+
+
+def divergencias(
+    servidor: ResumoIndicadores,
+    cliente: ResumoIndicadores,
+    tolerancia_kmh: float = TOLERANCIA_CONSISTENCIA_KMH,
+) -> list[str]:
+    """
+    Campos em que os indicadores do servidor e os calculados no cliente
+    discordam: o total precisa bater exatamente e as velocidades ate
+    `tolerancia_kmh`. Lista vazia quando os dois concordam.
+    """
+
+    diferentes = []
+    if servidor.total != cliente.total:
+        diferentes.append(f"total: {servidor.total} x {cliente.total}")
+    for campo in ("velocidade_media", "velocidade_moda", "velocidade_maxima"):
+        a, b = getattr(servidor, campo), getattr(cliente, campo)
+        if math.isnan(a) and math.isnan(b):
+            continue
+        if math.isnan(a) or math.isnan(b) or abs(a - b) > tolerancia_kmh:
+            diferentes.append(f"{campo}: {a:.1f} x {b:.1f}")
+    return diferentes
+
+
+def percentis_ponderados(
+    velocidade: np.ndarray, contagem: np.ndarray, percentis: Sequence[float]
+) -> np.ndarray:
+    """
+    Menor velocidade cuja contagem acumulada alcanca p% do total (ex.: V85).
+
+    Espera `velocidade` em ordem crescente e `contagem` alinhada a ela.
+    """
+
+    acumulado = np.cumsum(contagem)
+    total = acumulado[-1] if len(acumulado) else 0
+    if total <= 0:
+        return np.full(len(percentis), np.nan)
+
+    alvos = np.asarray(percentis, dtype=float) / 100 * total
+    posicoes = np.searchsorted(acumulado, alvos, side="left")
+    return velocidade[np.minimum(posicoes, len(velocidade) - 1)].astype(float)
+
+
+def contar_por_faixa(
+    velocidade: np.ndarray,
+    contagem: np.ndarray,
+    limites: Sequence[float] = FAIXAS_LIMITES,
+    rotulos: Sequence[str] = FAIXAS_ROTULOS,
+) -> pd.DataFrame:
+    """
+    Soma as contagens por faixa de velocidade, mantendo faixas vazias com zero.
+    """
+
+    limites_arr = np.asarray(limites, dtype=float)
+    # Intervalo (limites[i], limites[i+1]]; valores fora das faixas ficam com -1.
+    posicao = np.searchsorted(limites_arr, velocidade, side="left") - 1
+    valida = (posicao >= 0) & (posicao < len(rotulos))
+    somas = np.bincount(posicao[valida], weights=contagem[valida], minlength=len(rotulos))
+
+    return pd.DataFrame(
+        {
+            "faixa": pd.Categorical(list(rotulos), categories=list(rotulos), ordered=True),
+            "contagem": somas[: len(rotulos)].astype(np.int64),
+        }
+    )
+
+
+def calcular_indicadores(
+    velocidade: np.ndarray | pd.Series,
+    contagem: np.ndarray | pd.Series,
+    velocidade_regulamentada: float,
+    tolerancia: float = TOLERANCIA_PADRAO,
+    limites: Sequence[float] = FAIXAS_LIMITES,
+    rotulos: Sequence[str] = FAIXAS_ROTULOS,
+) -> Indicadores:
+    """
+    Calcula todos os indicadores da distribuicao em uma unica passada vetorizada.
+
+    Recebe os arrays `velocidade`/`contagem` do /velocidades/distribuicao (em
+    qualquer ordem, inclusive com velocidades repetidas vindas de varias horas
+    ou varios equipamentos) e a velocidade regulamentada do equipamento.
+    """
+
+    velocidade = np.asarray(velocidade, dtype=float)
+    contagem = np.asarray(contagem, dtype=np.int64)
+
+    ordem = np.argsort(velocidade, kind="stable")
+    velocidade = velocidade[ordem]
+    contagem = contagem[ordem]
+    if len(velocidade) > 1 and not np.all(np.diff(velocidade) > 0):
+        # Velocidades repetidas (por hora, por equipamento...) sao somadas antes,
+        # para que moda e percentis olhem o histograma consolidado.
+        velocidade, posicao = np.unique(velocidade, return_inverse=True)
+        contagem = np.bincount(posicao, weights=contagem).astype(np.int64)
+
+    total = int(contagem.sum())
+    faixas = contar_por_faixa(velocidade, contagem, limites, rotulos)
+    if total <= 0:
+        return Indicadores(
+            total=0,
+            velocidade_media=np.nan,
+            velocidade_moda=np.nan,
+            velocidade_maxima=float(velocidade.max()) if len(velocidade) else np.nan,
+            v50=np.nan,
+            v85=np.nan,
+            v95=np.nan,
+            dentro_regulamentada=0,
+            dentro_tolerancia=0,
+            acima_tolerancia=0,
+            faixas=faixas,
+        )
+
+    v50, v85, v95 = percentis_ponderados(velocidade, contagem, (50, 85, 95))
+
+    # Com as velocidades ordenadas, as faixas regulamentada/tolerancia/excesso
+    # saem direto da contagem acumulada, sem mascaras sobre o array inteiro.
+    acumulado = np.cumsum(contagem)
+    limite_tolerancia = velocidade_regulamentada + velocidade_regulamentada * tolerancia
+    ate_regulamentada = np.searchsorted(velocidade, velocidade_regulamentada, side="right")
+    ate_tolerancia = np.searchsorted(velocidade, limite_tolerancia, side="right")
+    dentro_regulamentada = int(acumulado[ate_regulamentada - 1]) if ate_regulamentada else 0
+    ate_tolerancia_total = int(acumulado[ate_tolerancia - 1]) if ate_tolerancia else 0
+
+    return Indicadores(
+        total=total,
+        velocidade_media=float(np.dot(velocidade, contagem) / total),
+        # Em caso de empate, vence a menor velocidade.
+        velocidade_moda=float(velocidade[np.argmax(contagem)]),
+        velocidade_maxima=float(velocidade[-1]),
+        v50=float(v50),
+        v85=float(v85),
+        v95=float(v95),
+        dentro_regulamentada=dentro_regulamentada,
+        dentro_tolerancia=ate_tolerancia_total - dentro_regulamentada,
+        acima_tolerancia=total - ate_tolerancia_total,
+        faixas=faixas,
+    )
+
+
+def classificar_por_equipamento(
+    equipamento_id: np.ndarray | pd.Series,
+    velocidade: np.ndarray | pd.Series,
+    contagem: np.ndarray | pd.Series,
+    velocidade_regulamentada: np.ndarray | pd.Series,
+    tolerancia: float = TOLERANCIA_PADRAO,
+) -> pd.DataFrame:
+    """
+    Classifica varias distribuicoes de uma vez (ex.: a frota inteira).
+
+    Recebe os histogramas empilhados em formato longo, uma linha por
+    (equipamento, velocidade), com a velocidade regulamentada repetida em cada
+    linha. Tudo e agregado com `np.bincount`, sem laco por equipamento.
+    """
+
+    codigos, ids = pd.factorize(np.asarray(equipamento_id), sort=True)
+    velocidade = np.asarray(velocidade, dtype=float)
+    contagem = np.asarray(contagem, dtype=float)
+    regulamentada = np.asarray(velocidade_regulamentada, dtype=float)
+    limite_tolerancia = regulamentada + regulamentada * tolerancia
+
+    n = len(ids)
+    total = np.bincount(codigos, weights=contagem, minlength=n)
+    soma_velocidades = np.bincount(codigos, weights=contagem * velocidade, minlength=n)
+    dentro_regulamentada = np.bincount(
+        codigos, weights=contagem * (velocidade <= regulamentada), minlength=n
+    )
+    acima_tolerancia = np.bincount(
+        codigos, weights=contagem * (velocidade > limite_tolerancia), minlength=n
+    )
+    dentro_tolerancia = total - dentro_regulamentada - acima_tolerancia
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fator = np.where(total > 0, 100 / total, 0.0)
+        media = np.where(total > 0, soma_velocidades / total, np.nan)
+
+    return pd.DataFrame(
+        {
+            "equipamento_id": ids,
+            "total": total.astype(np.int64),
+            "velocidade_media": media,
+            "dentro_regulamentada": dentro_regulamentada.astype(np.int64),
+            "dentro_tolerancia": dentro_tolerancia.astype(np.int64),
+            "acima_tolerancia": acima_tolerancia.astype(np.int64),
+            "pct_regulamentada": np.round(dentro_regulamentada * fator, 2),
+            "pct_dentro_tolerancia": np.round(dentro_tolerancia * fator, 2),
+            "pct_acima_tolerancia": np.round(acima_tolerancia * fator, 2),
+        }
+    )
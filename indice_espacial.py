@@ -0,0 +1,126 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Celula da grade do indice, em graus (~1,1 km no equador). Cada consulta
+# por area so olha as celulas que cruzam a area, nao a frota inteira.
+CELULA_GRAUS = 0.01
+# Lado aproximado, em pixels de tela, de cada grupo de radares no mapa.
+PIXELS_GRUPO = 60
+# Limite de latitude do Web Mercator (o mapa nao passa disso).
+LATITUDE_MAX_MERCATOR = 85.05112878
+
+# (sul, oeste, norte, leste)
+Limites = tuple[float, float, float, float]
+
+
+class IndiceEspacial:
+    """
+    Indice em grade sobre latitude/longitude dos equipamentos.
+
+    As posicoes devolvidas sao posicoes de linha (iloc) no DataFrame usado
+    para montar o indice.
+    """
+
+    def __init__(self, equipamentos: pd.DataFrame, celula_graus: float = CELULA_GRAUS) -> None:
+        self.celula_graus = celula_graus
+        self.latitude = equipamentos["latitude"].to_numpy(dtype=np.float64)
+        self.longitude = equipamentos["longitude"].to_numpy(dtype=np.float64)
+
+        cy = np.floor(self.latitude / celula_graus).astype(np.int64)
+        cx = np.floor(self.longitude / celula_graus).astype(np.int64)
+        ordem = np.lexsort((cx, cy))
+        chaves = np.stack((cy[ordem], cx[ordem]), axis=1)
+        # Inicio de cada celula na ordenacao: uma fatia de `ordem` por celula.
+        quebras = np.flatnonzero(np.any(np.diff(chaves, axis=0) != 0, axis=1)) + 1
+        inicios = np.concatenate(([0], quebras))
+        fins = np.concatenate((quebras, [len(ordem)]))
+        self._celulas: dict[tuple[int, int], np.ndarray] = {
+            (int(chaves[i, 0]), int(chaves[i, 1])): ordem[i:f]
+            for i, f in zip(inicios, fins)
+            if len(ordem)
+        }
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    def na_area(self, limites: Limites | None) -> np.ndarray:
+        """Posicoes dos equipamentos dentro de `limites` (todos, se None)."""
+
+        if limites is None:
+            return np.arange(len(self))
+        sul, oeste, norte, leste = limites
+        if leste - oeste >= 360:
+            return self._na_faixa(sul, -180.0, norte, 180.0)
+        # Ao arrastar o mapa alem do antimeridiano, o Leaflet devolve
+        # longitudes continuas (ex.: 170 a 190); a area vira ate duas faixas
+        # dentro de [-180, 180].
+        if not -180 <= oeste <= 180:
+            voltas = math.floor((oeste + 180) / 360) * 360
+            oeste, leste = oeste - voltas, leste - voltas
+        if leste <= 180:
+            return self._na_faixa(sul, oeste, norte, leste)
+        return np.union1d(
+            self._na_faixa(sul, oeste, norte, 180.0), self._na_faixa(sul, -180.0, norte, leste - 360)
+        )
+
+    def _na_faixa(self, sul: float, oeste: float, norte: float, leste: float) -> np.ndarray:
+        y0, y1 = math.floor(sul / self.celula_graus), math.floor(norte / self.celula_graus)
+        x0, x1 = math.floor(oeste / self.celula_graus), math.floor(leste / self.celula_graus)
+
+        # Area grande (zoom baixo) tem mais celulas possiveis que ocupadas:
+        # percorre so as ocupadas.
+        if (y1 - y0 + 1) * (x1 - x0 + 1) > len(self._celulas):
+            blocos = [
+                pos for (cy, cx), pos in self._celulas.items()
+                if y0 <= cy <= y1 and x0 <= cx <= x1
+            ]
+        else:
+            blocos = [
+                self._celulas[(cy, cx)]
+                for cy in range(y0, y1 + 1)
+                for cx in range(x0, x1 + 1)
+                if (cy, cx) in self._celulas
+            ]
+        if not blocos:
+            return np.empty(0, dtype=np.int64)
+
+        candidatos = np.concatenate(blocos)
+        lat, lon = self.latitude[candidatos], self.longitude[candidatos]
+        dentro = (lat >= sul) & (lat <= norte) & (lon >= oeste) & (lon <= leste)
+        return np.sort(candidatos[dentro])
+
+    def agrupar(self, posicoes: np.ndarray, zoom: int, pixels: int = PIXELS_GRUPO) -> pd.DataFrame:
+        """
+        Agrupa as `posicoes` em celulas de ~`pixels` de lado no `zoom` dado.
+
+        A grade e fixa no globo (nao depende da area visivel), entao um grupo
+        nao muda de lugar quando o mapa e arrastado. Devolve uma linha por
+        grupo com `latitude`/`longitude` (centroide), `quantidade` e
+        `posicao` (a do primeiro equipamento do grupo, util para grupos de um).
+        """
+
+        if not len(posicoes):
+            return pd.DataFrame(columns=["latitude", "longitude", "quantidade", "posicao"])
+
+        lat, lon = self.latitude[posicoes], self.longitude[posicoes]
+        # Celulas de `pixels` no plano do Web Mercator (o dos tiles do mapa):
+        # so dependem do zoom, nunca de quais radares estao visiveis.
+        lado_mundo = 256 * 2 ** zoom
+        x = (lon + 180.0) / 360.0 * lado_mundo
+        phi = np.radians(np.clip(lat, -LATITUDE_MAX_MERCATOR, LATITUDE_MAX_MERCATOR))
+        y = (1 - np.log(np.tan(phi) + 1 / np.cos(phi)) / math.pi) / 2 * lado_mundo
+        chaves = np.stack((np.floor(y / pixels), np.floor(x / pixels)), axis=1).astype(np.int64)
+        _, primeiro, grupo, quantidade = np.unique(
+            chaves, axis=0, return_index=True, return_inverse=True, return_counts=True
+        )
+        grupo = grupo.ravel()
+        return pd.DataFrame(
+            {
+                "latitude": np.bincount(grupo, weights=lat) / quantidade,
+                "longitude": np.bincount(grupo, weights=lon) / quantidade,
+                "quantidade": quantidade,
+                "posicao": posicoes[primeiro],
+            }
+        )
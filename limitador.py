@@ -0,0 +1,216 @@
+import threading
+import time
+from typing import Callable
+
+# Fatores do controle AIMD do limite de requisicoes simultaneas: sobe devagar
+# (+1 a cada `limite` respostas boas) e cai rapido quando a API reclama.
+FATOR_REDUCAO_ERRO = 0.5
+FATOR_REDUCAO_LATENCIA = 0.9
+# Depois de uma reducao, novas reducoes so valem apos este intervalo: as
+# respostas ruins de uma mesma rajada nao derrubam o limite varias vezes.
+INTERVALO_REDUCAO_S = 1.0
+# Fracao da taxa configurada abaixo da qual o balde de um endpoint nao desce.
+TAXA_MINIMA_FRACAO = 0.1
+
+
+def sobrecarga(status: int | None, latencia_s: float, latencia_alvo_s: float, retries: int = 0) -> str | None:
+    """
+    Classifica a resposta como sinal de sobrecarga da API.
+
+    Devolve "erro" para 429, 5xx, timeouts/falhas de conexao (`status`
+    None) ou respostas que precisaram de novas tentativas, "latencia" para
+    respostas mais lentas que o alvo e None quando a resposta foi normal.
+    """
+
+    if status is None or status == 429 or status >= 500 or retries > 0:
+        return "erro"
+    if latencia_alvo_s > 0 and latencia_s > latencia_alvo_s:
+        return "latencia"
+    return None
+
+
+class _Balde:
+    """Token bucket de um endpoint: `taxa` requisicoes/s com rajadas de ate `capacidade`."""
+
+    __slots__ = ("taxa", "taxa_base", "capacidade", "tokens", "atualizado", "pausa_ate")
+
+    def __init__(self, taxa: float, capacidade: float, agora: float) -> None:
+        self.taxa = taxa
+        self.taxa_base = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.atualizado = agora
+        self.pausa_ate = 0.0
+
+    def reservar(self, agora: float, espera_max: float) -> float | None:
+        """
+        Reserva um token e devolve quanto esperar ate poder usa-lo.
+
+        O saldo pode ficar negativo: cada reserva entra na fila do balde e
+        espera a sua vez. Se a espera passar de `espera_max`, nada e
+        reservado e volta None.
+        """
+
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+        espera = max(0.0, (1 - self.tokens) / self.taxa, self.pausa_ate - agora)
+        if espera > espera_max:
+            return None
+        self.tokens -= 1
+        return espera
+
+
+class LimitadorAPI:
+    """
+    Limita, no processo todo, quantas requisicoes vao a API ao mesmo tempo.
+
+    - `limite` requisicoes simultaneas, ajustado entre `min_em_voo` e
+      `max_em_voo` conforme as respostas (AIMD): cai pela metade com 429,
+      5xx, timeouts ou novas tentativas, cai 10% com latencia acima de
+      `latencia_alvo_s` e volta a subir aos poucos com respostas normais
+    - opcionalmente, um token bucket por endpoint (`taxa_por_s` > 0), cuja
+      taxa tambem cai com 429/5xx daquele endpoint e pausa pelo tempo do
+      `Retry-After`
+    - quem nao consegue vaga em `espera_max_s` recebe um erro em vez de
+      esperar indefinidamente
+
+    Com a API saturada, o painel passa a enfileirar as consultas no cliente
+    em vez de acumular timeouts na API.
+    """
+
+    def __init__(
+        self,
+        max_em_voo: int,
+        min_em_voo: int = 1,
+        taxa_por_s: float = 0.0,
+        rajada: int = 10,
+        latencia_alvo_s: float = 0.0,
+        espera_max_s: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_em_voo = max(1, max_em_voo)
+        self.min_em_voo = max(1, min(min_em_voo, self.max_em_voo))
+        self.taxa_por_s = taxa_por_s
+        self.rajada = max(1, rajada)
+        self.latencia_alvo_s = latencia_alvo_s
+        self.espera_max_s = espera_max_s
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._limite = float(self.max_em_voo)
+        self._em_voo = 0
+        self._fila = 0
+        self._proxima_reducao = 0.0
+        self._baldes: dict[str, _Balde] = {}
+        self._stats = {
+            "requisicoes": 0,
+            "enfileiradas": 0,
+            "rejeitadas": 0,
+            "reducoes": 0,
+            "espera_total_ms": 0.0,
+            "espera_max_ms": 0.0,
+        }
+
+    @property
+    def limite(self) -> int:
+        return int(self._limite)
+
+    def adquirir(self, endpoint: str) -> float:
+        """
+        Espera a vez de `endpoint` (token do balde e vaga de concorrencia).
+
+        Devolve quantos segundos esperou; toda chamada bem-sucedida precisa
+        de um `liberar` correspondente.
+        """
+
+        inicio = self._clock()
+        prazo = inicio + self.espera_max_s
+        enfileirada = False
+
+        if self.taxa_por_s > 0:
+            with self._cond:
+                balde = self._baldes.get(endpoint)
+                if balde is None:
+                    balde = self._baldes[endpoint] = _Balde(self.taxa_por_s, self.rajada, inicio)
+                espera = balde.reservar(inicio, self.espera_max_s)
+                if espera is None:
+                    self._stats["rejeitadas"] += 1
+            if espera is None:
+                raise self._erro_sobrecarga(endpoint)
+            if espera > 0:
+                enfileirada = True
+                time.sleep(espera)
+
+        with self._cond:
+            self._fila += 1
+            try:
+                while self._em_voo >= self.limite:
+                    enfileirada = True
+                    restante = prazo - self._clock()
+                    if restante <= 0:
+                        self._stats["rejeitadas"] += 1
+                        raise self._erro_sobrecarga(endpoint)
+                    self._cond.wait(restante)
+                self._em_voo += 1
+            finally:
+                self._fila -= 1
+
+            esperou = self._clock() - inicio
+            self._stats["requisicoes"] += 1
+            if enfileirada:
+                self._stats["enfileiradas"] += 1
+            self._stats["espera_total_ms"] += esperou * 1000
+            self._stats["espera_max_ms"] = max(self._stats["espera_max_ms"], esperou * 1000)
+        return esperou
+
+    def liberar(
+        self,
+        endpoint: str,
+        latencia_s: float,
+        status: int | None,
+        retries: int = 0,
+        retry_after_s: float | None = None,
+    ) -> None:
+        """Devolve a vaga e ajusta limite e taxa com o que a resposta revelou."""
+
+        sinal = sobrecarga(status, latencia_s, self.latencia_alvo_s, retries)
+        with self._cond:
+            self._em_voo -= 1
+            agora = self._clock()
+            if sinal is None:
+                self._limite = min(self.max_em_voo, self._limite + 1 / self._limite)
+            elif agora >= self._proxima_reducao:
+                fator = FATOR_REDUCAO_ERRO if sinal == "erro" else FATOR_REDUCAO_LATENCIA
+                self._limite = max(self.min_em_voo, self._limite * fator)
+                self._proxima_reducao = agora + INTERVALO_REDUCAO_S
+                self._stats["reducoes"] += 1
+
+            balde = self._baldes.get(endpoint)
+            if balde is not None:
+                if status == 429 or (status is not None and status >= 500):
+                    balde.taxa = max(balde.taxa_base * TAXA_MINIMA_FRACAO, balde.taxa * FATOR_REDUCAO_ERRO)
+                elif sinal is None:
+                    balde.taxa = min(balde.taxa_base, balde.taxa + balde.taxa_base * TAXA_MINIMA_FRACAO)
+                if retry_after_s:
+                    balde.pausa_ate = max(balde.pausa_ate, agora + retry_after_s)
+            self._cond.notify_all()
+
+    def _erro_sobrecarga(self, endpoint: str) -> RuntimeError:
+        return RuntimeError(
+            f"API sobrecarregada: a consulta a {endpoint} esperou mais de "
+            f"{self.espera_max_s:g} s na fila do dashboard. Tente novamente em instantes."
+        )
+
+    def stats(self) -> dict[str, float]:
+        with self._cond:
+            stats = {
+                **self._stats,
+                "espera_total_ms": round(self._stats["espera_total_ms"], 1),
+                "espera_max_ms": round(self._stats["espera_max_ms"], 1),
+                "limite": self.limite,
+                "max_em_voo": self.max_em_voo,
+                "em_voo": self._em_voo,
+                "fila": self._fila,
+            }
+            for endpoint, balde in sorted(self._baldes.items()):
+                stats[f"taxa{endpoint.replace('/', '_')}"] = round(balde.taxa, 2)
+            return stats
@@ -0,0 +1,299 @@
+import base64
+import io
+import math
+from functools import lru_cache
+from pathlib import Path
+
+import folium
+import pandas as pd
+from PIL import Image
+
+from configuracao import env_int
+from indice_espacial import IndiceEspacial, Limites
+
+ICONE_ATIVO = "icon/icone_radar_ativo.png"
+ICONE_INATIVO = "icon/icone_radar_inativo.png"
+
+# Classes de cor da camada de conformidade, pelo % de veiculos acima da
+# tolerancia: (rotulo, cor, limite superior exclusivo do % de excesso).
+CLASSES_EXCESSO = (
+    ("Excesso abaixo de 5%", "#0c810c", 5.0),
+    ("Excesso de 5% a 15%", "#f59e0b", 15.0),
+    ("Excesso de 15% ou mais", "#c71111", float("inf")),
+)
+COR_SEM_DADOS = "#9ca3af"
+
+# Os PNGs originais tem quase 1000px, mas no mapa aparecem com 32px.
+# Reduzimos uma vez para 64px (nitido em telas de alta densidade) antes de embutir.
+TAMANHO_ICONE_EMBUTIDO = (64, 64)
+
+ZOOM_INICIAL = 12
+# Acima de MAPA_MAX_MARCADORES radares o mapa passa a desenhar so a area
+# visivel: grupos de radares abaixo do zoom MAPA_ZOOM_MARCADORES e, a partir
+# dele, os marcadores individuais.
+MAPA_MAX_MARCADORES = env_int("MAPA_MAX_MARCADORES", 500)
+MAPA_ZOOM_MARCADORES = env_int("MAPA_ZOOM_MARCADORES", 15)
+
+
+@lru_cache(maxsize=None)
+def icone_b64(path: str) -> str:
+    """
+    Le o icone uma unica vez por processo e devolve o PNG reduzido em base64.
+    """
+
+    p = Path(path)
+    if not p.exists():
+        return ""  # evita quebrar a página se faltar o arquivo
+
+    try:
+        with Image.open(p) as img:
+            reduzido = img.convert("RGBA").resize(TAMANHO_ICONE_EMBUTIDO, Image.LANCZOS)
+            buffer = io.BytesIO()
+            reduzido.save(buffer, format="PNG", optimize=True)
+            dados = buffer.getvalue()
+    except OSError:
+        dados = p.read_bytes()
+
+    return base64.b64encode(dados).decode("utf-8")
+
+
+def _feature_collection(equipamentos: pd.DataFrame, extras: tuple[str, ...] = ()) -> dict:
+    # Montagem coluna a coluna: evita iterrows() e serializa so o que o mapa usa.
+    colunas_extras = [equipamentos[c].tolist() for c in extras]
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [float(lon), float(lat)]},
+            "properties": {
+                "nome_processador": str(nome),
+                "id": int(eq_id),
+                **{c: valores[i] for c, valores in zip(extras, colunas_extras)},
+            },
+        }
+        for i, (nome, eq_id, lat, lon) in enumerate(
+            zip(
+                equipamentos["nome_processador"],
+                equipamentos["id"],
+                equipamentos["latitude"],
+                equipamentos["longitude"],
+            )
+        )
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _tooltip_nome() -> folium.GeoJsonTooltip:
+    # labels=False deixa no tooltip so o nome_processador, que e o texto
+    # que o st_folium devolve em last_object_clicked_tooltip.
+    return folium.GeoJsonTooltip(fields=["nome_processador"], labels=False)
+
+
+def _camadas_status(m: folium.Map | folium.FeatureGroup, equipamentos_validos: pd.DataFrame) -> None:
+    ativos = equipamentos_validos["status"] == 1
+    for mascara, icon_path in ((ativos, ICONE_ATIVO), (~ativos, ICONE_INATIVO)):
+        grupo = equipamentos_validos[mascara]
+        if grupo.empty:
+            continue
+
+        icon = folium.CustomIcon(
+            f"data:image/png;base64,{icone_b64(icon_path)}",
+            icon_size=(32, 32),
+            icon_anchor=(16, 16),
+        )
+        folium.GeoJson(
+            _feature_collection(grupo),
+            marker=folium.Marker(icon=icon),
+            tooltip=_tooltip_nome(),
+            popup=folium.GeoJsonPopup(
+                fields=["nome_processador", "id"], aliases=["Nome:", "ID:"]
+            ),
+        ).add_to(m)
+
+
+def _camadas_conformidade(m: folium.Map | folium.FeatureGroup, conformidade: pd.DataFrame) -> None:
+    # Uma camada por classe de cor, com o estilo fixo declarado uma vez,
+    # no mesmo esquema das camadas por status.
+    pct = conformidade["pct_acima_tolerancia"]
+    sem_dados = conformidade["total"] <= 0
+    classes = [("Sem dados", COR_SEM_DADOS, sem_dados)]
+    limite_inferior = float("-inf")
+    for rotulo, cor, limite_superior in CLASSES_EXCESSO:
+        classes.append(
+            (rotulo, cor, ~sem_dados & (pct >= limite_inferior) & (pct < limite_superior))
+        )
+        limite_inferior = limite_superior
+
+    for rotulo, cor, mascara in classes:
+        grupo = conformidade[mascara]
+        if grupo.empty:
+            continue
+
+        folium.GeoJson(
+            _feature_collection(grupo, extras=("pct_acima_tolerancia",)),
+            name=rotulo,
+            marker=folium.CircleMarker(
+                radius=8, color="#ffffff", weight=1, fill=True,
+                fill_color=cor, fill_opacity=0.9,
+            ),
+            tooltip=_tooltip_nome(),
+            popup=folium.GeoJsonPopup(
+                fields=["nome_processador", "id", "pct_acima_tolerancia"],
+                aliases=["Nome:", "ID:", "% excesso:"],
+            ),
+        ).add_to(m)
+
+
+def montar_mapa(
+    equipamentos_validos: pd.DataFrame,
+    conformidade: pd.DataFrame | None = None,
+    por_area: bool = False,
+) -> folium.Map:
+    """
+    Monta o mapa dos radares.
+
+    Cada status vira uma unica camada GeoJson com o icone declarado uma vez,
+    em vez de um Marker com a imagem embutida por radar. O HTML enviado ao
+    navegador passa a crescer com as coordenadas, nao com as imagens.
+
+    Com `conformidade` (saida do modo frota), os radares sao desenhados como
+    circulos coloridos pelo % de excesso de velocidade em vez dos icones.
+
+    Com `por_area`, o mapa vem sem radares: eles entram depois pela camada
+    da area visivel (`camada_visivel`).
+    """
+
+    m = mapa_base(equipamentos_validos)
+
+    if not por_area:
+        if conformidade is None:
+            _camadas_status(m, equipamentos_validos)
+        else:
+            _camadas_conformidade(m, conformidade)
+
+    return m
+
+
+def mapa_saude_ocr(equipamentos_validos: pd.DataFrame, degradados: pd.DataFrame) -> folium.Map:
+    """Radares com OCR degradado (saida de `saude_ocr.radares_degradados`) sobre a frota."""
+
+    m = mapa_base(equipamentos_validos)
+    if not degradados.empty:
+        folium.GeoJson(
+            _feature_collection(
+                degradados.assign(aproveitamento_ocr=degradados["aproveitamento_ocr"].round(1)),
+                extras=("aproveitamento_ocr",),
+            ),
+            marker=folium.CircleMarker(
+                radius=8, color="#ffffff", weight=1, fill=True,
+                fill_color=CLASSES_EXCESSO[-1][1], fill_opacity=0.9,
+            ),
+            tooltip=_tooltip_nome(),
+            popup=folium.GeoJsonPopup(
+                fields=["nome_processador", "id", "aproveitamento_ocr"],
+                aliases=["Nome:", "ID:", "Aproveitamento OCR (%):"],
+            ),
+        ).add_to(m)
+    return m
+
+
+def mapa_base(equipamentos_validos: pd.DataFrame) -> folium.Map:
+    """Mapa vazio centrado na frota; os radares entram como camadas."""
+
+    map_center = [
+        equipamentos_validos["latitude"].mean(),
+        equipamentos_validos["longitude"].mean(),
+    ]
+    return folium.Map(location=map_center, zoom_start=ZOOM_INICIAL)
+
+
+def limites_do_mapa(bounds: dict | None) -> Limites | None:
+    """Converte o `bounds` devolvido pelo st_folium em (sul, oeste, norte, leste)."""
+
+    try:
+        sudoeste, nordeste = bounds["_southWest"], bounds["_northEast"]
+        limites = (
+            float(sudoeste["lat"]), float(sudoeste["lng"]),
+            float(nordeste["lat"]), float(nordeste["lng"]),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+    # Antes do primeiro desenho o componente devolve limites vazios.
+    if limites[0] == limites[2] or limites[1] == limites[3]:
+        return None
+    return limites
+
+
+def ajustar_limites(limites: Limites | None, zoom: int) -> Limites | None:
+    """
+    Amplia os limites visiveis ate a grade de tiles (256 px) do zoom atual.
+
+    Da uma margem para arrastar o mapa sem areas vazias nas bordas e faz
+    pequenos deslocamentos cairem nos mesmos limites, reaproveitando a
+    camada ja montada.
+    """
+
+    if limites is None:
+        return None
+    passo = 360.0 / 2 ** zoom
+    sul, oeste, norte, leste = limites
+    return (
+        math.floor(sul / passo) * passo, math.floor(oeste / passo) * passo,
+        math.ceil(norte / passo) * passo, math.ceil(leste / passo) * passo,
+    )
+
+
+def _camada_grupos(fg: folium.FeatureGroup, grupos: pd.DataFrame) -> None:
+    for lat, lon, quantidade in zip(grupos["latitude"], grupos["longitude"], grupos["quantidade"]):
+        lado = 30 if quantidade < 10 else 36 if quantidade < 100 else 44
+        folium.Marker(
+            location=(float(lat), float(lon)),
+            icon=folium.DivIcon(
+                html=(
+                    f'<div style="width:{lado}px;height:{lado}px;line-height:{lado}px;'
+                    'border-radius:50%;background:rgba(37,99,235,0.85);color:#fff;'
+                    'border:2px solid #fff;text-align:center;font:600 12px sans-serif;">'
+                    f"{quantidade}</div>"
+                ),
+                icon_size=(lado, lado),
+                icon_anchor=(lado // 2, lado // 2),
+            ),
+            tooltip=f"{quantidade} radares (aproxime o mapa para selecionar)",
+        ).add_to(fg)
+
+
+def camada_visivel(
+    pontos: pd.DataFrame,
+    indice: IndiceEspacial,
+    limites: Limites | None,
+    zoom: int,
+    conformidade: bool = False,
+) -> tuple[folium.FeatureGroup, int]:
+    """
+    Camada so com o que cabe em `limites` no `zoom` atual.
+
+    `pontos` sao os equipamentos validos (ou a conformidade da frota, com
+    `conformidade=True`) e `indice` o indice espacial montado sobre eles.
+    Abaixo de MAPA_ZOOM_MARCADORES, radares proximos viram um grupo com a
+    quantidade; grupos de um radar so e radares a partir desse zoom sao
+    desenhados como no mapa completo, com o mesmo tooltip para o clique.
+    Devolve a camada e quantos marcadores ela desenha.
+    """
+
+    fg = folium.FeatureGroup(name="Radares")
+    posicoes = indice.na_area(limites)
+    if zoom < MAPA_ZOOM_MARCADORES:
+        grupos = indice.agrupar(posicoes, zoom)
+        multiplos = grupos["quantidade"] > 1
+        _camada_grupos(fg, grupos[multiplos])
+        posicoes = grupos.loc[~multiplos, "posicao"].to_numpy(dtype=int)
+        marcadores = int(multiplos.sum()) + len(posicoes)
+    else:
+        marcadores = len(posicoes)
+
+    individuais = pontos.iloc[posicoes]
+    if not individuais.empty:
+        if conformidade:
+            _camadas_conformidade(fg, individuais)
+        else:
+            _camadas_status(fg, individuais)
+    return fg, marcadores
@@ -0,0 +1,314 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import numpy as np
+
+from configuracao import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+# Amostras mantidas por serie para calcular p50/p95 (janela deslizante).
+METRICAS_AMOSTRAS = max(1, env_int("METRICAS_AMOSTRAS", 2048))
+# Com METRICAS_LOG=true cada chamada/etapa vira uma linha JSON no log.
+METRICAS_LOG = env_bool("METRICAS_LOG")
+# Arquivo no formato texto do Prometheus (ex.: para o textfile collector do
+# node_exporter). Vazio desliga a exportacao em arquivo.
+METRICAS_PROMETHEUS_ARQUIVO = os.getenv("METRICAS_PROMETHEUS_ARQUIVO", "").strip()
+METRICAS_PROMETHEUS_INTERVALO_S = env_float("METRICAS_PROMETHEUS_INTERVALO_S", 15.0)
+
+if METRICAS_LOG and not logger.handlers:
+    # Sem handler e nivel proprios, o logger herda o WARNING da raiz e as
+    # linhas INFO somem. Cada linha ja e um JSON completo.
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def hash_params(params: dict[str, Any] | None) -> str:
+    """Hash curto e estavel dos parametros, para agrupar sem expor valores no log."""
+
+    texto = json.dumps(params or {}, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:10]
+
+
+class _Serie:
+    __slots__ = ("amostras", "contagem", "soma")
+
+    def __init__(self) -> None:
+        self.amostras: deque[float] = deque(maxlen=METRICAS_AMOSTRAS)
+        self.contagem = 0
+        self.soma = 0.0
+
+    def adicionar(self, valor: float) -> None:
+        self.amostras.append(valor)
+        self.contagem += 1
+        self.soma += valor
+
+    def percentis(self) -> tuple[float, float]:
+        if not self.amostras:
+            return float("nan"), float("nan")
+        p50, p95 = np.percentile(np.fromiter(self.amostras, dtype=float), (50, 95))
+        return float(p50), float(p95)
+
+
+class Metricas:
+    """
+    Registro de desempenho do processo: chamadas a API e etapas do rerun.
+
+    Latencias ficam em janelas deslizantes por serie (p50/p95); bytes,
+    origem da resposta (rede, cache, disco, 304) e retries viram contadores.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._api: dict[tuple[str, str], _Serie] = defaultdict(_Serie)
+        self._etapas: dict[str, _Serie] = defaultdict(_Serie)
+        self._bytes: dict[str, int] = defaultdict(int)
+        self._retries: dict[str, int] = defaultdict(int)
+        self._erros: dict[str, int] = defaultdict(int)
+        self._esperas: dict[str, _Serie] = defaultdict(_Serie)
+        self._medidores: dict[str, tuple[str, Callable[[], float]]] = {}
+        self._ultima_exportacao = 0.0
+
+    def registrar_chamada(
+        self,
+        endpoint: str,
+        params: dict[str, Any] | None,
+        latencia_s: float,
+        origem: str,
+        bytes_recebidos: int = 0,
+        retries: int = 0,
+        status: int | None = None,
+        erro: bool = False,
+    ) -> None:
+        with self._lock:
+            self._api[(endpoint, origem)].adicionar(latencia_s)
+            self._bytes[endpoint] += bytes_recebidos
+            self._retries[endpoint] += retries
+            if erro:
+                self._erros[endpoint] += 1
+
+        if METRICAS_LOG:
+            logger.info(
+                json.dumps(
+                    {
+                        "evento": "api",
+                        "endpoint": endpoint,
+                        "params": hash_params(params),
+                        "latencia_ms": round(latencia_s * 1000, 1),
+                        "origem": origem,
+                        "bytes": bytes_recebidos,
+                        "retries": retries,
+                        "status": status,
+                        "erro": erro,
+                    }
+                )
+            )
+
+    def registrar_espera(self, endpoint: str, espera_s: float) -> None:
+        """Tempo que uma chamada passou na fila do limitador antes de ir a rede."""
+
+        with self._lock:
+            self._esperas[endpoint].adicionar(espera_s)
+
+    def adicionar_medidor(self, nome: str, ajuda: str, ler: Callable[[], float]) -> None:
+        """Valor instantaneo (gauge) lido por `ler` a cada exportacao."""
+
+        with self._lock:
+            self._medidores[nome] = (ajuda, ler)
+
+    def registrar_etapa(self, etapa: str, duracao_s: float) -> None:
+        with self._lock:
+            self._etapas[etapa].adicionar(duracao_s)
+
+        if METRICAS_LOG:
+            logger.info(
+                json.dumps(
+                    {"evento": "etapa", "etapa": etapa, "duracao_ms": round(duracao_s * 1000, 1)}
+                )
+            )
+
+    def resumo_api(self) -> list[dict[str, Any]]:
+        with self._lock:
+            itens = list(self._api.items())
+            bytes_por_endpoint = dict(self._bytes)
+            retries = dict(self._retries)
+            erros = dict(self._erros)
+
+        linhas = []
+        for (endpoint, origem), serie in sorted(itens):
+            p50, p95 = serie.percentis()
+            linhas.append(
+                {
+                    "endpoint": endpoint,
+                    "origem": origem,
+                    "chamadas": serie.contagem,
+                    "p50_ms": round(p50 * 1000, 1),
+                    "p95_ms": round(p95 * 1000, 1),
+                    "bytes": bytes_por_endpoint.get(endpoint, 0),
+                    "retries": retries.get(endpoint, 0),
+                    "erros": erros.get(endpoint, 0),
+                }
+            )
+        return linhas
+
+    def resumo_esperas(self) -> list[dict[str, Any]]:
+        with self._lock:
+            itens = list(self._esperas.items())
+
+        linhas = []
+        for endpoint, serie in sorted(itens):
+            p50, p95 = serie.percentis()
+            linhas.append(
+                {
+                    "endpoint": endpoint,
+                    "chamadas": serie.contagem,
+                    "p50_ms": round(p50 * 1000, 1),
+                    "p95_ms": round(p95 * 1000, 1),
+                }
+            )
+        return linhas
+
+    def resumo_etapas(self) -> list[dict[str, Any]]:
+        with self._lock:
+            itens = list(self._etapas.items())
+
+        linhas = []
+        for etapa, serie in sorted(itens):
+            p50, p95 = serie.percentis()
+            linhas.append(
+                {
+                    "etapa": etapa,
+                    "execucoes": serie.contagem,
+                    "p50_ms": round(p50 * 1000, 1),
+                    "p95_ms": round(p95 * 1000, 1),
+                }
+            )
+        return linhas
+
+    def exportar_prometheus(self) -> str:
+        """
+        Texto no formato de exposicao do Prometheus (summaries + contadores).
+        """
+
+        with self._lock:
+            api = [(k, s.contagem, s.soma, s.percentis()) for k, s in self._api.items()]
+            etapas = [(k, s.contagem, s.soma, s.percentis()) for k, s in self._etapas.items()]
+            esperas = [(k, s.contagem, s.soma, s.percentis()) for k, s in self._esperas.items()]
+            medidores = dict(self._medidores)
+            bytes_por_endpoint = dict(self._bytes)
+            retries = dict(self._retries)
+            erros = dict(self._erros)
+
+        linhas = [
+            "# HELP dashboard_api_request_seconds Latencia das chamadas a mobilidade-api.",
+            "# TYPE dashboard_api_request_seconds summary",
+        ]
+        for (endpoint, origem), contagem, soma, (p50, p95) in sorted(api):
+            rotulos = f'endpoint="{endpoint}",origem="{origem}"'
+            linhas.append(f'dashboard_api_request_seconds{{{rotulos},quantile="0.5"}} {p50:.6f}')
+            linhas.append(f'dashboard_api_request_seconds{{{rotulos},quantile="0.95"}} {p95:.6f}')
+            linhas.append(f"dashboard_api_request_seconds_sum{{{rotulos}}} {soma:.6f}")
+            linhas.append(f"dashboard_api_request_seconds_count{{{rotulos}}} {contagem}")
+
+        for nome, ajuda, valores in (
+            ("dashboard_api_response_bytes_total", "Bytes recebidos da API.", bytes_por_endpoint),
+            ("dashboard_api_retries_total", "Novas tentativas feitas pelo transporte HTTP.", retries),
+            ("dashboard_api_errors_total", "Chamadas que terminaram em erro.", erros),
+        ):
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} counter")
+            for endpoint, valor in sorted(valores.items()):
+                linhas.append(f'{nome}{{endpoint="{endpoint}"}} {valor}')
+
+        linhas.append("# HELP dashboard_api_queue_wait_seconds Espera na fila do limitador antes da requisicao.")
+        linhas.append("# TYPE dashboard_api_queue_wait_seconds summary")
+        for endpoint, contagem, soma, (p50, p95) in sorted(esperas):
+            rotulos = f'endpoint="{endpoint}"'
+            linhas.append(f'dashboard_api_queue_wait_seconds{{{rotulos},quantile="0.5"}} {p50:.6f}')
+            linhas.append(f'dashboard_api_queue_wait_seconds{{{rotulos},quantile="0.95"}} {p95:.6f}')
+            linhas.append(f"dashboard_api_queue_wait_seconds_sum{{{rotulos}}} {soma:.6f}")
+            linhas.append(f"dashboard_api_queue_wait_seconds_count{{{rotulos}}} {contagem}")
+
+        for nome, (ajuda, ler) in sorted(medidores.items()):
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} gauge")
+            linhas.append(f"{nome} {ler()}")
+
+        linhas.append("# HELP dashboard_rerun_stage_seconds Duracao das etapas do rerun.")
+        linhas.append("# TYPE dashboard_rerun_stage_seconds summary")
+        for etapa, contagem, soma, (p50, p95) in sorted(etapas):
+            linhas.append(f'dashboard_rerun_stage_seconds{{etapa="{etapa}",quantile="0.5"}} {p50:.6f}')
+            linhas.append(f'dashboard_rerun_stage_seconds{{etapa="{etapa}",quantile="0.95"}} {p95:.6f}')
+            linhas.append(f'dashboard_rerun_stage_seconds_sum{{etapa="{etapa}"}} {soma:.6f}')
+            linhas.append(f'dashboard_rerun_stage_seconds_count{{etapa="{etapa}"}} {contagem}')
+
+        return "\n".join(linhas) + "\n"
+
+    def exportar_arquivo(self, forcar: bool = False) -> None:
+        """
+        Grava o texto do Prometheus em METRICAS_PROMETHEUS_ARQUIVO, no maximo
+        a cada METRICAS_PROMETHEUS_INTERVALO_S segundos.
+        """
+
+        if not METRICAS_PROMETHEUS_ARQUIVO:
+            return
+        agora = time.monotonic()
+        with self._lock:
+            if not forcar and agora - self._ultima_exportacao < METRICAS_PROMETHEUS_INTERVALO_S:
+                return
+            self._ultima_exportacao = agora
+
+        destino = Path(METRICAS_PROMETHEUS_ARQUIVO)
+        temporario = destino.with_suffix(destino.suffix + ".tmp")
+        try:
+            temporario.write_text(self.exportar_prometheus(), encoding="utf-8")
+            # Troca atomica: o coletor nunca le um arquivo pela metade.
+            temporario.replace(destino)
+        except OSError:
+            logger.exception("Nao foi possivel gravar as metricas em %s", destino)
+
+
+class Rerun:
+    """
+    Cronometro das etapas de um rerun (ou de um fragmento) do dashboard.
+
+    Cada etapa medida vai para o registro do processo e tambem fica guardada
+    aqui, para o painel de diagnostico mostrar o rerun atual.
+    """
+
+    def __init__(self, registro: "Metricas", total: str = "rerun_total") -> None:
+        self.registro = registro
+        self.total = total
+        self.inicio = time.perf_counter()
+        self.etapas: list[tuple[str, float]] = []
+
+    @contextmanager
+    def etapa(self, nome: str) -> Iterator[None]:
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.etapas.append((nome, duracao))
+            self.registro.registrar_etapa(nome, duracao)
+
+    def finalizar(self) -> float:
+        total = time.perf_counter() - self.inicio
+        self.etapas.append((self.total, total))
+        self.registro.registrar_etapa(self.total, total)
+        self.registro.exportar_arquivo()
+        return total
+
+
+metricas = Metricas()
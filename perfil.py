@@ -0,0 +1,55 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from configuracao import env_int
+from distribuicao_diaria import HistogramaDia
+from indicadores import FAIXAS_ROTULOS, TOLERANCIA_PADRAO, calcular_indicadores
+
+# Perfis muito longos viram uma consulta por dia; acima disso o painel pede
+# um periodo menor em vez de disparar centenas de requisicoes.
+PERFIL_MAX_DIAS = env_int("API_PERFIL_MAX_DIAS", 92)
+
+
+def perfil_diario(
+    histogramas: dict[date, HistogramaDia],
+    velocidade_regulamentada: float,
+    tolerancia: float = TOLERANCIA_PADRAO,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Indicadores de cada dia a partir dos histogramas diarios.
+
+    Devolve `(perfil, faixas)`: `perfil` tem uma linha por dia com total,
+    velocidade media, V85 e % acima da tolerancia; `faixas` e a matriz
+    faixa de velocidade x dia com o % de veiculos do dia em cada faixa.
+    Dias sem leituras ficam com total zero e indicadores vazios (NaN).
+    """
+
+    linhas = []
+    colunas_faixas = {}
+    for dia, (velocidade, contagem) in histogramas.items():
+        indicadores = calcular_indicadores(
+            velocidade, contagem, velocidade_regulamentada, tolerancia=tolerancia
+        )
+        linhas.append(
+            {
+                "dia": pd.Timestamp(dia),
+                "total": indicadores.total,
+                "velocidade_media": indicadores.velocidade_media,
+                "v85": indicadores.v85,
+                "pct_acima_tolerancia": (
+                    indicadores.pct_acima_tolerancia if indicadores.total else np.nan
+                ),
+            }
+        )
+        contagens = indicadores.faixas["contagem"].to_numpy(dtype=float)
+        colunas_faixas[pd.Timestamp(dia)] = (
+            contagens / indicadores.total * 100 if indicadores.total else np.full(len(contagens), np.nan)
+        )
+
+    perfil = pd.DataFrame(
+        linhas, columns=["dia", "total", "velocidade_media", "v85", "pct_acima_tolerancia"]
+    )
+    faixas = pd.DataFrame(colunas_faixas, index=list(FAIXAS_ROTULOS))
+    return perfil, faixas
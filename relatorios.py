@@ -0,0 +1,285 @@
+"""
+Geracao em lote dos relatorios por radar, sem abrir o dashboard.
+
+Para um periodo e uma lista de equipamentos (ou todos), busca os dados pelo
+APIClient, calcula os mesmos indicadores e graficos do painel e grava um HTML
+por radar, mais um index.html e um resumo.csv com todos eles:
+
+    python relatorios.py --inicio 2026-09-01 --fim 2026-09-30 --saida saida_relatorios/2026-09
+    python relatorios.py --inicio 2026-09-01 --fim 2026-09-30 --equipamentos 12 15 40
+
+Os radares sao distribuidos entre processos (um por nucleo, por padrao).
+"""
+
+import argparse
+import html
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from dotenv import load_dotenv
+from plotly.offline import get_plotlyjs
+
+from api_client import APIClient
+from graficos import figuras_equipamento
+from indicadores import calcular_indicadores
+
+# Mesmo CSS de impressao do dashboard (A4, quebras de pagina, graficos lado a lado).
+CSS = """
+body { font-family: sans-serif; color: #111827; margin: 24px; }
+.report-section { margin-bottom: 18px; }
+.avoid-break { break-inside: avoid; page-break-inside: avoid; }
+.print-page-break { height: 0; }
+.two-up { display: flex; gap: 12px; }
+.two-up > div { flex: 1 1 50%; min-width: 0; }
+.cards { display: flex; flex-wrap: wrap; }
+.card-indicador {
+    background: #f5f5f5; border-radius: 18px; padding: 22px 5px 15px 5px;
+    margin: 0 10px 20px 0; min-width: 210px; text-align: center;
+}
+.destaque { font-size: 2.1rem; color: #005cb2; font-weight: bold; margin-top: 3px; }
+.sub-label { font-size: 1.06rem; color: #444; margin-bottom: 0.25rem; }
+table { border-collapse: collapse; }
+th, td { border-bottom: 1px solid #e5e7eb; padding: 4px 10px; text-align: right; }
+th:first-child, td:first-child { text-align: left; }
+@page { size: A4 portrait; margin: 12mm; }
+@media print {
+  body { margin: 0; }
+  .print-page-break { page-break-before: always; break-before: page; }
+}
+"""
+
+
+def _numero(valor: float, casas: int = 0) -> str:
+    """Numero no formato brasileiro (1.234,5), sem depender do locale da maquina."""
+
+    if valor is None or pd.isna(valor):
+        return "-"
+    texto = f"{valor:,.{casas}f}"
+    return texto.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _card(rotulo: str, valor: str) -> str:
+    return (
+        '<div class="card-indicador">'
+        f'<div class="sub-label">{html.escape(rotulo)}</div>'
+        f'<div class="destaque">{valor}</div>'
+        "</div>"
+    )
+
+
+def _nome_arquivo(equipamento: dict[str, Any]) -> str:
+    nome = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(equipamento["nome_processador"]))
+    return f"{int(equipamento['id'])}_{nome}.html"
+
+
+def gerar_relatorio(
+    equipamento: dict[str, Any], data_ini: str, data_fim: str, saida: str, plotlyjs: str
+) -> dict[str, Any]:
+    """
+    Busca, calcula e grava o relatorio de um radar. Roda nos processos do pool.
+
+    Devolve a linha do resumo (indicadores principais e nome do arquivo).
+    Erros da API viram RuntimeError, que o processo principal registra como
+    falha daquele radar sem interromper os demais.
+    """
+
+    api_client = APIClient()
+    futuros = api_client.buscar_periodo_equipamento(
+        equipamento_id=int(equipamento["id"]),
+        nome_processador=equipamento["nome_processador"],
+        data_ini=data_ini,
+        data_fim=data_fim,
+    )
+    df_velocidade = futuros["distribuicao"].result()
+    total_veiculos = futuros["fluxo"].result()
+
+    resumo: dict[str, Any] = {
+        "id": int(equipamento["id"]),
+        "nome_processador": equipamento["nome_processador"],
+        "vel_regulamentada": equipamento["vel_regulamentada"],
+        "total_ocr": 0,
+        "total_periodo": total_veiculos,
+        "velocidade_media": None,
+        "v85": None,
+        "pct_acima_tolerancia": None,
+        "arquivo": _nome_arquivo(equipamento),
+    }
+    periodo = f"{date.fromisoformat(data_ini):%d/%m/%Y} a {date.fromisoformat(data_fim):%d/%m/%Y}"
+    partes = [
+        f"<h1>{html.escape(str(equipamento['nome_processador']))}</h1>",
+        f"<p>ID {int(equipamento['id'])} &middot; Período {periodo} &middot; "
+        f"Velocidade regulamentada {_numero(equipamento['vel_regulamentada'])} km/h</p>",
+    ]
+
+    if df_velocidade is None or df_velocidade.empty:
+        partes.append("<p>Nenhum dado de velocidade encontrado para o período.</p>")
+    else:
+        indicadores = calcular_indicadores(
+            df_velocidade["velocidade"],
+            df_velocidade["contagem"],
+            velocidade_regulamentada=equipamento["vel_regulamentada"],
+        )
+        aproveitamento = indicadores.total / total_veiculos * 100 if total_veiculos > 0 else None
+        resumo.update(
+            total_ocr=indicadores.total,
+            velocidade_media=round(indicadores.velocidade_media, 1),
+            v85=indicadores.v85,
+            pct_acima_tolerancia=indicadores.pct_acima_tolerancia,
+        )
+
+        cards = [
+            _card("Velocidade Média", f"{_numero(indicadores.velocidade_media, 1)} km/h"),
+            _card("Velocidade Mais Praticada", f"{_numero(indicadores.velocidade_moda, 1)} km/h"),
+            _card("Velocidade Máxima", f"{_numero(indicadores.velocidade_maxima, 1)} km/h"),
+            _card("V85", f"{_numero(indicadores.v85, 1)} km/h"),
+            _card("Total de Veículos Lidos (OCR)", _numero(indicadores.total)),
+            _card("Total de Veículos no Período", _numero(total_veiculos)),
+            _card("Aproveitamento de OCR", f"{_numero(aproveitamento, 2)} %"),
+            _card("Acima da Tolerância", f"{_numero(indicadores.pct_acima_tolerancia, 2)} %"),
+        ]
+        fig_bar, fig_pizza, fig_box = figuras_equipamento(
+            df_velocidade, indicadores, date.fromisoformat(data_ini), date.fromisoformat(data_fim)
+        )
+        # plotly.js vai so no primeiro grafico da pagina (ou fica no diretorio).
+        incluir = {"embutido": True, "diretorio": "directory"}[plotlyjs]
+        partes += [
+            f'<div class="cards avoid-break">{"".join(cards)}</div>',
+            '<div class="print-page-break"></div>',
+            '<div class="report-section avoid-break">'
+            + fig_bar.to_html(full_html=False, include_plotlyjs=incluir)
+            + "</div>",
+            '<div class="report-section avoid-break two-up">'
+            f"<div>{fig_pizza.to_html(full_html=False, include_plotlyjs=False)}</div>"
+            f"<div>{fig_box.to_html(full_html=False, include_plotlyjs=False)}</div>"
+            "</div>",
+        ]
+
+    pagina = (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">'
+        f"<title>{html.escape(str(equipamento['nome_processador']))} - {periodo}</title>"
+        f"<style>{CSS}</style></head><body>{''.join(partes)}</body></html>"
+    )
+    Path(saida, resumo["arquivo"]).write_text(pagina, encoding="utf-8")
+    return resumo
+
+
+def escrever_indice(saida: Path, resumo: pd.DataFrame, falhas: dict[int, str], data_ini: str, data_fim: str) -> None:
+    linhas = "".join(
+        "<tr>"
+        f'<td><a href="{html.escape(linha.arquivo)}">{html.escape(str(linha.nome_processador))}</a></td>'
+        f"<td>{linha.id}</td>"
+        f"<td>{_numero(linha.total_ocr)}</td>"
+        f"<td>{_numero(linha.velocidade_media, 1)}</td>"
+        f"<td>{_numero(linha.v85, 1)}</td>"
+        f"<td>{_numero(linha.pct_acima_tolerancia, 2)}</td>"
+        "</tr>"
+        for linha in resumo.itertuples()
+    )
+    itens_falhas = "".join(
+        f"<li>ID {eq_id}: {html.escape(erro)}</li>" for eq_id, erro in sorted(falhas.items())
+    )
+    pagina = (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">'
+        f"<title>Relatórios de velocidade {data_ini} a {data_fim}</title>"
+        f"<style>{CSS}</style></head><body>"
+        f"<h1>Relatórios de velocidade</h1><p>Período {data_ini} a {data_fim} &middot; {len(resumo)} radares</p>"
+        "<table><thead><tr><th>Radar</th><th>ID</th><th>Veículos (OCR)</th>"
+        "<th>Média (km/h)</th><th>V85 (km/h)</th><th>% excesso</th></tr></thead>"
+        f"<tbody>{linhas}</tbody></table>"
+        + (f"<h2>Falhas</h2><ul>{itens_falhas}</ul>" if falhas else "")
+        + "</body></html>"
+    )
+    (saida / "index.html").write_text(pagina, encoding="utf-8")
+
+
+def _iniciar_processo() -> None:
+    load_dotenv()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inicio", required=True, type=date.fromisoformat, help="data inicial (AAAA-MM-DD)")
+    parser.add_argument("--fim", required=True, type=date.fromisoformat, help="data final (AAAA-MM-DD)")
+    parser.add_argument("--equipamentos", nargs="*", type=int, help="ids dos radares (padrao: todos)")
+    parser.add_argument("--saida", type=Path, default=Path("saida_relatorios"), help="diretorio de saida")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--plotlyjs",
+        choices=("diretorio", "embutido"),
+        default="diretorio",
+        help="plotly.js em um arquivo do diretorio (padrao) ou embutido em cada HTML (~3,5 MB cada)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.inicio > args.fim:
+        parser.error("a data inicial deve ser menor ou igual a data final")
+
+    load_dotenv()
+    try:
+        equipamentos = APIClient().get_equipamentos()
+    except RuntimeError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+
+    equipamentos = equipamentos[(equipamentos["latitude"] != 0) & (equipamentos["longitude"] != 0)]
+    if args.equipamentos:
+        equipamentos = equipamentos[equipamentos["id"].isin(args.equipamentos)]
+    if equipamentos.empty:
+        print("Nenhum equipamento encontrado para gerar relatorio.", file=sys.stderr)
+        return 1
+
+    args.saida.mkdir(parents=True, exist_ok=True)
+    if args.plotlyjs == "diretorio":
+        (args.saida / "plotly.min.js").write_text(get_plotlyjs(), encoding="utf-8")
+    data_ini, data_fim = args.inicio.isoformat(), args.fim.isoformat()
+    registros = equipamentos[["id", "nome_processador", "vel_regulamentada"]].to_dict("records")
+
+    inicio = time.monotonic()
+    resumos = []
+    falhas: dict[int, str] = {}
+    # spawn: os processos filhos nao herdam as threads e sessoes HTTP do pai.
+    with ProcessPoolExecutor(
+        max_workers=max(1, args.processos),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_iniciar_processo,
+    ) as pool:
+        futuros = {
+            pool.submit(gerar_relatorio, eq, data_ini, data_fim, str(args.saida), args.plotlyjs): eq
+            for eq in registros
+        }
+        for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+            eq = futuros[futuro]
+            try:
+                resumos.append(futuro.result())
+                situacao = "ok"
+            except Exception as exc:
+                # Um radar com erro (API, dados inesperados, processo filho
+                # perdido) vira falha dele; o lote segue com os demais.
+                erro = str(exc) if isinstance(exc, RuntimeError) else f"{type(exc).__name__}: {exc}"
+                falhas[int(eq["id"])] = erro
+                situacao = f"falha: {erro}"
+            print(f"[{concluidos}/{len(futuros)}] {eq['nome_processador']} {situacao}", file=sys.stderr)
+
+    resumo = pd.DataFrame(resumos)
+    if not resumo.empty:
+        resumo = resumo.sort_values("nome_processador", ignore_index=True)
+    resumo.to_csv(args.saida / "resumo.csv", index=False)
+    escrever_indice(args.saida, resumo, falhas, data_ini, data_fim)
+
+    print(
+        f"{len(resumos)} relatorio(s) em {args.saida} ({len(falhas)} falha(s)) "
+        f"em {time.monotonic() - inicio:.1f} s",
+        file=sys.stderr,
+    )
+    return 1 if falhas and not resumos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
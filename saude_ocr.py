@@ -0,0 +1,241 @@
+"""
+Varredura da saude do OCR da frota: fluxo x leituras de OCR de cada radar.
+
+Para um periodo, compara o fluxo total de cada equipamento (/trafego/fluxo)
+com o total de veiculos lidos pelo OCR e aponta os radares com aproveitamento
+abaixo do limiar, em geral cameras sujas, desalinhadas ou paradas:
+
+    python saude_ocr.py                                  # ontem
+    python saude_ocr.py --inicio 2026-09-01 --fim 2026-09-30 --limiar 70 --saida saude_ocr.csv
+
+Pensado para rodar agendado (cron): a lista vai para a saida padrao, o
+progresso para stderr. O mesmo calculo alimenta o painel do dashboard.
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from api_client import INDICADORES_SERVIDOR, APIClient, ResponseCache
+from configuracao import env_float, env_int, hoje
+from equipamentos import registro_equipamentos
+from frota import FROTA_MAX_PARALELO, buscar_conformidade_frota, varredura_em_cache
+
+# Consultas simultaneas de cada etapa da varredura (fluxo e, com os
+# indicadores do servidor, OCR). A distribuicao usa o paralelismo do modo frota.
+SAUDE_OCR_MAX_PARALELO = env_int("API_SAUDE_OCR_MAX_PARALELO", FROTA_MAX_PARALELO)
+# Radares com aproveitamento (OCR / fluxo) abaixo deste % sao sinalizados.
+SAUDE_OCR_LIMIAR = env_float("SAUDE_OCR_LIMIAR", 80.0)
+# Abaixo deste fluxo o aproveitamento nao diz nada sobre a camera.
+SAUDE_OCR_FLUXO_MINIMO = env_int("SAUDE_OCR_FLUXO_MINIMO", 100)
+
+_cache_saude = ResponseCache(max_entries=env_int("API_SAUDE_OCR_CACHE_ENTRADAS", 32))
+
+
+@dataclass
+class SaudeOCRFrota:
+    """
+    Fluxo, leituras de OCR e aproveitamento por radar em um periodo.
+
+    `saude` tem uma linha por equipamento consultado; `aproveitamento_ocr`
+    fica vazio (NaN) quando o fluxo nao chega a SAUDE_OCR_FLUXO_MINIMO.
+    `falhas` lista os ids cuja consulta deu erro.
+    """
+
+    saude: pd.DataFrame
+    falhas: list[int] = field(default_factory=list)
+    duracao_s: float = 0.0
+
+
+def buscar_saude_ocr(
+    api_client: APIClient,
+    equipamentos: pd.DataFrame,
+    data_ini: str,
+    data_fim: str,
+    progresso: Callable[[int, int], None] | None = None,
+) -> SaudeOCRFrota:
+    """
+    Consulta fluxo e total de OCR de todos os equipamentos do periodo.
+
+    Cada etapa sai com paralelismo limitado e sem passar pelo cache de
+    respostas, como no modo frota. O total de OCR vem do resultado do modo
+    frota (reaproveitado se ele ja rodou no periodo) ou, com
+    API_INDICADORES_SERVIDOR, do /velocidades/indicadores, que tem poucos
+    campos. O resultado agregado fica em cache por periodo.
+    """
+
+    return varredura_em_cache(
+        _cache_saude,
+        "/frota/saude_ocr",
+        "/trafego/fluxo",
+        equipamentos,
+        data_ini,
+        data_fim,
+        lambda _progresso: _calcular_saude_ocr(api_client, equipamentos, data_ini, data_fim, _progresso),
+        progresso,
+    )
+
+
+def _totais_ocr(
+    api_client: APIClient,
+    equipamentos: pd.DataFrame,
+    data_ini: str,
+    data_fim: str,
+    progresso: Callable[[int, int], None] | None,
+) -> tuple[pd.Series, list[int]]:
+    """Total de veiculos lidos por radar (indice: id) e ids com falha."""
+
+    if not INDICADORES_SERVIDOR:
+        frota = buscar_conformidade_frota(
+            api_client, equipamentos, data_ini, data_fim, progresso=progresso
+        )
+        return frota.conformidade.set_index("id")["total"], frota.falhas
+
+    ids = equipamentos["id"].to_numpy()
+    futuros = api_client.executar_em_lote(
+        api_client.get_indicadores,
+        [
+            {"equipamento_id": int(eq_id), "data_ini": data_ini, "data_fim": data_fim, "usar_cache": False}
+            for eq_id in ids
+        ],
+        max_paralelo=SAUDE_OCR_MAX_PARALELO,
+        progresso=progresso,
+    )
+    totais, falhas = {}, []
+    for eq_id, futuro in zip(ids, futuros):
+        try:
+            totais[int(eq_id)] = futuro.result().total
+        except RuntimeError:
+            falhas.append(int(eq_id))
+    return pd.Series(totais, dtype=np.int64), falhas
+
+
+def _calcular_saude_ocr(
+    api_client: APIClient,
+    equipamentos: pd.DataFrame,
+    data_ini: str,
+    data_fim: str,
+    progresso: Callable[[int, int], None] | None,
+) -> SaudeOCRFrota:
+    inicio = time.monotonic()
+    ids = equipamentos["id"].to_numpy()
+    total = 2 * len(ids)
+
+    # Duas etapas de len(ids) consultas; o progresso conta as duas juntas.
+    def _progresso_etapa(deslocamento: int) -> Callable[[int, int], None] | None:
+        if progresso is None:
+            return None
+        return lambda concluidas, _: progresso(deslocamento + concluidas, total)
+
+    # Fluxo pelo nome_processador, como no card do painel (equipamento completo).
+    futuros = api_client.executar_em_lote(
+        api_client.get_fluxo,
+        [
+            {"nome_processador": nome, "data_ini": data_ini, "data_fim": data_fim, "usar_cache": False}
+            for nome in equipamentos["nome_processador"]
+        ],
+        max_paralelo=SAUDE_OCR_MAX_PARALELO,
+        progresso=_progresso_etapa(0),
+    )
+    fluxo, falhas = {}, set()
+    for eq_id, futuro in zip(ids, futuros):
+        try:
+            fluxo[int(eq_id)] = futuro.result()
+        except RuntimeError:
+            falhas.add(int(eq_id))
+
+    totais_ocr, falhas_ocr = _totais_ocr(
+        api_client, equipamentos, data_ini, data_fim, _progresso_etapa(len(ids))
+    )
+    falhas.update(falhas_ocr)
+
+    saude = equipamentos[["id", "nome_processador", "latitude", "longitude"]].reset_index(drop=True)
+    saude["fluxo"] = saude["id"].map(fluxo).fillna(0).astype(np.int64)
+    saude["total_ocr"] = saude["id"].map(totais_ocr).fillna(0).astype(np.int64)
+    avaliavel = (saude["fluxo"] >= SAUDE_OCR_FLUXO_MINIMO) & ~saude["id"].isin(falhas)
+    saude["aproveitamento_ocr"] = np.where(
+        avaliavel, saude["total_ocr"] / saude["fluxo"].where(avaliavel, 1) * 100, np.nan
+    )
+    return SaudeOCRFrota(saude=saude, falhas=sorted(falhas), duracao_s=time.monotonic() - inicio)
+
+
+def radares_degradados(saude: pd.DataFrame, limiar: float = SAUDE_OCR_LIMIAR) -> pd.DataFrame:
+    """Radares com aproveitamento abaixo de `limiar` %, do pior para o melhor."""
+
+    return (
+        saude[saude["aproveitamento_ocr"] < limiar]
+        .sort_values("aproveitamento_ocr")
+        .reset_index(drop=True)
+    )
+
+
+def tabela_degradados(degradados: pd.DataFrame) -> pd.DataFrame:
+    """Tabela para exibicao dos radares sinalizados."""
+
+    colunas = {
+        "nome_processador": "Equipamento",
+        "fluxo": "Veículos no período",
+        "total_ocr": "Veículos lidos (OCR)",
+        "aproveitamento_ocr": "Aproveitamento de OCR (%)",
+    }
+    return degradados[list(colunas)].rename(columns=colunas).round(2)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ontem = hoje() - timedelta(days=1)
+    parser.add_argument("--inicio", type=date.fromisoformat, default=ontem, help="data inicial (AAAA-MM-DD, padrao: ontem)")
+    parser.add_argument("--fim", type=date.fromisoformat, default=None, help="data final (AAAA-MM-DD, padrao: a inicial)")
+    parser.add_argument(
+        "--limiar", type=float, default=SAUDE_OCR_LIMIAR,
+        help=f"aproveitamento minimo em %% (padrao: {SAUDE_OCR_LIMIAR:g})",
+    )
+    parser.add_argument("--saida", help="grava tambem um CSV com todos os radares")
+    args = parser.parse_args(argv)
+    data_fim = args.fim or args.inicio
+
+    if args.inicio > data_fim:
+        parser.error("a data inicial deve ser menor ou igual a data final")
+
+    load_dotenv()
+    try:
+        api_client = APIClient()
+        equipamentos = registro_equipamentos.atualizar(api_client).validos
+    except RuntimeError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    if equipamentos.empty:
+        print("Nenhum equipamento encontrado para verificar.", file=sys.stderr)
+        return 1
+
+    def _progresso(concluidas: int, total: int) -> None:
+        if concluidas == total or concluidas % 100 == 0:
+            print(f"[{concluidas}/{total}] consultas", file=sys.stderr)
+
+    resultado = buscar_saude_ocr(
+        api_client, equipamentos, args.inicio.isoformat(), data_fim.isoformat(), progresso=_progresso
+    )
+    degradados = radares_degradados(resultado.saude, args.limiar)
+
+    if args.saida:
+        resultado.saude.to_csv(args.saida, index=False)
+    if not degradados.empty:
+        print(tabela_degradados(degradados).to_string(index=False))
+    print(
+        f"{len(degradados)} radar(es) com aproveitamento abaixo de {args.limiar:g}% "
+        f"de {len(equipamentos)} ({len(resultado.falhas)} falha(s)) "
+        f"em {resultado.duracao_s:.1f} s",
+        file=sys.stderr,
+    )
+    return 1 if len(resultado.falhas) == len(equipamentos) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import sys
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, MutableMapping
+
+import numpy as np
+import pandas as pd
+
+from configuracao import env_float
+from metricas import metricas
+
+# Teto do que cada sessao guarda de resultados proprios (ex.: inoperancia).
+# Acima dele, os resultados usados ha mais tempo sao descartados.
+SESSAO_MEMORIA_MAX_MB = env_float("SESSAO_MEMORIA_MAX_MB", 16)
+# Resultado nao lido por este tempo e descartado no rerun seguinte da sessao.
+SESSAO_RESULTADO_TTL_S = env_float("SESSAO_RESULTADO_TTL_S", 1800)
+# Colunas de texto com ate esta fracao de valores distintos viram category.
+FRACAO_CATEGORIA = 0.5
+ISO_DATA = r"\d{4}-\d{2}-\d{2}"
+
+CHAVE_SESSAO = "resultados_sessao"
+
+
+def _compactar_coluna(coluna: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(coluna) or isinstance(coluna.dtype, pd.CategoricalDtype):
+        return coluna
+    if pd.api.types.is_integer_dtype(coluna):
+        return pd.to_numeric(coluna, downcast="integer")
+    if pd.api.types.is_float_dtype(coluna):
+        return pd.to_numeric(coluna, downcast="float")
+    if pd.api.types.is_object_dtype(coluna) or pd.api.types.is_string_dtype(coluna):
+        texto = coluna.dropna()
+        if texto.empty:
+            return coluna
+        # Datas/horarios da API chegam como texto ISO: 8 bytes por valor
+        # em vez de dezenas.
+        if texto.astype(str).str.match(ISO_DATA).all():
+            try:
+                return pd.to_datetime(coluna, format="ISO8601")
+            except (ValueError, TypeError):
+                pass
+        if texto.nunique() <= FRACAO_CATEGORIA * len(texto):
+            return coluna.astype("category")
+    return coluna
+
+
+def compactar_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copia de `df` com tipos menores: inteiros e floats reduzidos, texto ISO
+    de data em datetime64 e texto repetido em category.
+
+    Nao altera `df`, que pode ser o mesmo objeto de um cache compartilhado.
+    """
+
+    return pd.DataFrame({nome: _compactar_coluna(df[nome]) for nome in df.columns}, index=df.index)
+
+
+def tamanho_bytes(valor: Any) -> int:
+    """Estimativa da memoria ocupada por `valor` (DataFrames medidos a fundo)."""
+
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, (pd.Series, pd.Index)):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_bytes(k) + tamanho_bytes(v) for k, v in valor.items())
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return sys.getsizeof(valor) + sum(tamanho_bytes(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+@dataclass
+class _Resultado:
+    chave: Hashable
+    valor: Any
+    bytes: int
+    acesso: float
+
+
+class ResultadosSessao:
+    """
+    Resultados proprios de uma sessao, com teto de memoria e expiracao.
+
+    Cada `nome` guarda um resultado por vez, identificado por `chave` (ex.:
+    o periodo consultado); DataFrames sao guardados compactados. Ao passar
+    de `max_bytes`, os resultados lidos ha mais tempo saem primeiro, e os
+    nao lidos por `ttl_s` saem em `limpar_expirados`.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = int(SESSAO_MEMORIA_MAX_MB * 1024 * 1024),
+        ttl_s: float = SESSAO_RESULTADO_TTL_S,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._resultados: dict[str, _Resultado] = {}
+        self._stats = {"guardados": 0, "descartados_teto": 0, "descartados_ttl": 0, "grandes_demais": 0}
+        _sessoes_ativas.add(self)
+
+    def guardar(self, nome: str, chave: Hashable, valor: Any) -> Any:
+        """
+        Guarda `valor` (compactado, se for DataFrame) e devolve o que ficou
+        guardado. Um resultado maior que o teto inteiro nao e guardado.
+        """
+
+        if isinstance(valor, pd.DataFrame):
+            valor = compactar_df(valor)
+        tamanho = tamanho_bytes(valor)
+
+        with self._lock:
+            self._resultados.pop(nome, None)
+            if tamanho > self.max_bytes:
+                self._stats["grandes_demais"] += 1
+                return valor
+
+            # Mais antigos primeiro ate caber o novo.
+            ocupado = sum(r.bytes for r in self._resultados.values())
+            for antigo in sorted(self._resultados, key=lambda n: self._resultados[n].acesso):
+                if ocupado + tamanho <= self.max_bytes:
+                    break
+                ocupado -= self._resultados.pop(antigo).bytes
+                self._stats["descartados_teto"] += 1
+
+            self._resultados[nome] = _Resultado(chave, valor, tamanho, self._clock())
+            self._stats["guardados"] += 1
+        return valor
+
+    def obter(self, nome: str, chave: Hashable) -> Any | None:
+        """Resultado guardado para `nome` se ele for da mesma `chave`; senao None."""
+
+        with self._lock:
+            resultado = self._resultados.get(nome)
+            if resultado is None or resultado.chave != chave:
+                return None
+            resultado.acesso = self._clock()
+            return resultado.valor
+
+    def descartar(self, nome: str) -> None:
+        with self._lock:
+            self._resultados.pop(nome, None)
+
+    def limpar_expirados(self) -> None:
+        limite = self._clock() - self.ttl_s
+        with self._lock:
+            for nome in [n for n, r in self._resultados.items() if r.acesso < limite]:
+                del self._resultados[nome]
+                self._stats["descartados_ttl"] += 1
+
+    def bytes(self) -> int:
+        with self._lock:
+            return sum(r.bytes for r in self._resultados.values())
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "resultados": len(self._resultados),
+                "bytes": sum(r.bytes for r in self._resultados.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Sessoes encerradas somem daqui sozinhas (o Streamlit descarta o session_state).
+_sessoes_ativas: "weakref.WeakSet[ResultadosSessao]" = weakref.WeakSet()
+
+metricas.adicionar_medidor(
+    "dashboard_sessoes_resultados_bytes",
+    "Bytes de resultados guardados por todas as sessoes abertas.",
+    lambda: sum(sessao.bytes() for sessao in list(_sessoes_ativas)),
+)
+metricas.adicionar_medidor(
+    "dashboard_sessoes_ativas",
+    "Sessoes com resultados guardados.",
+    lambda: len(_sessoes_ativas),
+)
+
+
+def resultados_da_sessao(session_state: MutableMapping[str, Any]) -> ResultadosSessao:
+    """Resultados da sessao dona de `session_state`, criados no primeiro uso."""
+
+    if CHAVE_SESSAO not in session_state:
+        session_state[CHAVE_SESSAO] = ResultadosSessao()
+    return session_state[CHAVE_SESSAO]
+
+
+def memoria_da_sessao(session_state: MutableMapping[str, Any]) -> pd.DataFrame:
+    """Memoria estimada de cada chave do `session_state`, da maior para a menor."""
+
+    linhas = []
+    for chave in list(session_state.keys()):
+        valor = session_state[chave]
+        tamanho = valor.bytes() if isinstance(valor, ResultadosSessao) else tamanho_bytes(valor)
+        linhas.append((str(chave), round(tamanho / 1024, 1)))
+    return (
+        pd.DataFrame(linhas, columns=["chave", "KB"])
+        .sort_values("KB", ascending=False, ignore_index=True)
+    )
@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api_client import RequisicoesEmVoo
+
+CHAVE = ("/velocidades/distribuicao", (("equipamento_id", 1),))
+
+
+def _esperar(condicao, prazo_s=5.0):
+    limite = time.monotonic() + prazo_s
+    while not condicao():
+        if time.monotonic() > limite:
+            raise AssertionError("condicao nao atingida a tempo")
+        time.sleep(0.001)
+
+
+def _executar_juntas(em_voo, fetch, quantas):
+    """Dispara `quantas` chamadas identicas e so solta o fetch depois que todas entraram."""
+
+    liberar = threading.Event()
+    chamadas = []
+
+    def _fetch():
+        chamadas.append(1)
+        liberar.wait(5)
+        return fetch()
+
+    with ThreadPoolExecutor(quantas) as pool:
+        futuros = [pool.submit(em_voo.executar, CHAVE, _fetch) for _ in range(quantas)]
+        _esperar(lambda: em_voo.stats()["coalescidas"] == quantas - 1)
+        liberar.set()
+    return futuros, chamadas
+
+
+def test_chamadas_simultaneas_fazem_uma_busca_so():
+    em_voo = RequisicoesEmVoo()
+
+    futuros, chamadas = _executar_juntas(em_voo, lambda: {"items": []}, 4)
+
+    resultados = [futuro.result() for futuro in futuros]
+    assert len(chamadas) == 1
+    assert sorted(compartilhado for _, compartilhado in resultados) == [False, True, True, True]
+    # Todas recebem o mesmo objeto.
+    assert len({id(valor) for valor, _ in resultados}) == 1
+
+
+def test_erro_da_busca_chega_a_todas_as_que_esperavam():
+    em_voo = RequisicoesEmVoo()
+
+    def _falhar():
+        raise RuntimeError("Erro ao consultar a API")
+
+    futuros, chamadas = _executar_juntas(em_voo, _falhar, 3)
+
+    assert len(chamadas) == 1
+    for futuro in futuros:
+        with pytest.raises(RuntimeError, match="Erro ao consultar a API"):
+            futuro.result()
+    assert em_voo.stats() == {"requisicoes": 1, "coalescidas": 2, "em_andamento": 0}
+
+
+def test_depois_do_erro_a_proxima_chamada_busca_de_novo():
+    em_voo = RequisicoesEmVoo()
+    with pytest.raises(RuntimeError):
+        em_voo.executar(CHAVE, lambda: (_ for _ in ()).throw(RuntimeError("falhou")))
+
+    valor, compartilhado = em_voo.executar(CHAVE, lambda: "ok")
+
+    assert (valor, compartilhado) == ("ok", False)
+    assert em_voo.stats()["requisicoes"] == 2
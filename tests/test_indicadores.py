@@ -0,0 +1,121 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicadores import (
+    FAIXAS_LIMITES,
+    FAIXAS_ROTULOS,
+    calcular_indicadores,
+    contar_por_faixa,
+    percentis_ponderados,
+)
+
+
+def _expandir(velocidade, contagem):
+    # Um valor por veiculo: a referencia "ingenua" dos calculos ponderados.
+    return np.repeat(np.asarray(velocidade, dtype=float), np.asarray(contagem, dtype=np.int64))
+
+
+def _percentil_por_veiculo(veiculos, p):
+    # Velocidade do veiculo de posicao ceil(p% de N), como no V85 classico.
+    ordenados = np.sort(veiculos)
+    return float(ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)])
+
+
+def _faixas_pd_cut(veiculos):
+    # Semantica antiga: pd.cut com intervalos fechados a direita.
+    faixas = pd.cut(veiculos, bins=list(FAIXAS_LIMITES), labels=list(FAIXAS_ROTULOS), right=True)
+    return pd.Series(faixas).value_counts().reindex(list(FAIXAS_ROTULOS), fill_value=0)
+
+
+def test_media_ponderada_pela_contagem():
+    velocidade = np.array([30, 50, 80])
+    contagem = np.array([10, 1, 1])
+
+    indicadores = calcular_indicadores(velocidade, contagem, velocidade_regulamentada=60)
+
+    # 430 km/h somados por 12 veiculos; a media simples dos valores
+    # distintos seria 53,3 km/h.
+    assert indicadores.velocidade_media == pytest.approx(430 / 12)
+    assert indicadores.velocidade_media == pytest.approx(np.average(velocidade, weights=contagem))
+
+
+def test_velocidades_repetidas_e_fora_de_ordem_sao_consolidadas():
+    indicadores = calcular_indicadores(
+        np.array([60, 40, 60, 40, 50]), np.array([1, 2, 3, 1, 1]), velocidade_regulamentada=50
+    )
+
+    assert indicadores.total == 8
+    assert indicadores.velocidade_moda == 60
+    assert indicadores.velocidade_maxima == 60
+    assert indicadores.velocidade_media == pytest.approx((40 * 3 + 50 + 60 * 4) / 8)
+
+
+@pytest.mark.parametrize("p", [0, 15, 50, 85, 95, 100])
+def test_percentis_iguais_aos_calculados_por_veiculo(p):
+    rng = np.random.default_rng(p)
+    velocidade = np.arange(20, 121)
+    contagem = rng.integers(0, 50, len(velocidade))
+
+    calculado = percentis_ponderados(velocidade, contagem, [p])[0]
+
+    assert calculado == _percentil_por_veiculo(_expandir(velocidade, contagem), p)
+
+
+def test_v85_na_fronteira_exata_da_contagem_acumulada():
+    # 85 de 100 veiculos ate 60 km/h: o V85 e 60, nao a velocidade seguinte.
+    indicadores = calcular_indicadores(
+        np.array([50, 60, 70]), np.array([50, 35, 15]), velocidade_regulamentada=60
+    )
+
+    assert indicadores.v85 == 60
+    assert indicadores.v50 == 50
+    assert indicadores.v95 == 70
+
+
+def test_periodo_sem_veiculos():
+    indicadores = calcular_indicadores(np.array([40, 50]), np.array([0, 0]), velocidade_regulamentada=60)
+
+    assert indicadores.total == 0
+    assert math.isnan(indicadores.velocidade_media)
+    assert math.isnan(indicadores.v85)
+    assert indicadores.pct_acima_tolerancia == 0
+    assert indicadores.faixas["contagem"].sum() == 0
+
+
+def test_faixas_iguais_ao_pd_cut_nas_bordas():
+    # Bordas exatas, valores logo acima delas, 0 (fora de todas as faixas,
+    # como no pd.cut sem include_lowest) e velocidades fracionarias.
+    velocidade = np.array([0, 0.5, 20, 20.5, 21, 30, 60, 60.1, 80, 100, 120, 120.5, 300])
+    contagem = np.arange(1, len(velocidade) + 1)
+
+    faixas = contar_por_faixa(velocidade, contagem)
+
+    esperado = _faixas_pd_cut(_expandir(velocidade, contagem))
+    assert faixas["faixa"].tolist() == list(FAIXAS_ROTULOS)
+    assert faixas["contagem"].tolist() == esperado.tolist()
+
+
+def test_faixas_aleatorias_iguais_ao_pd_cut():
+    rng = np.random.default_rng(7)
+    velocidade = rng.integers(0, 200, 500)
+    contagem = rng.integers(1, 20, 500)
+
+    faixas = contar_por_faixa(velocidade, contagem)
+
+    assert faixas["contagem"].tolist() == _faixas_pd_cut(_expandir(velocidade, contagem)).tolist()
+
+
+def test_regulamentada_e_tolerancia_incluem_a_borda():
+    # Regulamentada 60 e tolerancia de 10%: 60 conta como regulamentada,
+    # 66 como dentro da tolerancia e 67 como excesso.
+    indicadores = calcular_indicadores(
+        np.array([59, 60, 61, 66, 67]), np.array([1, 1, 1, 1, 1]), velocidade_regulamentada=60
+    )
+
+    assert indicadores.dentro_regulamentada == 2
+    assert indicadores.dentro_tolerancia == 2
+    assert indicadores.acima_tolerancia == 1
+    assert indicadores.pct_acima_tolerancia == 20.0
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indice_espacial import CELULA_GRAUS, IndiceEspacial
+
+
+def _indice(*pontos):
+    latitude, longitude = zip(*pontos) if pontos else ((), ())
+    return IndiceEspacial(pd.DataFrame({"latitude": latitude, "longitude": longitude}, dtype=float))
+
+
+def _forca_bruta(indice, sul, oeste, norte, leste):
+    lat, lon = indice.latitude, indice.longitude
+    return np.flatnonzero((lat >= sul) & (lat <= norte) & (lon >= oeste) & (lon <= leste))
+
+
+def test_sem_limites_devolve_todos():
+    indice = _indice((-8.05, -34.9), (-8.06, -34.95))
+
+    assert indice.na_area(None).tolist() == [0, 1]
+
+
+def test_indice_vazio():
+    indice = _indice()
+
+    assert indice.na_area((-10, -40, 0, -30)).tolist() == []
+
+
+def test_pontos_na_borda_da_celula_e_da_area_entram():
+    borda = 3 * CELULA_GRAUS
+    indice = _indice((borda, borda), (borda - 1e-9, borda), (borda, borda + 1e-9), (-borda, -borda))
+
+    # Area que comeca exatamente na borda de uma celula: inclusiva dos dois lados.
+    assert indice.na_area((borda, borda, borda, borda)).tolist() == [0]
+    assert indice.na_area((borda, borda, 1, 1)).tolist() == [0, 2]
+    assert indice.na_area((-1, -1, borda, borda)).tolist() == [0, 1, 3]
+    assert indice.na_area((-borda, -borda, -borda, -borda)).tolist() == [3]
+
+
+def test_igual_a_forca_bruta_em_areas_aleatorias():
+    rng = np.random.default_rng(3)
+    n = 2000
+    indice = IndiceEspacial(
+        pd.DataFrame({"latitude": -8 + rng.random(n) * 0.3, "longitude": -35 + rng.random(n) * 0.3})
+    )
+
+    for _ in range(200):
+        sul, norte = np.sort(-8.05 + rng.random(2) * 0.4)
+        oeste, leste = np.sort(-35.05 + rng.random(2) * 0.4)
+        limites = (sul, oeste, norte, leste)
+        assert indice.na_area(limites).tolist() == _forca_bruta(indice, *limites).tolist()
+
+
+def test_area_que_cruza_o_antimeridiano():
+    indice = _indice((0, 179.5), (0, -179.5), (0, 0), (0, 175))
+
+    # O Leaflet devolve longitudes continuas (leste > 180) ao cruzar.
+    assert indice.na_area((-1, 179, 1, 181)).tolist() == [0, 1]
+    # O mesmo trecho visto a partir do oeste.
+    assert indice.na_area((-1, -181, 1, -179)).tolist() == [0, 1]
+
+
+def test_area_com_mais_de_uma_volta_pega_todas_as_longitudes():
+    indice = _indice((0, -179.5), (0, 0), (0, 179.5), (60, 0))
+
+    assert indice.na_area((-1, -300, 1, 300)).tolist() == [0, 1, 2]
+
+
+def test_polos():
+    indice = _indice((90, 0), (-90, 45), (89.999, -120), (-85, 10))
+
+    assert indice.na_area((89.99, -180, 90, 180)).tolist() == [0, 2]
+    assert indice.na_area((-90, -180, -89.99, 180)).tolist() == [1]
+    assert indice.na_area((-90, -180, 90, 180)).tolist() == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize("zoom", [3, 8, 12])
+def test_agrupar_conta_cada_posicao_uma_vez(zoom):
+    rng = np.random.default_rng(zoom)
+    indice = IndiceEspacial(
+        pd.DataFrame({"latitude": -8 + rng.random(500), "longitude": -35 + rng.random(500)})
+    )
+    posicoes = indice.na_area(None)
+
+    grupos = indice.agrupar(posicoes, zoom)
+
+    assert grupos["quantidade"].sum() == len(posicoes)
+    assert set(grupos["posicao"]).issubset(set(posicoes.tolist()))
+
+
+def test_agrupar_mantem_os_grupos_entre_areas_que_se_sobrepoem():
+    rng = np.random.default_rng(5)
+    # Radares densos na parte comum e outros longe, so em uma das areas:
+    # eles mudam a latitude media do que esta visivel, nao a grade.
+    comum = (-8 + rng.random(300) * 0.2, -35 + rng.random(300) * 0.2)
+    norte = (10 + rng.random(100), -35 + rng.random(100))
+    sul = (-30 + rng.random(100), -35 + rng.random(100))
+    indice = IndiceEspacial(
+        pd.DataFrame(
+            {
+                "latitude": np.concatenate((comum[0], norte[0], sul[0])),
+                "longitude": np.concatenate((comum[1], norte[1], sul[1])),
+            }
+        )
+    )
+
+    def _grupos_comuns(limites):
+        grupos = indice.agrupar(indice.na_area(limites), zoom=12)
+        grupos = grupos[grupos["latitude"].between(-8, -7.8)]
+        return grupos.sort_values("posicao").reset_index(drop=True)
+
+    com_norte = _grupos_comuns((-9, -36, 11, -34))
+    com_sul = _grupos_comuns((-31, -36, -7, -34))
+
+    assert com_norte["quantidade"].sum() == 300
+    pd.testing.assert_frame_equal(com_norte, com_sul)
@@ -0,0 +1,88 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from api_client import dividir_periodo, mesclar_inoperancias
+
+
+def test_dividir_periodo_em_janelas_que_compartilham_o_dia_da_fronteira():
+    janelas = dividir_periodo(date(2024, 1, 1), date(2024, 3, 15), max_dias=31)
+
+    assert janelas == [
+        (date(2024, 1, 1), date(2024, 1, 31)),
+        (date(2024, 1, 31), date(2024, 3, 1)),
+        (date(2024, 3, 1), date(2024, 3, 15)),
+    ]
+    assert all((fim - inicio).days + 1 <= 31 for inicio, fim in janelas)
+
+
+def test_dividir_periodo_curto_ou_de_um_dia():
+    assert dividir_periodo(date(2024, 5, 10), date(2024, 5, 10)) == [(date(2024, 5, 10), date(2024, 5, 10))]
+    assert dividir_periodo(date(2024, 5, 1), date(2024, 5, 31)) == [(date(2024, 5, 1), date(2024, 5, 31))]
+
+
+def test_dividir_periodo_invertido():
+    with pytest.raises(ValueError):
+        dividir_periodo(date(2024, 5, 2), date(2024, 5, 1))
+
+
+def _janela(*linhas):
+    return pd.DataFrame(linhas, columns=["equipamento_id", "nome_processador", "inicio", "fim", "horas"])
+
+
+def test_inoperancia_que_cruza_a_fronteira_vira_um_intervalo():
+    # Cada janela devolve o trecho que cabe nela; o dia da fronteira aparece
+    # nas duas.
+    primeira = _janela((1, "RAD1", "2024-01-30 08:00:00", "2024-01-31 23:59:59", 40.0))
+    segunda = _janela((1, "RAD1", "2024-01-31 00:00:00", "2024-02-02 08:00:00", 56.0))
+
+    mesclado = mesclar_inoperancias([primeira, segunda])
+
+    assert len(mesclado) == 1
+    linha = mesclado.iloc[0]
+    assert linha["inicio"] == "2024-01-30 08:00:00"
+    assert linha["fim"] == "2024-02-02 08:00:00"
+    assert linha["horas"] == 72.0
+
+
+def test_intervalo_em_aberto_continua_em_aberto():
+    primeira = _janela((1, "RAD1", "2024-01-30 08:00:00", "2024-01-31 23:59:59", 40.0))
+    segunda = _janela((1, "RAD1", "2024-01-31 00:00:00", None, None))
+
+    mesclado = mesclar_inoperancias([primeira, segunda])
+
+    assert len(mesclado) == 1
+    assert mesclado.iloc[0]["inicio"] == "2024-01-30 08:00:00"
+    assert pd.isna(mesclado.iloc[0]["fim"])
+
+
+def test_intervalos_separados_e_outros_equipamentos_nao_se_juntam():
+    primeira = _janela(
+        (1, "RAD1", "2024-01-02 00:00:00", "2024-01-02 06:00:00", 6.0),
+        (2, "RAD2", "2024-01-30 00:00:00", "2024-01-31 12:00:00", 36.0),
+    )
+    segunda = _janela(
+        (1, "RAD1", "2024-02-05 00:00:00", "2024-02-05 02:00:00", 2.0),
+        (2, "RAD2", "2024-01-31 00:00:00", "2024-01-31 12:00:00", 12.0),
+    )
+
+    mesclado = mesclar_inoperancias([primeira, segunda])
+
+    por_equipamento = mesclado.groupby("equipamento_id").size().to_dict()
+    assert por_equipamento == {1: 2, 2: 1}
+    rad2 = mesclado[mesclado["equipamento_id"] == 2].iloc[0]
+    assert (rad2["inicio"], rad2["fim"], rad2["horas"]) == ("2024-01-30 00:00:00", "2024-01-31 12:00:00", 36.0)
+
+
+def test_linhas_repetidas_nas_duas_janelas_aparecem_uma_vez():
+    linha = (1, "RAD1", "2024-01-31 02:00:00", "2024-01-31 05:00:00", 3.0)
+
+    mesclado = mesclar_inoperancias([_janela(linha), _janela(linha), _janela()])
+
+    assert len(mesclado) == 1
+    assert mesclado.iloc[0]["horas"] == 3.0
+
+
+def test_sem_inoperancias():
+    assert mesclar_inoperancias([_janela(), _janela()]).empty
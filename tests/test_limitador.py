@@ -0,0 +1,131 @@
+import pytest
+
+import limitador
+from limitador import INTERVALO_REDUCAO_S, LimitadorAPI
+
+
+class Relogio:
+    """Relogio falso: `dormir` so avanca o tempo."""
+
+    def __init__(self) -> None:
+        self.agora = 0.0
+        self.esperas: list[float] = []
+
+    def __call__(self) -> float:
+        return self.agora
+
+    def dormir(self, segundos: float) -> None:
+        self.esperas.append(segundos)
+        self.agora += segundos
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(limitador.time, "sleep", relogio.dormir)
+    return relogio
+
+
+def _responder(limitador_api, status, latencia_s=0.01, **kwargs):
+    limitador_api.adquirir("/x")
+    limitador_api.liberar("/x", latencia_s, status, **kwargs)
+
+
+def test_erro_corta_o_limite_pela_metade_uma_vez_por_rajada(relogio):
+    limitador_api = LimitadorAPI(max_em_voo=16, min_em_voo=2, clock=relogio)
+
+    _responder(limitador_api, 503)
+    assert limitador_api.limite == 8
+    # Outras respostas ruins da mesma rajada nao derrubam de novo.
+    _responder(limitador_api, 429)
+    _responder(limitador_api, None)
+    assert limitador_api.limite == 8
+
+    relogio.agora += INTERVALO_REDUCAO_S
+    _responder(limitador_api, 500)
+    assert limitador_api.limite == 4
+    assert limitador_api.stats()["reducoes"] == 2
+
+
+def test_limite_nao_passa_do_minimo(relogio):
+    limitador_api = LimitadorAPI(max_em_voo=8, min_em_voo=3, clock=relogio)
+
+    for _ in range(5):
+        _responder(limitador_api, 503)
+        relogio.agora += INTERVALO_REDUCAO_S
+
+    assert limitador_api.limite == 3
+
+
+def test_latencia_acima_do_alvo_reduz_dez_por_cento(relogio):
+    limitador_api = LimitadorAPI(max_em_voo=10, latencia_alvo_s=1.0, clock=relogio)
+
+    _responder(limitador_api, 200, latencia_s=2.0)
+
+    assert limitador_api.limite == 9
+
+
+def test_novas_tentativas_contam_como_erro(relogio):
+    limitador_api = LimitadorAPI(max_em_voo=10, clock=relogio)
+
+    _responder(limitador_api, 200, retries=1)
+
+    assert limitador_api.limite == 5
+
+
+def test_respostas_normais_sobem_cerca_de_um_a_cada_limite_respostas(relogio):
+    limitador_api = LimitadorAPI(max_em_voo=16, clock=relogio)
+    _responder(limitador_api, 503)
+    assert limitador_api.limite == 8
+
+    # +1/limite por resposta: de 8 para 9 leva pouco mais de 8 respostas.
+    for _ in range(8):
+        _responder(limitador_api, 200)
+    assert limitador_api.limite == 8
+    _responder(limitador_api, 200)
+    assert limitador_api.limite == 9
+
+    for _ in range(200):
+        _responder(limitador_api, 200)
+    assert limitador_api.limite == 16
+
+
+def test_balde_libera_rajada_e_depois_espaca_pela_taxa(relogio):
+    limitador_api = LimitadorAPI(max_em_voo=100, taxa_por_s=10, rajada=2, clock=relogio)
+
+    esperas = [limitador_api.adquirir("/x") for _ in range(5)]
+
+    assert esperas == pytest.approx([0, 0, 0.1, 0.1, 0.1])
+    assert relogio.agora == pytest.approx(0.3)
+    # Cada endpoint tem o proprio balde.
+    assert limitador_api.adquirir("/y") == 0
+
+
+def test_balde_recarrega_com_o_tempo(relogio):
+    limitador_api = LimitadorAPI(max_em_voo=100, taxa_por_s=10, rajada=2, clock=relogio)
+    limitador_api.adquirir("/x")
+    limitador_api.adquirir("/x")
+
+    relogio.agora += 1.0
+
+    assert [limitador_api.adquirir("/x") for _ in range(2)] == [0, 0]
+
+
+def test_espera_acima_do_maximo_e_rejeitada(relogio):
+    limitador_api = LimitadorAPI(max_em_voo=100, taxa_por_s=1, rajada=1, espera_max_s=0.5, clock=relogio)
+    limitador_api.adquirir("/x")
+
+    with pytest.raises(RuntimeError, match="sobrecarregada"):
+        limitador_api.adquirir("/x")
+    assert limitador_api.stats()["rejeitadas"] == 1
+    assert relogio.esperas == []
+
+
+def test_429_reduz_a_taxa_e_respeita_retry_after(relogio):
+    limitador_api = LimitadorAPI(max_em_voo=100, taxa_por_s=10, rajada=5, clock=relogio)
+    limitador_api.adquirir("/x")
+
+    limitador_api.liberar("/x", 0.01, 429, retry_after_s=3)
+
+    assert limitador_api.stats()["taxa_x"] == 5
+    assert limitador_api.adquirir("/x") == pytest.approx(3)